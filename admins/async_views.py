@@ -0,0 +1,17 @@
+from django.views.decorators.http import require_GET
+
+from admins.permissions import IsPatient
+from utils.async_api import async_api_view, render
+
+
+@require_GET
+@async_api_view(permission_classes=[IsPatient])
+async def patient_profile(request):
+    """Async PatientProfileAPIView.get"""
+    patient = request.patient
+    return render({
+        'id': patient.id,
+        'first_name': patient.first_name,
+        'last_name': patient.last_name,
+        'phone': str(patient.phone),
+    })
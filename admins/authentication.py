@@ -0,0 +1,110 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from admins.models import Admin
+
+
+class PrincipalCache:
+    """
+    Authenticated Admin instances kept in the default (two-tier) cache, keyed
+    by (user id, version). The version is bumped whenever the Admin row
+    changes; the cache's pub/sub invalidation drops the old version from
+    every worker's L1, so hot principals are served without any round trip.
+    """
+
+    def __init__(self, timeout=300):
+        self.timeout = timeout
+
+    def version_key(self, user_id):
+        return f'principal_version:{user_id}'
+
+    def principal_key(self, user_id, version):
+        return f'principal:{user_id}:{version}'
+
+    def get_version(self, user_id):
+        return cache.get(self.version_key(user_id), 0)
+
+    def get(self, user_id):
+        """Return the Admin with this id, or None if it does not exist."""
+        key = self.principal_key(user_id, self.get_version(user_id))
+        # the cache unpickles a fresh instance on every hit, so views may
+        # freely set attributes on request.user
+        user = cache.get(key)
+        if user is None:
+            user = Admin.objects.filter(id=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, timeout=self.timeout)
+        return user
+
+    def invalidate(self, user_id):
+        key = self.version_key(user_id)
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+
+principal_cache = PrincipalCache(timeout=getattr(settings, 'PRINCIPAL_CACHE_TIMEOUT', 300))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user through principal_cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = principal_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class JWTQueryStringAuthMiddleware:
+    """
+    Channels middleware authenticating websocket connections with the same
+    access tokens as the API. Browsers cannot set headers on a websocket, so
+    the token comes as ?token=<access token>. scope['user'] is the Admin or
+    AnonymousUser.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = AnonymousUser()
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if token:
+            authenticator = CachedJWTAuthentication()
+            try:
+                validated_token = authenticator.get_validated_token(token[0].encode())
+                scope['user'] = await database_sync_to_async(authenticator.get_user)(validated_token)
+            except (InvalidToken, AuthenticationFailed):
+                pass
+        return await self.inner(scope, receive, send)
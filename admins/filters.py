@@ -0,0 +1,19 @@
+import django_filters
+
+from admins.models import Admin
+from utils.persian import normalize_phone
+
+
+class AdminFilter(django_filters.FilterSet):
+    """?phone=&created_after=&created_before= on top of the required ?type="""
+    phone = django_filters.CharFilter(method='filter_phone')
+    created = django_filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Admin
+        fields = ['phone', 'created']
+
+    def filter_phone(self, queryset, name, value):
+        # '0912 123 4567', '+98-912-1234567', '۰۹۱۲۱۲۳۴۵۶۷' all find +989121234567
+        phone = normalize_phone(value)
+        return queryset.filter(phone=phone) if phone else queryset.none()
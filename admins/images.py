@@ -0,0 +1,81 @@
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# variant name -> bounding box; every variant is written in each format below
+VARIANT_SIZES = {
+    'thumb': (96, 96),
+    'small': (256, 256),
+    'medium': (640, 640),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'variants'
+
+
+def variant_url(name):
+    return f'/api/images/{name}'
+
+
+def render_variant(image, size, file_format):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    pil_format, options = FORMATS[file_format]
+    buffer = io.BytesIO()
+    variant.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(source_name, storage=default_storage):
+    """
+    Write every size / format variant of the stored image `source_name`
+    and return {'source': source_name, <variant>: {<format>: name}}. Names
+    carry a hash of the content, so a variant URL never changes meaning and
+    can be cached forever.
+    """
+    with storage.open(source_name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    variants = {'source': source_name}
+    for variant, size in VARIANT_SIZES.items():
+        for file_format in FORMATS:
+            content = render_variant(image, size, file_format)
+            digest = hashlib.sha256(content).hexdigest()[:16]
+            name = posixpath.join(directory, VARIANTS_DIR, f'{stem}.{variant}.{digest}.{file_format}')
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(content))
+            variants.setdefault(variant, {})[file_format] = name
+    return variants
+
+
+def variant_names(variants):
+    return [name for variant in VARIANT_SIZES for name in (variants.get(variant) or {}).values()]
+
+
+def image_variant_urls(admin, original_url):
+    """
+    {<variant>: {<format>: url}} for the serializers. Until the variants of
+    the current image are generated every entry points at the original.
+    """
+    if not admin.img:
+        return None
+    variants = admin.img_variants or {}
+    ready = variants.get('source') == admin.img.name
+    return {
+        variant: {
+            file_format: variant_url(variants[variant][file_format]) if ready else original_url
+            for file_format in FORMATS
+        }
+        for variant in VARIANT_SIZES
+    }
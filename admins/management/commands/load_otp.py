@@ -0,0 +1,71 @@
+import logging
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from admins import otp
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer send-otp and verify-otp from a few phones and addresses and report what the rate limits '
+        'let through; fails if a rejected request ran a database query'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='requests per endpoint')
+        parser.add_argument('--phones', type=int, default=20)
+        parser.add_argument('--ips', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # numbers no customer has, so accepted requests never reach the sms provider
+        phones = [f'0999{index:07d}' for index in range(options['phones'])]
+        ips = [f'10.255.{index // 250}.{index % 250 + 1}' for index in range(options['ips'])]
+        for limiter in (otp.send_limiter, otp.verify_limiter):
+            for phone in phones:
+                limiter.reset({'phone': phone})
+            for ip in ips:
+                limiter.reset({'ip': ip})
+            limiter.reset({'global': 'all'})
+
+        # one warning per rejected request otherwise
+        for name in ('django.request', 'utils.ratelimit'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+        client = APIClient(SERVER_NAME='localhost')
+        failures = []
+        for label, path, body in (
+            ('send-otp', '/api/patient/send-otp/', lambda phone: {'phone': phone}),
+            ('verify-otp', '/api/patient/verify-otp/', lambda phone: {'phone': phone, 'otp': f'{rng.randrange(10 ** 5):05d}'}),
+        ):
+            stats = {}
+            for _ in range(options['requests']):
+                phone = rng.choice(phones)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.post(path, body(phone), format='json', REMOTE_ADDR=rng.choice(ips))
+                    elapsed = (time.perf_counter() - started) * 1000
+                row = stats.setdefault(response.status_code, {'count': 0, 'queries': 0, 'ms': 0.0})
+                row['count'] += 1
+                row['queries'] = max(row['queries'], len(queries))
+                row['ms'] += elapsed
+
+            self.stdout.write(f'{label}: {options["requests"]} requests, {len(phones)} phones, {len(ips)} addresses')
+            for status_code, row in sorted(stats.items()):
+                self.stdout.write(
+                    f'  {status_code}  {row["count"]:6d} requests  max queries={row["queries"]}  mean {row["ms"] / row["count"]:.2f}ms'
+                )
+            rejected = stats.get(429)
+            if rejected and rejected['queries']:
+                failures.append(f'{label}: a rejected request ran {rejected["queries"]} queries')
+
+        self.stdout.write(f'rejections: send={otp.send_limiter.metrics()} verify={otp.verify_limiter.metrics()}')
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('rejected requests ran no database queries'))
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+from utils.migrations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('admins', '0002_admin_address_admin_device_id'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='admin',
+            index=models.Index(fields=['type_user', '-created', '-id'], name='admins_type_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='admin',
+            index=models.Index(fields=['phone', 'type_user'], name='admins_phone_type_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admins', '0003_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='admin',
+            name='img_variants',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admins', '0004_admin_img_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='admin',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
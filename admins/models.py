@@ -14,6 +14,7 @@ def user_directory_path(instance, filename):
 
 class Admin(AbstractUser):
     created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     img = models.FileField(verbose_name='تصویر', upload_to=user_directory_path, null=True, blank=True)
     phone = PhoneNumberField(blank=True, null=True, verbose_name=" تلفن همراه", region="IR")
     type_user = models.IntegerField(verbose_name='نوع کاربر', choices=public_variable.TypeUser, default=0)
@@ -21,9 +22,15 @@ class Admin(AbstractUser):
     confirm_code = models.BigIntegerField(null=True)
     address = models.TextField(null=True, blank=True)
     device_id = models.CharField(max_length=255, null=True, blank=True)
+    # resized copies of img, see admins.images; {'source': img name, <variant>: {<format>: name}}
+    img_variants = models.JSONField(default=dict, editable=False)
     
     class Meta:
         db_table = 'admins'
+        indexes = [
+            models.Index(fields=['type_user', '-created', '-id'], name='admins_type_created_idx'),
+            models.Index(fields=['phone', 'type_user'], name='admins_phone_type_idx'),
+        ]
 
     def __str__(self):
         return str(self.username)
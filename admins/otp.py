@@ -0,0 +1,38 @@
+import hashlib
+import hmac
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.cache import delete_if_equal
+from utils.ratelimit import RateLimiter
+
+send_limiter = RateLimiter('otp_send', settings.OTP_SEND_LIMITS, cooldown=settings.OTP_COOLDOWN)
+verify_limiter = RateLimiter('otp_verify', settings.OTP_VERIFY_LIMITS, cooldown=settings.OTP_COOLDOWN)
+
+
+# phone is the E.164 form from utils.persian.normalize_phone, so every spelling shares one code
+def otp_key(phone):
+    return f'patient_otp:{hashlib.md5(str(phone).encode()).hexdigest()}'
+
+
+def otp_hash(phone, code):
+    # keyed so a leaked cache dump does not give the codes away (5 digits are quick to brute force)
+    return hmac.new(settings.SECRET_KEY.encode(), f'{phone}:{code}'.encode(), hashlib.sha256).hexdigest()
+
+
+def store(phone, code):
+    cache.set(otp_key(phone), otp_hash(phone, code), timeout=settings.OTP_TIMEOUT)
+
+
+def issue(phone):
+    """A new code for phone, stored hashed; it replaces any earlier code."""
+    code = settings.OTP_FIXED_CODE or ''.join(secrets.choice('0123456789') for _ in range(settings.OTP_LENGTH))
+    store(phone, code)
+    return code
+
+
+def consume(phone, code):
+    """True if code is the current code of phone; a matching code is deleted in the same step, so it works once."""
+    return delete_if_equal(cache, otp_key(phone), otp_hash(phone, code))
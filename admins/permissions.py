@@ -1,20 +1,23 @@
-from rest_framework.permissions import BasePermission
+import logging
+
+from rest_framework.permissions import SAFE_METHODS, BasePermission
 from rest_framework_simplejwt.tokens import AccessToken
 from django.core.exceptions import ObjectDoesNotExist
-from admins.models import Admin
+from admins.authentication import principal_cache
+from utils import public_variable
+
+logger = logging.getLogger(__name__)
 
 class IsPatient(BasePermission):
     def has_permission(self, request, view):
         try:
             auth_header = request.headers.get('Authorization')
-            print("DDDDDDDDDDDDDDDDDDDDDDDDDD", auth_header)
 
             if not auth_header or not auth_header.startswith('Token'):
                 return False
 
             token = auth_header.split(' ')[1]
             access_token = AccessToken(token)
-            print("33333333333333333", access_token.get('patient_id'))
             if access_token.get('type') != 'patient':
                 return False
                 
@@ -22,14 +25,27 @@ class IsPatient(BasePermission):
             if not patient_id:
                 return False
             
-            try:
-                patient = Admin.objects.get(id=patient_id)
-                # ذخیره بیمار در request برای دسترسی در ویو
-                request.patient = patient
-                return True
-            except Admin.DoesNotExist:
+            patient = principal_cache.get(patient_id)
+            if patient is None:
                 return False
+            # ذخیره بیمار در request برای دسترسی در ویو
+            request.patient = patient
+            return True
 
         except Exception as e:
-            print(f"Error in IsPatient permission: {str(e)}")
-            return False 
\ No newline at end of file
+            logger.info('IsPatient rejected the request: %s', e)
+            return False 
+
+
+class IsAdminOrReadOnly(BasePermission):
+    """Reads for any authenticated user (with IsAuthenticated), writes for admins (type_user) only."""
+
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS or getattr(request.user, 'type_user', None) == public_variable.ADMIN_TYPE
+
+
+class IsAdmin(BasePermission):
+    """Admins (type_user) only, with IsAuthenticated."""
+
+    def has_permission(self, request, view):
+        return getattr(request.user, 'type_user', None) == public_variable.ADMIN_TYPE
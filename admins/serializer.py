@@ -39,19 +39,25 @@ from .models import Admin  # Ensure to import your Admin model
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
 from .models import Admin  # Ensure to import your Admin model
+from .images import image_variant_urls
 
 class UserSerializer(serializers.ModelSerializer):
     img2 = serializers.SerializerMethodField()
+    img_variants = serializers.SerializerMethodField()
     phone2 = serializers.SerializerMethodField()
 
     class Meta:
         model = Admin
-        fields = ['id', 'first_name', 'username', 'last_name', 'phone', 'img2', 'password', 'type_user', 'img', 'phone2', 'address', 'device_id']
+        fields = ['id', 'first_name', 'username', 'last_name', 'phone', 'img2', 'img_variants', 'password', 'type_user', 'img', 'phone2', 'address', 'device_id']
         extra_kwargs = {'password': {'write_only': True}}  # Password should not be exposed
 
     def get_img2(self, obj):
         """Return the image URL with '/api' prefix."""
         return f'/api{obj.img.url}' if obj.img else None  # Handle cases where img might be None
+
+    def get_img_variants(self, obj):
+        """Resized webp/jpeg URLs per size, the original image until they are generated."""
+        return image_variant_urls(obj, self.get_img2(obj))
     
     def get_phone2(self, obj):
         """Return the phone number without the country code."""
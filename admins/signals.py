@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from admins.authentication import principal_cache
+from admins.models import Admin
+
+
+@receiver(post_save, sender=Admin)
+@receiver(post_delete, sender=Admin)
+def invalidate_principal(sender, instance, using, **kwargs):
+    # password changes go through save() as well. Bumped after commit: before
+    # it, a concurrent request would cache the old row under the new version.
+    user_id = instance.pk
+    transaction.on_commit(lambda: principal_cache.invalidate(user_id), using=using)
+
+
+@receiver(post_save, sender=Admin)
+def queue_img_variants(sender, instance, **kwargs):
+    if instance.img and (instance.img_variants or {}).get('source') != instance.img.name:
+        from admins.tasks import generate_img_variants
+
+        transaction.on_commit(lambda: generate_img_variants.delay(instance.pk))
@@ -0,0 +1,28 @@
+from celery import shared_task
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from admins import images
+from admins.authentication import principal_cache
+from admins.models import Admin
+
+
+@shared_task()
+def generate_img_variants(admin_id):
+    admin = Admin.objects.filter(id=admin_id).only('id', 'img', 'img_variants').first()
+    if admin is None or not admin.img:
+        return
+    source = admin.img.name
+    if (admin.img_variants or {}).get('source') == source:
+        return
+
+    variants = images.generate_variants(source)
+    # only if the image was not replaced in the meantime
+    updated = Admin.objects.filter(id=admin_id, img=source).update(img_variants=variants, updated_at=timezone.now())
+    if not updated:
+        for name in images.variant_names(variants):
+            default_storage.delete(name)
+        return
+    principal_cache.invalidate(admin_id)
+    for name in set(images.variant_names(admin.img_variants or {})) - set(images.variant_names(variants)):
+        default_storage.delete(name)
@@ -1,3 +1,530 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import threading
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from admins import otp
+from admins.authentication import principal_cache
+from admins.models import Admin
+from services.models import Materail
+from utils import db_router, public_variable
+from utils.profiling import ProfilingMiddleware
+from utils.cache import TwoTierCache
+from utils.persian import normalize_digits, normalize_phone, normalize_text
+from utils.ratelimit import RateLimiter, client_ip
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Safe requests read from the replica, writes and clients that just wrote
+    use default. The replica alias mirrors the default test database through
+    its own connection, which only sees committed rows, hence no TestCase.
+    """
+    databases = {DEFAULT_DB_ALIAS, 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        db_router._unhealthy.clear()
+        self.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def request(self, method, path, **kwargs):
+        """Send the request; returns it with the number of queries run on (default, replica)."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(path, **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return response, len(primary), len(replica)
+
+    def test_reads_use_the_replica(self):
+        _, primary, replica = self.request('get', '/api/materails/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writes_use_default_and_pin_the_client(self):
+        response, primary, replica = self.request('post', '/api/materails/', data={'title': 'فیلتر', 'count': 1, 'price': 5})
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        self.assertIn(db_router.PIN_COOKIE, response.cookies)
+
+        # the cookie sent back keeps the next reads on default
+        _, primary, replica = self.request('get', '/api/materails/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_token_clients_are_pinned_without_the_cookie(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer first')
+        self.request('post', '/api/materails/', data={'title': 'فیلتر', 'count': 1, 'price': 5})
+        self.client.cookies.clear()
+
+        _, primary, replica = self.request('get', '/api/materails/')
+        self.assertEqual(replica, 0)
+
+        # another token did not write, it still reads from the replica
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer second')
+        _, primary, replica = self.request('get', '/api/materails/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_pin_expires(self):
+        with override_settings(REPLICA_STICKY_SECONDS=-1):
+            self.request('post', '/api/materails/', data={'title': 'فیلتر', 'count': 1, 'price': 5})
+        _, primary, replica = self.request('get', '/api/materails/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_unhealthy_replica_falls_back_to_default(self):
+        db_router.mark_unhealthy('replica')
+        _, primary, replica = self.request('get', '/api/materails/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_view_overrides(self):
+        def view(request):
+            return HttpResponse(db_router.ReplicaRouter().db_for_read(Materail))
+
+        middleware = db_router.ReplicaRoutingMiddleware(lambda request: middleware.process_view(request, routed, (), {}) or routed(request))
+        factory = RequestFactory()
+        for routed, cookies, expected in [
+            (view, {}, 'replica'),
+            (db_router.use_primary(lambda request: view(request)), {}, DEFAULT_DB_ALIAS),
+            (db_router.use_replica(lambda request: view(request)), {db_router.PIN_COOKIE: '9999999999'}, 'replica'),
+            (view, {db_router.PIN_COOKIE: '9999999999'}, DEFAULT_DB_ALIAS),
+        ]:
+            request = factory.get('/')
+            request.COOKIES.update(cookies)
+            self.assertEqual(middleware(request).content.decode(), expected)
+
+    def test_catalog_loads_from_default(self):
+        from services.catalog import type_services
+
+        # a lagging replica must not fill the snapshot of a new version
+        type_services._snapshot = None
+        _, primary, replica = self.request('get', '/api/type_services/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_outside_a_request_everything_uses_default(self):
+        router = db_router.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Materail), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_write(Materail), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate('replica', 'services'))
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    """TwoTierCache on fakeredis: the instances made for one url share a server, like two workers."""
+
+    def make_cache(self):
+        return TwoTierCache(self.url, {'OPTIONS': {'CLIENT_CLASS': 'fakeredis.FakeRedis'}})
+
+    def setUp(self):
+        self.url = f'redis://{uuid.uuid4().hex}:6379/0'
+        self.cache = self.make_cache()
+
+    def test_incr_a_missing_key_raises_and_creates_nothing(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('hits')
+        self.assertIsNone(self.cache.get('hits'))
+
+    def test_incr_keeps_the_timeout(self):
+        self.cache.set('hits', 1, timeout=60)
+        self.assertEqual(self.cache.incr('hits', 4), 5)
+        self.assertEqual(self.cache.decr('hits'), 4)
+        self.assertGreater(self.cache._client.pttl(self.cache.make_key('hits')), 0)
+
+    def test_incr_never_leaves_a_counter_without_timeout(self):
+        self.cache.set('hits', 1, timeout=60)
+        client = self.cache._client
+        exists = client.exists
+
+        def expire_then_check(*keys):
+            # the key expires right after a client side existence check
+            found = exists(*keys)
+            client.delete(*keys)
+            return found
+
+        with mock.patch.object(client, 'exists', expire_then_check):
+            try:
+                self.cache.incr('hits')
+            except ValueError:
+                pass
+        # either the increment saw the key or it saw none, never a counter without a timeout
+        self.assertNotEqual(client.pttl(self.cache.make_key('hits')), -1)
+
+    def test_concurrent_incr_loses_no_update(self):
+        self.cache.set('hits', 0, timeout=60)
+        caches = [self.make_cache() for _ in range(8)]
+
+        def work(worker):
+            for _ in range(50):
+                worker.incr('hits')
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('hits'), 400)
+
+    def test_incr_invalidates_other_workers(self):
+        other = self.make_cache()
+        self.cache.set('hits', 1, timeout=60)
+        self.assertEqual(other.get('hits'), 1)
+        self.cache.incr('hits')
+        for _ in range(50):
+            if other.stats()['invalidations']:
+                break
+            threading.Event().wait(0.02)
+        self.assertEqual(other.get('hits'), 2)
+
+
+class ImageVariantTests(SimpleTestCase):
+    def test_malformed_names_are_not_found(self):
+        for name in ['x/variants/abc', 'x/variants/abc.webp', 'x/variants/a.thumb..webp', 'x/variants/.thumb.abc.webp',
+                     'x/other/a.thumb.abc.webp', 'x/variants/a.thumb.abc.gif', 'x/variants/a.thumb.abc.webp']:
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(f'/api/images/{name}').status_code, 404)
+
+
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = Admin.objects.create(username='admin', first_name='old', type_user=public_variable.ADMIN_TYPE)
+
+    def test_changes_invalidate_the_principal_on_commit(self):
+        self.assertEqual(principal_cache.get(self.admin.pk).first_name, 'old')
+        version = principal_cache.get_version(self.admin.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.first_name = 'new'
+            self.admin.save()
+            # not yet: another request could still read and cache the old row
+            self.assertEqual(principal_cache.get_version(self.admin.pk), version)
+        self.assertNotEqual(principal_cache.get_version(self.admin.pk), version)
+        self.assertEqual(principal_cache.get(self.admin.pk).first_name, 'new')
+
+    def test_uncommitted_changes_keep_the_version(self):
+        version = principal_cache.get_version(self.admin.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.admin.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(principal_cache.get_version(self.admin.pk), version)
+
+    def test_delete_invalidates_the_deleted_id(self):
+        user_id = self.admin.pk
+        self.assertIsNotNone(principal_cache.get(user_id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.delete()
+        self.assertIsNone(principal_cache.get(user_id))
+
+
+class PatientProfileTests(TestCase):
+    """The async profile endpoint answers exactly like the sync one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = Admin.objects.create(username='patient', first_name='علی', type_user=public_variable.USER_TYPE)
+
+    def setUp(self):
+        cache.clear()
+
+    def patient_token(self):
+        token = AccessToken.for_user(self.patient)
+        token['patient_id'] = self.patient.id
+        token['type'] = 'patient'
+        return str(token)
+
+    def test_async_matches_sync(self):
+        for label, header in [
+            ('no header', None),
+            ('not a token', 'Token nope'),
+            ('not a patient token', f'Token {AccessToken.for_user(self.patient)}'),
+            ('patient', f'Token {self.patient_token()}'),
+        ]:
+            with self.subTest(label):
+                headers = {'HTTP_AUTHORIZATION': header} if header else {}
+                sync = self.client.get('/api/users/profile/', **headers)
+                asynchronous = self.client.get('/api/async/users/profile/', **headers)
+                self.assertEqual(asynchronous.status_code, sync.status_code)
+                self.assertEqual(asynchronous.json(), sync.json())
+
+    def test_rejected_with_403(self):
+        self.assertEqual(self.client.get('/api/async/users/profile/').status_code, 403)
+
+
+class RateLimiterTests(SimpleTestCase):
+    # the start of a bucket for every window below
+    NOW = 1800000
+
+    def setUp(self):
+        cache.clear()
+        self.limiter = RateLimiter('test', {'global': (5, 60), 'ip': (3, 3600), 'phone': (2, 600)}, cooldown=(60, 300))
+        self.now = self.NOW
+        patcher = mock.patch('utils.ratelimit.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check(self, ip='1.1.1.1', phone='+989121234567'):
+        return self.limiter.check({'global': 'all', 'ip': ip, 'phone': phone})
+
+    def test_per_phone(self):
+        self.assertTrue(self.check())
+        self.assertTrue(self.check(ip='2.2.2.2'))
+        decision = self.check(ip='3.3.3.3')
+        self.assertFalse(decision)
+        self.assertEqual(decision.scope, 'phone')
+        self.assertTrue(self.check(ip='3.3.3.3', phone='+989121234568'))
+
+    def test_per_ip(self):
+        for index in range(3):
+            self.assertTrue(self.check(phone=f'+98912123456{index}'))
+        decision = self.check(phone='+989121234569')
+        self.assertEqual((decision.allowed, decision.scope), (False, 'ip'))
+        self.assertTrue(self.check(ip='2.2.2.2', phone='+989121234569'))
+
+    def test_global(self):
+        for index in range(5):
+            self.assertTrue(self.check(ip=f'1.1.1.{index}', phone=f'+98912123456{index}'))
+        decision = self.check(ip='2.2.2.2', phone='+989121234569')
+        self.assertEqual((decision.allowed, decision.scope, decision.retry_after), (False, 'global', 60))
+        # no cooldown for the global scope: the next window is open again
+        self.now += 120
+        self.assertTrue(self.check(ip='2.2.2.2', phone='+989121234569'))
+        self.assertEqual(self.limiter.metrics()['global'], {'limited': 1, 'cooldown': 0})
+
+    def test_cooldown_doubles_per_strike(self):
+        limiter = RateLimiter('test', {'phone': (1, 60)}, cooldown=(600, 3600))
+        phone = {'phone': '+989121234567'}
+        self.assertTrue(limiter.check(phone))
+        self.assertEqual(limiter.check(phone).retry_after, 600)
+        # the window is long over, the cooldown is not
+        self.now += 599
+        self.assertEqual(limiter.check(phone).retry_after, 1)
+        self.now += 1
+        self.assertTrue(limiter.check(phone))
+        self.assertEqual(limiter.check(phone).retry_after, 1200)
+        self.now += 1199
+        self.assertFalse(limiter.check(phone))
+        self.assertEqual(limiter.metrics()['phone'], {'limited': 2, 'cooldown': 2})
+
+    def test_reset(self):
+        self.check(), self.check(), self.check()
+        self.limiter.reset({'phone': '+989121234567'})
+        self.assertTrue(self.check(ip='2.2.2.2'))
+
+
+class OtpTests(TestCase):
+    """Every spelling of a phone number shares one set of limits and one code."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = Admin.objects.create(username='patient', phone='+989121234567', type_user=public_variable.USER_TYPE)
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('admins.views.SmartSms.send_background')
+        self.sms = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, phone, ip='1.1.1.1'):
+        return self.client.post('/api/patient/send-otp/', {'phone': phone}, REMOTE_ADDR=ip)
+
+    def verify(self, phone, code, ip='1.1.1.1'):
+        return self.client.post('/api/patient/verify-otp/', {'phone': phone, 'otp': code}, REMOTE_ADDR=ip)
+
+    def test_phone_spellings_share_the_limit(self):
+        for phone in ['+98 912 123 4567', '+98-912-1234567', '09121234567']:
+            self.assertEqual(self.send(phone, ip=phone[-3:]).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.send('۰۹۱۲۱۲۳۴۵۶۷', ip='4.4.4.4')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual([call.kwargs['mobile'] for call in self.sms.call_args_list], ['+989121234567'] * 3)
+
+    def test_ip_limit_rejects_without_queries(self):
+        with mock.patch.object(otp.send_limiter, 'limits', {'ip': (1, 3600)}):
+            self.assertEqual(self.send('09121234567').status_code, 200)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.send('09121234568').status_code, 429)
+        self.assertEqual(self.sms.call_count, 1)
+
+    def test_invalid_phone(self):
+        self.assertEqual(self.send('').status_code, 400)
+        self.assertEqual(self.send('0912').status_code, 400)
+        self.assertEqual(self.verify('abc', '12345').status_code, 400)
+        self.sms.assert_not_called()
+
+    def test_code_works_with_any_spelling_once(self):
+        self.send('09121234567')
+        code = self.sms.call_args.kwargs['tokens']['token']
+        response = self.verify('+98 912 123 4567', code)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['patient']['id'], self.patient.pk)
+        self.assertEqual(self.verify('+98 912 123 4567', code).status_code, 400)
+
+
+class ClientIpTests(SimpleTestCase):
+    def ip(self, **meta):
+        return client_ip(RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **meta))
+
+    def test_remote_addr_by_default(self):
+        self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='1.1.1.1'), '10.0.0.1')
+
+    @override_settings(CLIENT_IP_HEADER='HTTP_X_REAL_IP')
+    def test_single_value_header(self):
+        self.assertEqual(self.ip(HTTP_X_REAL_IP='2.2.2.2'), '2.2.2.2')
+        self.assertEqual(self.ip(), '10.0.0.1')
+
+    @override_settings(CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_forwarded_for_ignores_what_the_client_sent(self):
+        # the client sent "6.6.6.6, 7.7.7.7", our proxy appended the address it saw
+        self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='6.6.6.6, 7.7.7.7, 3.3.3.3'), '3.3.3.3')
+        with override_settings(CLIENT_IP_PROXY_COUNT=2):
+            self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='6.6.6.6, 3.3.3.3, 10.0.0.2'), '3.3.3.3')
+            # fewer entries than proxies: the header did not come from our chain
+            self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='3.3.3.3'), '10.0.0.1')
+
+
+class ExportCustomerTests(TestCase):
+    """The export takes the ListAdmin filters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.customers = [
+            Admin.objects.create(username=f'customer {index}', phone=f'+98912000000{index}', type_user=public_variable.USER_TYPE)
+            for index in range(3)
+        ]
+        Admin.objects.filter(pk=cls.customers[0].pk).update(created=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        cls.operator = Admin.objects.create(username='operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get('/api/admins/export', params)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode().lstrip('\ufeff'))))
+        return [int(row[0]) for row in rows[1:]]
+
+    def test_customers_by_default(self):
+        self.assertEqual(self.export(), [customer.pk for customer in self.customers])
+
+    def test_list_filters(self):
+        self.assertEqual(self.export(type=public_variable.REPAIRE_MEN_TYPE), [self.operator.pk])
+        self.assertEqual(self.export(phone=str(self.customers[1].phone)), [self.customers[1].pk])
+        self.assertEqual(self.export(created_after='2025-01-01'), [customer.pk for customer in self.customers[1:]])
+
+    def test_admins_only(self):
+        for user in [self.customers[0], self.operator]:
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get('/api/admins/export').status_code, 403)
+
+    @override_settings(TIME_ZONE='Asia/Tehran')
+    def test_xlsx_dates_in_local_time(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get('/api/admins/export', {'file_format': 'xlsx', 'created_before': '2024-06-01'})
+        self.assertEqual(response.status_code, 200)
+        rows = list(load_workbook(io.BytesIO(b''.join(response.streaming_content))).active.values)
+        self.assertEqual(rows[1][-1], datetime.datetime(2024, 1, 1, 3, 30))
+
+
+class NormalizationTests(SimpleTestCase):
+
+    def test_digits(self):
+        self.assertEqual(normalize_digits('۰۹۱۲ ٣٤٥'), '0912 345')
+
+    def test_text(self):
+        self.assertEqual(normalize_text('  كيك‌ها  يـک  '), 'کیک ها یک')
+        self.assertEqual(normalize_text('إِبزار ۱۲'), 'ابزار 12')
+        self.assertEqual(normalize_text(None), '')
+
+    def test_phone(self):
+        for value in ['+98 912 123 4567', '+98-912-1234567', '09121234567', '۰۹۱۲۱۲۳۴۵۶۷', '9121234567', '0098 912 123 4567']:
+            with self.subTest(value=value):
+                self.assertEqual(normalize_phone(value), '+989121234567')
+        for value in ['', None, 'abc', '12', '+98912000001']:
+            with self.subTest(value=value):
+                self.assertIsNone(normalize_phone(value))
+
+
+class AdminPhoneFilterTests(TestCase):
+    """?phone= finds the admin whatever way the number is written."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.customer = Admin.objects.create(username='customer', phone='+989121234567', type_user=public_variable.USER_TYPE)
+        Admin.objects.create(username='other', phone='+989121234568', type_user=public_variable.USER_TYPE)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def search(self, phone):
+        response = self.client.get('/api/admins/list', {'type': public_variable.USER_TYPE, 'phone': phone})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_variants(self):
+        for phone in ['+989121234567', '0912 123 4567', '+98-912-1234567', '۰۹۱۲۱۲۳۴۵۶۷']:
+            with self.subTest(phone=phone):
+                self.assertEqual(self.search(phone), [self.customer.pk])
+
+    def test_invalid_matches_nothing(self):
+        self.assertEqual(self.search('0912'), [])
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Admin.objects.create(username='user', type_user=public_variable.ADMIN_TYPE)
+        cls.staff = Admin.objects.create(username='staff', type_user=public_variable.ADMIN_TYPE, is_staff=True)
+        Materail.objects.create(title='فیلتر', count=1, price=1)
+
+    def get(self, user):
+        # a new client loads the middleware with the current settings
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/materails/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_off_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: HttpResponse())
+        self.assertNotIn('Server-Timing', self.get(self.staff))
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_header_for_staff_only(self):
+        self.assertNotIn('Server-Timing', self.get(self.user))
+        header = self.get(self.staff)['Server-Timing']
+        for part in ['total;dur=', 'view;dur=', 'sql;dur=', 'queries"', 'ser;dur=', 'cache;desc=']:
+            self.assertIn(part, header)
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SERVER_TIMING=True)
+    def test_header_for_everybody_with_the_flag(self):
+        self.assertIn('Server-Timing', self.get(self.user))
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_REQUEST_MS=0)
+    def test_slow_request_report(self):
+        with self.assertLogs('utils.profiling', 'WARNING') as logs:
+            self.get(self.user)
+        record = logs.records[0].profile
+        self.assertEqual((record['path'], record['status'], record['user_id']), ('/api/materails/', 200, self.user.pk))
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn('duplicated_sql', record)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.conf.urls.static import static
 from django.urls import path, include, re_path
-from admins import views
+from admins import views, async_views
 from rest_framework import routers
 from django.conf import settings
 app_name = "admins"
@@ -12,12 +12,16 @@ router = routers.SimpleRouter()
 urlpatterns =  [
 
     path('admins/list', views.ListAdmin.as_view(), name=views.ListAdmin.name),
+    path('admins/export', views.ExportCustomer.as_view(), name=views.ExportCustomer.name),
     path('admins/create/', views.CreateAdmin.as_view(), name=views.CreateAdmin.name),
     path('admins/detail/<int:pk>', views.DetailAdmin.as_view(), name=views.DetailAdmin.name),
     
     path('patient/send-otp/', views.send_otp, name='patient-send-otp'),
     path('patient/verify-otp/', views.verify_otp, name='patient-verify-otp'),
+    path('patient/otp-metrics/', views.OtpMetricsView.as_view(), name=views.OtpMetricsView.name),
     path('users/profile/', views.PatientProfileAPIView.as_view(), name='patient-profile'),
+    path('async/users/profile/', async_views.patient_profile, name='async-patient-profile'),
+    path('images/<path:name>', views.image_variant, name='image-variant'),
         #   path('dashboard/', TemplateView.as_view(template_name='index.html')),
 
     
@@ -1,3 +1,5 @@
+import logging
+
 from django.shortcuts import render
 from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView, DestroyAPIView, UpdateAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView
 from .serializer import UserSerializer
@@ -11,32 +13,95 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializer import CustomTokenObtainPairSerializer
 from rest_framework import status, viewsets
 from utils.pagination import CustomPaginationClass
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from utils.conditional import ConditionalGetMixin
+from utils.profiling import ProfilingMixin
+from admins import images, otp
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.views.decorators.http import require_GET
+from admins.filters import AdminFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from admins.authentication import CachedJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
-from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
-from admins.permissions import IsPatient
-class ListAdmin(ListAPIView):
+from admins.permissions import IsAdmin, IsPatient
+from utils.export import export_response
+from utils.ratelimit import client_ip
+from utils.persian import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_EXPORT_COLUMNS = [
+    ('شناسه', 'id', None),
+    ('نام کاربری', 'username', None),
+    ('نام', 'first_name', None),
+    ('نام خانوادگی', 'last_name', None),
+    ('تلفن همراه', 'phone', lambda phone: str(phone) if phone else None),
+    ('آدرس', 'address', None),
+    ('تاریخ ایجاد', 'created', None),
+]
+
+class ListAdmin(ProfilingMixin, ListAPIView):
     name = "list_admin"
     model = Admin 
     pagination_class = CustomPaginationClass  
+    pagination_count_mode = 'estimate'
+    cursor_ordering = ('-created', '-id')
     serializer_class = UserSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AdminFilter
     queryset = Admin.objects.filter(type_user=public_variable.ADMIN_TYPE)
     def get_queryset(self):
-        return Admin.objects.filter(type_user=self.request.GET.get('type'))
+        # (type_user, -created, -id) is admins_type_created_idx
+        return Admin.objects.filter(type_user=self.request.GET.get('type')).order_by('-created', '-id')
     
 
-class CreateAdmin(CreateAPIView):
+class ExportCustomer(ListAdmin):
+    """
+    Stream the users matching the ListAdmin filters as csv or xlsx
+    (?file_format=xlsx); ?type= defaults to customers (type_user=2)
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdmin]
+    name = "export_customer"
+
+    def get_queryset(self):
+        return Admin.objects.filter(type_user=self.request.GET.get('type', public_variable.USER_TYPE))
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        return export_response(queryset, CUSTOMER_EXPORT_COLUMNS, 'customers', request.query_params.get('file_format', 'csv'))
+
+
+class OtpMetricsView(APIView):
+    """
+    OTP requests rejected by each rate limit (limited) or cooldown, counted
+    in the shared cache
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    name = "otp_metrics"
+
+    def get(self, request):
+        if request.user.type_user != public_variable.ADMIN_TYPE:
+            return Response({'detail': 'دسترسی ندارید'}, status=status.HTTP_403_FORBIDDEN)
+        return Response({
+            'send': otp.send_limiter.metrics(),
+            'verify': otp.verify_limiter.metrics(),
+        })
+
+
+class CreateAdmin(ProfilingMixin, CreateAPIView):
     # authentication_classes = [JWTAuthentication]
     # permission_classes = [IsAuthenticated]
     name = "create_admin"
     model = Admin
     serializer_class = UserSerializer
 
-class DetailAdmin(RetrieveUpdateDestroyAPIView):
+class DetailAdmin(ConditionalGetMixin, ProfilingMixin, RetrieveUpdateDestroyAPIView):
     name = "detail_admin"
     model = Admin   
     serializer_class = UserSerializer
@@ -52,31 +117,41 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     model = Admin
 
 
+def rate_limited(decision):
+    response = Response({'message': 'تعداد درخواست‌ها بیش از حد مجاز است، بعدا تلاش کنید'}, status=429)
+    response['Retry-After'] = str(decision.retry_after)
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def send_otp(request):
-    phone = request.data.get('phone')
-    print("DDDDDDDDDDDDDd", phone)
-    if not phone:
+    if not request.data.get('phone'):
         return Response({'message': 'شماره تلفن الزامی است'}, status=400)
+    # one form per number, or each spelling of it would get its own limits and sms
+    phone = normalize_phone(request.data.get('phone'))
+    logger.debug('otp requested for %s', phone)
+    if not phone:
+        return Response({'message': 'شماره تلفن نامعتبر است'}, status=400)
+
+    # limits are checked in the cache, before the customer query and the sms
+    decision = otp.send_limiter.check({'global': 'all', 'ip': client_ip(request), 'phone': phone})
+    if not decision:
+        return rate_limited(decision)
 
     try:
         patient = Admin.objects.filter(phone=phone,type_user=public_variable.USER_TYPE).first()
         if not patient:
             return Response({'message': 'مشتری با این شماره تلفن یافت نشد'}, status=400)
-        # generate otp
-        otp = ''.join([str(random.randint(0, 9)) for _ in range(5)])
-        otp = '12345'
-        
-        # save otp in cache
-        cache.set(f'patient_otp_{phone}', otp, timeout=120)
+        # generate otp, stored hashed in the cache
+        code = otp.issue(phone)
         
         # send sms
         SmartSms.send_background(
             mobile=phone,
             template='authenticate',
             tokens={
-                'token': otp
+                'token': code
             }
         )
         
@@ -147,14 +222,21 @@ def acme_challenge(request, token):
 @permission_classes([AllowAny])
 def verify_otp(request):
     phone = request.data.get('phone')
-    otp = request.data.get('otp')
+    code = request.data.get('otp')
     
-    if not phone or not otp:
+    if not phone or not code:
         return Response({'message': 'شماره تلفن و کد تایید الزامی است'}, status=400)
+    phone = normalize_phone(phone)
+    if not phone:
+        return Response({'message': 'شماره تلفن نامعتبر است'}, status=400)
 
-    # بررسی کد تایید
-    cached_otp = cache.get(f'patient_otp_{phone}')
-    if not cached_otp or cached_otp != otp:
+    # every guess counts against the limits
+    decision = otp.verify_limiter.check({'global': 'all', 'ip': client_ip(request), 'phone': phone})
+    if not decision:
+        return rate_limited(decision)
+
+    # بررسی کد تایید، کد درست همزمان حذف می‌شود و فقط یک بار قابل استفاده است
+    if not otp.consume(phone, code):
         return Response({'message': 'کد تایید نامعتبر است'}, status=400)
 
     # پیدا کردن یا ایجاد مشتری
@@ -176,14 +258,7 @@ def verify_otp(request):
     access_token['type'] = 'patient'
     access_token['user_id'] = patient.id
     
-    # حذف OTP از کش
-    cache.delete(f'patient_otp_{phone}')
-    
-    print("Generated Token Payload:", {
-        'patient_id': patient.id,
-        'type': 'patient',
-        'user_id': patient.id
-    })
+    logger.debug('patient token issued for %s', patient.id)
     
     return Response({
         'token': str(access_token),
@@ -217,7 +292,6 @@ class PatientProfileAPIView(APIView):
 
           
             
-            print("DDDDDDDDDDDDDDDDDDDDDD")
             return Response({
                 'id': patient.id,
                 'first_name': patient.first_name,
@@ -226,5 +300,34 @@ class PatientProfileAPIView(APIView):
             })
             
         except Exception as e:
-            print(f"Error in patient profile: {str(e)}")
+            logger.exception('error in patient profile')
             return Response({'error': str(e)}, status=500)
+
+
+IMAGE_CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+@require_GET
+def image_variant(request, name):
+    """
+    Serve a generated image variant. The names are content hashed
+    (<stem>.<variant>.<hash>.<format>), so they are cached for a year.
+    """
+    parts = name.split('/')
+    if '..' in parts or len(parts) < 2 or parts[-2] != images.VARIANTS_DIR:
+        raise Http404
+    pieces = parts[-1].rsplit('.', 3)
+    if len(pieces) != 4 or not all(pieces):
+        raise Http404
+    digest, file_format = pieces[-2:]
+    if file_format not in IMAGE_CONTENT_TYPES or not default_storage.exists(name):
+        raise Http404
+
+    etag = f'"{digest}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(default_storage.open(name, 'rb'), content_type=IMAGE_CONTENT_TYPES[file_format])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
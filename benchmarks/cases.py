@@ -0,0 +1,241 @@
+"""
+The requests the endpoint benchmark drives: at least one per URL under
+api/ (see uncovered_url_names), with the ids they need looked up once from
+the seeded data.
+"""
+import datetime
+import io
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from admins import images, otp
+from admins.models import Admin
+from benchmarks.seed import PASSWORD
+from services.importers import COUNT_COLUMN, PRICE_COLUMN, TITLE_COLUMN
+from products.models import Product
+from services import archive
+from services.models import ArchivedService, InvoiceLine, MaterailImportJob, Service, TypeSercie
+from utils import public_variable
+
+OTP = '12345'
+
+
+class Case:
+    """
+    One benchmarked request. `path` and `data` may be callables taking the
+    context. Write cases run in a transaction that is rolled back, so every
+    iteration sees the same data.
+    """
+
+    def __init__(self, name, method, path, auth='admin', data=None, content_type='application/json',
+                 write=False, expected=(200,), iterations=None, headers=None, setup=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.auth = auth
+        self.data = data
+        self.content_type = content_type
+        self.write = write
+        self.expected = expected
+        self.iterations = iterations
+        self.headers = headers
+        self.setup = setup
+
+    def resolve_path(self, context):
+        return self.path(context) if callable(self.path) else self.path
+
+    def request(self, client, context):
+        path = self.resolve_path(context)
+        headers = dict(context['auth'][self.auth]) if self.auth else {}
+        if self.headers:
+            headers.update(self.headers(context))
+        if self.setup:
+            self.setup(context)
+        if self.method == 'get':
+            return client.get(path, headers=headers)
+        data = self.data(context) if callable(self.data) else self.data
+        if self.content_type == 'application/json':
+            data = json.dumps(data)
+            return getattr(client, self.method)(path, data, content_type=self.content_type, headers=headers)
+        return getattr(client, self.method)(path, data, headers=headers)
+
+
+def build_context():
+    """Ids, tokens and headers the cases need, read from the seeded database."""
+    admin = Admin.objects.filter(type_user=public_variable.ADMIN_TYPE, username__startswith='bench_').order_by('id').first()
+    service = Service.objects.exclude(operator=None).exclude(invoice=None).order_by('id').first()
+    if admin is None or service is None:
+        raise LookupError('no benchmark data, run seed_bench first')
+    user, operator = service.user, service.operator
+    line = InvoiceLine.objects.filter(invoice_id=service.invoice_id).order_by('id').first()
+
+    patient_token = AccessToken.for_user(user)
+    patient_token['patient_id'] = user.id
+    patient_token['type'] = 'patient'
+
+    context = {
+        'admin': admin,
+        'user': user,
+        'operator': operator,
+        'service': service,
+        'invoice': service.invoice_id,
+        'line': line.id,
+        'materail': line.material_id,
+        'product': Product.objects.order_by('id').values_list('id', flat=True).first(),
+        'type_service': service.type_service_id or TypeSercie.objects.order_by('id').values_list('id', flat=True).first(),
+        'refresh': str(RefreshToken.for_user(user)),
+        'auth': {
+            'admin': {'Authorization': f'Bearer {AccessToken.for_user(admin)}'},
+            'user': {'Authorization': f'Bearer {AccessToken.for_user(user)}'},
+            'operator': {'Authorization': f'Bearer {AccessToken.for_user(operator)}'},
+            'patient': {'Authorization': f'Token {patient_token}'},
+        },
+    }
+
+    job = MaterailImportJob.objects.filter(user=admin).order_by('id').first()
+    if job is None:
+        job = MaterailImportJob.objects.create(user=admin, file='imports/materails/bench.csv', status=public_variable.IMPORT_DONE)
+    context['job'] = job.id
+
+    # one archived service for the archive read path, moved as if SERVICE_ARCHIVE_AFTER days had passed
+    archived = ArchivedService.objects.order_by('id').values_list('id', flat=True).first()
+    if archived is None:
+        archive.archive_chunk(1, now=timezone.now() + datetime.timedelta(days=settings.SERVICE_ARCHIVE_AFTER))
+        archived = ArchivedService.objects.order_by('id').values_list('id', flat=True).first()
+    context['archived'] = archived
+
+    # one generated avatar variant for the image endpoint
+    if not (admin.img_variants or {}).get('thumb'):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), (30, 120, 200)).save(buffer, 'JPEG')
+        admin.img.save('bench.jpg', io.BytesIO(buffer.getvalue()), save=False)
+        admin.img_variants = images.generate_variants(admin.img.name)
+        Admin.objects.filter(id=admin.id).update(img=admin.img.name, img_variants=admin.img_variants)
+    context['image'] = admin.img_variants['thumb']['webp']
+    assert default_storage.exists(context['image'])
+    return context
+
+
+def import_csv(context):
+    rows = '\n'.join(f'bench import {i},{i},{i * 1000}' for i in range(20))
+    upload = io.BytesIO(f'{TITLE_COLUMN},{COUNT_COLUMN},{PRICE_COLUMN}\n{rows}\n'.encode())
+    upload.name = 'bench.csv'
+    return {'file': upload}
+
+
+def reset_otp_limits(context):
+    # every iteration comes from the same phone and address, start each one below the limits
+    for limiter in (otp.send_limiter, otp.verify_limiter):
+        limiter.reset({'global': 'all', 'ip': '127.0.0.1', 'phone': str(context['user'].phone)})
+
+
+def set_otp(context):
+    reset_otp_limits(context)
+    otp.store(str(context['user'].phone), OTP)
+
+
+def products_etag(context):
+    if 'products_etag' not in context:
+        from django.test import Client
+
+        context['products_etag'] = Client().get('/api/products/list', headers=context['auth']['user'])['ETag']
+    return {'If-None-Match': context['products_etag']}
+
+
+def services_etag(context):
+    if 'services_etag' not in context:
+        from django.test import Client
+
+        response = Client().get('/api/services/?status=1', headers=context['auth']['user'])
+        context['services_etag'] = response['ETag']
+    return {'If-None-Match': context['services_etag']}
+
+
+CASES = [
+    # admins
+    Case('admins.list', 'get', '/api/admins/list?type=1'),
+    Case('admins.list.cursor', 'get', '/api/admins/list?type=2&cursor='),
+    Case('admins.export', 'get', '/api/admins/export', iterations=3),
+    Case('admins.create', 'post', '/api/admins/create/', write=True, expected=(201,),
+         data={'username': 'bench_created', 'password': 'x', 'first_name': 'a', 'last_name': 'b', 'type_user': 2}),
+    Case('admins.detail', 'get', lambda c: f'/api/admins/detail/{c["user"].id}?type=2'),
+    Case('admins.image', 'get', lambda c: f'/api/images/{c["image"]}', auth=None),
+    Case('patient.send_otp', 'post', '/api/patient/send-otp/', auth=None, expected=(200, 400), setup=reset_otp_limits,
+         data=lambda c: {'phone': str(c['user'].phone)}),
+    Case('patient.otp_metrics', 'get', '/api/patient/otp-metrics/'),
+    Case('patient.verify_otp', 'post', '/api/patient/verify-otp/', auth=None, write=True, setup=set_otp,
+         data=lambda c: {'phone': str(c['user'].phone), 'otp': OTP}),
+    Case('patient.profile', 'get', '/api/users/profile/', auth='patient'),
+    Case('patient.profile.async', 'get', '/api/async/users/profile/', auth='patient'),
+    Case('token.obtain', 'post', '/api/token', auth=None, iterations=5,
+         data=lambda c: {'username': c['user'].username, 'password': PASSWORD}),
+    Case('token.refresh', 'post', '/api/token/refresh/', auth=None, data=lambda c: {'refresh': c['refresh']}),
+
+    # materails
+    Case('materails.list', 'get', '/api/materails/'),
+    Case('materails.search', 'get', '/api/materails/?search=%DA%A9%D9%88%D9%84%D8%B1'),
+    Case('materails.detail', 'get', lambda c: f'/api/materails/{c["materail"]}/'),
+    Case('materails.export', 'get', '/api/materails/export/', iterations=3),
+    Case('materails.import', 'post', '/api/materails/import_excel/', write=True, data=import_csv, content_type=None),
+    Case('materails.import_status', 'get', lambda c: f'/api/materails/import_status/{c["job"]}/'),
+
+    # reference catalogs
+    Case('products.list', 'get', '/api/products/list', auth='user'),
+    Case('products.list.not_modified', 'get', '/api/products/list', auth='user', expected=(304,), headers=products_etag),
+    Case('products.detail', 'get', lambda c: f'/api/products/detail/{c["product"]}', auth='user'),
+    Case('type_services.list', 'get', '/api/type_services/'),
+    Case('type_services.detail', 'get', lambda c: f'/api/type_services/{c["type_service"]}/'),
+
+    # invoices
+    Case('invoices.list', 'get', '/api/invoices/', iterations=3),
+    Case('invoices.report', 'get', '/api/invoices/report/?days=366'),
+    Case('invoices.detail', 'get', lambda c: f'/api/invoices/{c["invoice"]}/'),
+    Case('invoice_lines.list', 'get', lambda c: f'/api/invoice_lines/?invoice={c["invoice"]}'),
+    Case('invoice_lines.detail', 'get', lambda c: f'/api/invoice_lines/{c["line"]}/'),
+
+    # services
+    Case('services.list', 'get', '/api/services/'),
+    Case('services.list.status', 'get', '/api/services/?status=1', auth='user'),
+    Case('services.list.not_modified', 'get', '/api/services/?status=1', auth='user', expected=(304,), headers=services_etag),
+    Case('services.list.search', 'get', '/api/services/?search=%DA%A9%D9%88%D9%84%D8%B1'),
+    Case('services.list.cursor', 'get', '/api/services/?cursor='),
+    Case('services.detail', 'get', lambda c: f'/api/services/{c["service"].id}/', auth='user'),
+    Case('services.detail.archived', 'get', lambda c: f'/api/services/{c["archived"]}/', auth='user'),
+    Case('services.me', 'get', '/api/services/me/', auth='user'),
+    Case('services.operator_queue', 'get', '/api/services/services_assigned_to_operator/?is_open=true', auth='operator'),
+    Case('services.export', 'get', '/api/services/export/', iterations=3),
+    Case('services.bulk', 'post', '/api/services/bulk/', write=True,
+         data=lambda c: {'ids': list(Service.objects.filter(user=c['user']).values_list('id', flat=True)[:20]), 'status': 2}),
+    Case('services.dashboard', 'get', '/api/dashboard/services/'),
+    Case('services.time_in_status', 'get', '/api/dashboard/services/time_in_status/?days=366'),
+    Case('services.sla', 'get', '/api/dashboard/services/sla/?days=366'),
+    Case('services.async.list', 'get', '/api/async/services/'),
+    Case('services.async.detail', 'get', lambda c: f'/api/async/services/{c["service"].id}/', auth='user'),
+    Case('services.async.detail.archived', 'get', lambda c: f'/api/async/services/{c["archived"]}/', auth='user'),
+    Case('services.async.me', 'get', '/api/async/services/me/', auth='user'),
+    Case('services.async.operator_queue', 'get', '/api/async/services/services_assigned_to_operator/?is_open=true', auth='operator'),
+]
+
+
+def url_names(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield prefix + str(pattern.pattern), pattern.name
+
+
+def uncovered_url_names(context, cases=CASES):
+    """Named api/ URLs no case requests (the django admin site is not benchmarked)."""
+    covered = {resolve(case.resolve_path(context).split('?')[0]).url_name for case in cases}
+    return sorted({
+        name for route, name in url_names(get_resolver().url_patterns)
+        if route.startswith('api/') and name not in covered
+    })
@@ -0,0 +1,156 @@
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from benchmarks.cases import CASES, build_context, uncovered_url_names
+from services.models import Service
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+class Command(BaseCommand):
+    help = 'Time every API endpoint against the seeded benchmark database and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--case', action='append', default=[], help='only run cases whose name starts with this (repeatable)')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--write-baseline', action='store_true', help='store the results as the new baseline')
+        parser.add_argument('--check', action='store_true', help='fail when a case regressed against the baseline')
+        parser.add_argument('--latency-tolerance', type=float, default=2.0, help='allowed p50 ratio against the baseline')
+        parser.add_argument('--latency-floor', type=float, default=5.0, help='p50 growth in ms that is never a regression')
+        parser.add_argument('--memory-tolerance', type=float, default=1.5, help='allowed peak memory ratio against the baseline')
+        parser.add_argument('--json', help='also write the results to this file')
+
+    def handle(self, *args, **options):
+        context = build_context()
+        cases = [case for case in CASES if not options['case'] or case.name.startswith(tuple(options['case']))]
+        if not cases:
+            raise CommandError('no case matches')
+
+        uncovered = uncovered_url_names(context)
+        if uncovered and not options['case']:
+            self.stdout.write(self.style.WARNING(f'endpoints without a case: {", ".join(uncovered)}'))
+
+        results = {}
+        client = Client(raise_request_exception=False)
+        self.stdout.write(f'{"case":<34} {"status":>6} {"queries":>7} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8} {"peak KiB":>9}')
+        for case in cases:
+            results[case.name] = result = self.run_case(client, case, context, options)
+            self.stdout.write(
+                f'{case.name:<34} {result["status"]:>6} {result["queries"]:>7} {result["p50_ms"]:>8.2f} '
+                f'{result["p95_ms"]:>8.2f} {result["max_ms"]:>8.2f} {result["peak_kib"]:>9.0f}'
+            )
+
+        report = {
+            'meta': {
+                'vendor': connection.vendor,
+                'services': Service.objects.count(),
+                'iterations': options['iterations'],
+            },
+            'cases': results,
+        }
+        if options['json']:
+            Path(options['json']).write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+
+        failures = [f'{name}: status {result["status"]}' for name, result in results.items() if not result['ok']]
+        baseline_path = Path(options['baseline'])
+        if options['write_baseline']:
+            if failures:
+                raise CommandError('not writing a baseline with failing cases:\n' + '\n'.join(failures))
+            if options['case'] and baseline_path.exists():
+                # partial run, keep the other cases of the existing baseline
+                stored = json.loads(baseline_path.read_text())
+                stored['cases'].update(results)
+                report['cases'] = stored['cases']
+            baseline_path.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'baseline written to {baseline_path}'))
+        elif options['check']:
+            if not baseline_path.exists():
+                raise CommandError(f'no baseline at {baseline_path}, run with --write-baseline first')
+            failures += self.compare(json.loads(baseline_path.read_text()), report, options)
+
+        if failures:
+            raise CommandError(f'{len(failures)} regression(s):\n' + '\n'.join(failures))
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS('no regressions'))
+
+    def request(self, client, case, context):
+        if not case.write:
+            return self.send(client, case, context)
+        # write cases leave nothing behind, every iteration sees the same rows
+        with transaction.atomic():
+            response = self.send(client, case, context)
+            transaction.set_rollback(True)
+        return response
+
+    def send(self, client, case, context):
+        response = case.request(client, context)
+        if response.streaming:
+            # exports do their queries while the body is consumed
+            b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    def run_case(self, client, case, context, options):
+        for _ in range(options['warmup']):
+            self.request(client, case, context)
+
+        timings, queries, statuses = [], 0, set()
+        for _ in range(case.iterations or options['iterations']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, case, context)
+                timings.append((time.perf_counter() - started) * 1000)
+            # the savepoint statements of write cases are not the endpoint's
+            queries = max(queries, len([query for query in captured if 'SAVEPOINT' not in query['sql']]))
+            statuses.add(response.status_code)
+
+        tracemalloc.start()
+        try:
+            self.request(client, case, context)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'ok': statuses <= set(case.expected),
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'max_ms': round(max(timings), 3),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def compare(self, baseline, report, options):
+        failures = []
+        if baseline['meta']['vendor'] != report['meta']['vendor'] or baseline['meta']['services'] != report['meta']['services']:
+            self.stdout.write(self.style.WARNING(
+                f'baseline was measured on {baseline["meta"]["vendor"]} with {baseline["meta"]["services"]} services, '
+                f'this run on {report["meta"]["vendor"]} with {report["meta"]["services"]}'
+            ))
+        for name, result in report['cases'].items():
+            before = baseline['cases'].get(name)
+            if before is None:
+                self.stdout.write(self.style.WARNING(f'{name}: not in the baseline'))
+                continue
+            if result['queries'] > before['queries']:
+                failures.append(f'{name}: {result["queries"]} queries, baseline {before["queries"]}')
+            allowed = max(before['p50_ms'] * options['latency_tolerance'], before['p50_ms'] + options['latency_floor'])
+            if result['p50_ms'] > allowed:
+                failures.append(f'{name}: p50 {result["p50_ms"]:.2f}ms, baseline {before["p50_ms"]:.2f}ms')
+            if result['peak_kib'] > max(before['peak_kib'] * options['memory_tolerance'], before['peak_kib'] + 64):
+                failures.append(f'{name}: peak {result["peak_kib"]:.0f}KiB, baseline {before["peak_kib"]:.0f}KiB')
+        return failures
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from admins.models import Admin
+from benchmarks.seed import seed, sizes
+from services.models import Service
+
+
+class Command(BaseCommand):
+    help = 'Fill the benchmark database with a deterministic dataset (run with --settings benchmarks.settings)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=10000, help='number of services, other tables are sized from it')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--flush', action='store_true', help='empty the database first')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+        elif Admin.objects.exists() or Service.objects.exists():
+            raise CommandError('the database is not empty, pass --flush to replace its data')
+
+        self.stdout.write(f'seeding {sizes(options["scale"])}')
+        started = time.perf_counter()
+        seed(options['scale'], random_seed=options['seed'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'done in {time.perf_counter() - started:.1f}s'))
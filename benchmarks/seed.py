@@ -0,0 +1,171 @@
+"""
+Deterministic data generators for the endpoint benchmarks. Everything is
+derived from one scale (the number of services) and one random seed, so two
+databases seeded with the same arguments hold the same rows.
+"""
+import contextlib
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from admins.models import Admin
+from products.models import Product
+from services import counters
+from services.models import Invoice, InvoiceLine, Materail, Service, TypeSercie
+from utils import public_variable
+from utils.persian import normalize_text
+
+BATCH_SIZE = 5000
+EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+PASSWORD = 'bench-password'
+WORDS = ['لوله', 'شیر', 'پمپ', 'کابل', 'فیلتر', 'موتور', 'برد', 'سنسور', 'یخچال', 'کولر', 'پکیج', 'آبگرمکن',
+         'ترموستات', 'کمپرسور', 'خازن', 'فن', 'تسمه', 'واشر', 'بلبرینگ', 'رله']
+
+
+def sizes(scale):
+    """Row counts per model for a given number of services."""
+    return {
+        'admins': 5,
+        'operators': max(scale // 200, 5),
+        'users': max(scale // 10, 10),
+        'type_services': 10,
+        'materails': max(scale // 10, 10),
+        'products': max(scale // 10, 10),
+        'invoices': max(scale // 4, 10),
+        'services': scale,
+    }
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the generated created/updated values instead of now()."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def timestamp(rng, days=365):
+    return EPOCH + datetime.timedelta(seconds=rng.randint(0, days * 24 * 3600))
+
+
+def title(rng, count=3):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def create(model, rows):
+    for batch in batched(rows):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+
+
+def seed(scale, random_seed=0, stdout=None):
+    rng = random.Random(random_seed)
+    counts = sizes(scale)
+    write = stdout.write if stdout else (lambda message: None)
+    password = make_password(PASSWORD)
+
+    with explicit_timestamps(Admin, Materail, Invoice, Service):
+        def admins():
+            for kind, type_user, count in (
+                ('admin', public_variable.ADMIN_TYPE, counts['admins']),
+                ('operator', public_variable.REPAIRE_MEN_TYPE, counts['operators']),
+                ('user', public_variable.USER_TYPE, counts['users']),
+            ):
+                for i in range(count):
+                    created = timestamp(rng)
+                    yield Admin(
+                        username=f'bench_{kind}_{i}', password=password, type_user=type_user,
+                        first_name=f'{kind} {i}', last_name=title(rng, 1),
+                        phone=f'+98912{i:07d}' if type_user == public_variable.USER_TYPE else None,
+                        created=created, updated_at=created, img_variants={},
+                    )
+        create(Admin, admins())
+        write(f'admins: {Admin.objects.count()}\n')
+
+        create(TypeSercie, (TypeSercie(title=title(rng, 2), code=i) for i in range(counts['type_services'])))
+
+        def materails():
+            for i in range(counts['materails']):
+                created = timestamp(rng)
+                name = f'{title(rng)} {i}'
+                yield Materail(
+                    title=name, search_title=normalize_text(name), count=rng.randint(0, 500),
+                    price=Decimal(rng.randint(1000, 5000000)), created_at=created, updated_at=created,
+                )
+        create(Materail, materails())
+
+        create(Product, (
+            Product(title=f'{title(rng)} {i}', code=i, price=Decimal(rng.randint(1000, 5000000)), desc=title(rng, 8))
+            for i in range(counts['products'])
+        ))
+        write(f'materails: {counts["materails"]}, products: {counts["products"]}\n')
+
+        prices = dict(Materail.objects.values_list('id', 'price'))
+        material_ids = sorted(prices)
+        lines_by_invoice = [
+            [(material_id, rng.randint(1, 5)) for material_id in rng.sample(material_ids, min(3, len(material_ids)))]
+            for _ in range(counts['invoices'])
+        ]
+
+        def invoices():
+            for lines in lines_by_invoice:
+                created = timestamp(rng)
+                total = sum(prices[material_id] * quantity for material_id, quantity in lines)
+                yield Invoice(created_at=created, updated_at=created, total=total)
+        create(Invoice, invoices())
+        invoice_ids = list(Invoice.objects.order_by('id').values_list('id', flat=True))
+
+        create(InvoiceLine, (
+            InvoiceLine(invoice_id=invoice_id, material_id=material_id, quantity=quantity, unit_price=prices[material_id])
+            for invoice_id, lines in zip(invoice_ids, lines_by_invoice)
+            for material_id, quantity in lines
+        ))
+        write(f'invoices: {len(invoice_ids)}\n')
+
+        user_ids = list(Admin.objects.filter(type_user=public_variable.USER_TYPE).order_by('id').values_list('id', flat=True))
+        operator_ids = list(Admin.objects.filter(type_user=public_variable.REPAIRE_MEN_TYPE).order_by('id').values_list('id', flat=True))
+        type_ids = list(TypeSercie.objects.order_by('id').values_list('id', flat=True))
+        statuses = [code for code, _ in public_variable.ServiceStatus]
+
+        def services():
+            for i in range(counts['services']):
+                created = timestamp(rng)
+                name, desc = f'{title(rng)} {i}', title(rng, 10)
+                yield Service(
+                    title=name, desc=desc, search_text=normalize_text(f'{name} {desc}'),
+                    user_id=rng.choice(user_ids),
+                    operator_id=rng.choice(operator_ids) if rng.random() < 0.8 else None,
+                    type_service_id=rng.choice(type_ids),
+                    status=public_variable.SERVICE_DONE if rng.random() < 0.7 else rng.choice(statuses),
+                    invoice_id=rng.choice(invoice_ids) if rng.random() < 0.5 else None,
+                    created_at=created, updated_at=created + datetime.timedelta(hours=rng.randint(0, 72)),
+                )
+        create(Service, services())
+        write(f'services: {counts["services"]}\n')
+
+    # bulk_create bypasses Service.save, rebuild the dashboard counters in one go
+    counters.reconcile()
+    return counts
@@ -0,0 +1,61 @@
+"""
+Settings for the endpoint benchmarks: the project settings with every
+network dependency (redis, celery broker, sms provider, replicas) replaced
+by an in-process equivalent, on sqlite by default.
+
+    DJANGO_SETTINGS_MODULE=benchmarks.settings python manage.py migrate
+    DJANGO_SETTINGS_MODULE=benchmarks.settings python manage.py seed_bench --scale 10000
+    DJANGO_SETTINGS_MODULE=benchmarks.settings python manage.py bench_endpoints --check
+
+BENCH_DATABASE=postgres uses a local postgres instead (BENCH_DB_NAME,
+BENCH_DB_USER, BENCH_DB_PASSWORD, BENCH_DB_HOST, BENCH_DB_PORT).
+
+The tests run with these settings too:
+
+    DJANGO_SETTINGS_MODULE=benchmarks.settings python manage.py test
+"""
+import os
+
+from cs_crm.settings import *  # noqa: F401,F403
+from cs_crm.settings import BASE_DIR, INSTALLED_APPS
+
+INSTALLED_APPS = INSTALLED_APPS + ['benchmarks']
+
+if os.environ.get('BENCH_DATABASE', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BENCH_DB_NAME', 'crm_bench'),
+            'USER': os.environ.get('BENCH_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BENCH_DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('BENCH_DB_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_SQLITE_PATH', str(BASE_DIR / 'bench.sqlite3')),
+        }
+    }
+# a replica alias for the routing tests, the same database under another
+# connection; nothing is routed to it unless DATABASE_REPLICAS lists it
+DATABASES['replica'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_BROKER_URL = 'memory://'
+CELERY_RESULT_BACKEND = 'cache+memory://'
+SMS_PROVIDER = 'campaigns.providers.FakeProvider'
+MEDIA_ROOT = os.environ.get('BENCH_MEDIA_ROOT', str(BASE_DIR / 'bench_media'))
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
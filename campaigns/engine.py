@@ -0,0 +1,128 @@
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from campaigns.models import SmsCampaign, SmsRecipient
+from campaigns.providers import TokenBucket, get_provider
+from utils import public_variable
+from utils.persian import normalize_digits
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_mobile(mobile):
+    """
+    Return an iranian mobile number as 09xxxxxxxxx, or None when it is not one.
+    Accepts +98 / 0098 / 98 prefixes, persian digits and separators.
+    """
+    digits = NON_DIGITS.sub('', normalize_digits(str(mobile)))
+    if digits.startswith('0098'):
+        digits = digits[4:]
+    elif digits.startswith('98') and len(digits) == 12:
+        digits = digits[2:]
+    if digits.startswith('0'):
+        digits = digits[1:]
+    if len(digits) != 10 or not digits.startswith('9'):
+        return None
+    return '0' + digits
+
+
+def unique_mobiles(mobiles):
+    """Normalize and dedupe in one pass, keeping the first-seen order."""
+    normalized = (normalize_mobile(mobile) for mobile in mobiles)
+    return list(dict.fromkeys(mobile for mobile in normalized if mobile))
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def create_campaign(mobiles, message=None, template=None, tokens=None):
+    mobiles = unique_mobiles(mobiles)
+    with transaction.atomic():
+        campaign = SmsCampaign.objects.create(
+            message=message,
+            template=template,
+            tokens=tokens or {},
+            total_count=len(mobiles),
+        )
+        SmsRecipient.objects.bulk_create(
+            (SmsRecipient(campaign=campaign, mobile=mobile) for mobile in mobiles),
+            batch_size=1000,
+        )
+    return campaign, mobiles
+
+
+def start_campaign(mobiles, message=None, template=None, tokens=None):
+    """Create the campaign and queue a single task that sends all of it."""
+    from campaigns.tasks import send_campaign
+
+    campaign, mobiles = create_campaign(mobiles, message=message, template=template, tokens=tokens)
+    transaction.on_commit(lambda: send_campaign.delay(campaign.id))
+    return campaign, mobiles
+
+
+def _record_results(recipients, results, sent_at):
+    by_mobile = {result.mobile: result for result in results}
+    sent = failed = 0
+    for recipient in recipients:
+        result = by_mobile.get(recipient.mobile)
+        if result is not None and result.ok:
+            recipient.status = public_variable.SMS_SENT
+            recipient.message_id = result.message_id
+            sent += 1
+        else:
+            recipient.status = public_variable.SMS_FAILED
+            failed += 1
+        recipient.status_text = result.status_text if result else None
+        recipient.sent_at = sent_at
+    SmsRecipient.objects.bulk_update(recipients, ['status', 'message_id', 'status_text', 'sent_at'])
+    return sent, failed
+
+
+def run_campaign(campaign_id, provider=None, bucket=None):
+    """
+    Send every pending recipient of a campaign in provider-sized chunks,
+    throttled by a token bucket, recording delivery status per chunk.
+    """
+    provider = provider or get_provider()
+    bucket = bucket or TokenBucket(settings.SMS_SEND_RATE, settings.SMS_SEND_BURST)
+    chunk_size = min(settings.SMS_CHUNK_SIZE, provider.max_receptors)
+
+    campaign = SmsCampaign.objects.get(id=campaign_id)
+    SmsCampaign.objects.filter(id=campaign_id).update(status=public_variable.CAMPAIGN_RUNNING)
+
+    last_id = 0
+    while True:
+        recipients = list(
+            SmsRecipient.objects
+            .filter(campaign_id=campaign_id, status=public_variable.SMS_PENDING, id__gt=last_id)
+            .order_by('id')
+            .only('id', 'mobile')[:chunk_size]
+        )
+        if not recipients:
+            break
+        last_id = recipients[-1].id
+        mobiles = [recipient.mobile for recipient in recipients]
+
+        if campaign.message:
+            bucket.acquire()
+            results = provider.send_bulk(mobiles, campaign.message)
+        else:
+            # template (lookup) messages only take one receptor per call
+            results = []
+            for mobile in mobiles:
+                bucket.acquire()
+                results.append(provider.send_lookup(mobile, campaign.template, campaign.tokens))
+
+        sent, failed = _record_results(recipients, results, timezone.now())
+        SmsCampaign.objects.filter(id=campaign_id).update(
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed,
+        )
+
+    SmsCampaign.objects.filter(id=campaign_id).update(status=public_variable.CAMPAIGN_DONE)
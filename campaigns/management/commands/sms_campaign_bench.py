@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from campaigns.engine import create_campaign, run_campaign
+from campaigns.models import SmsCampaign
+from campaigns.providers import FakeProvider, TokenBucket
+
+
+class Command(BaseCommand):
+    help = 'Run a campaign against the fake provider and report throughput (offline)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=20000)
+        parser.add_argument('--duplicates', type=float, default=0.1, help='share of duplicated numbers in the input')
+        parser.add_argument('--rate', type=float, default=1000, help='provider calls per second')
+        parser.add_argument('--latency', type=float, default=0, help='fake provider latency per call (seconds)')
+        parser.add_argument('--template', default=None, help='send as lookup template instead of bulk message')
+        parser.add_argument('--keep', action='store_true', help='keep the campaign rows')
+
+    def handle(self, *args, **options):
+        count = options['recipients']
+        unique = int(count * (1 - options['duplicates'])) or 1
+        mobiles = [f'+98912{i % unique:07d}' for i in range(count)]
+
+        started = time.perf_counter()
+        campaign, clean = create_campaign(
+            mobiles,
+            message=None if options['template'] else 'benchmark',
+            template=options['template'],
+        )
+        created = time.perf_counter()
+
+        provider = FakeProvider(latency=options['latency'])
+        run_campaign(campaign.id, provider=provider, bucket=TokenBucket(options['rate']))
+        finished = time.perf_counter()
+
+        campaign.refresh_from_db()
+        self.stdout.write(f'input numbers:      {count}')
+        self.stdout.write(f'unique recipients:  {len(clean)}')
+        self.stdout.write(f'provider calls:     {len(provider.calls)}')
+        self.stdout.write(f'sent / failed:      {campaign.sent_count} / {campaign.failed_count}')
+        self.stdout.write(f'create campaign:    {created - started:.3f}s')
+        self.stdout.write(f'send:               {finished - created:.3f}s '
+                          f'({len(clean) / max(finished - created, 1e-9):.0f} recipients/s)')
+
+        if not options['keep']:
+            SmsCampaign.objects.filter(id=campaign.id).delete()
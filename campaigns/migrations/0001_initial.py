@@ -0,0 +1,49 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmsCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('template', models.CharField(blank=True, max_length=100, null=True)),
+                ('tokens', models.JSONField(default=dict)),
+                ('status', models.IntegerField(choices=[(0, 'در صف'), (1, 'در حال ارسال'), (2, 'پایان یافته')], default=0)),
+                ('total_count', models.IntegerField(default=0)),
+                ('sent_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'sms_campaigns',
+            },
+        ),
+        migrations.CreateModel(
+            name='SmsRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mobile', models.CharField(max_length=20)),
+                ('status', models.IntegerField(choices=[(0, 'در صف'), (1, 'ارسال شد'), (2, 'ناموفق')], default=0)),
+                ('message_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('status_text', models.CharField(blank=True, max_length=255, null=True)),
+                ('sent_at', models.DateTimeField(null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='campaigns.smscampaign')),
+            ],
+            options={
+                'db_table': 'sms_recipients',
+                'unique_together': {('campaign', 'mobile')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import models
+from utils import public_variable
+# Create your models here.
+
+
+class SmsCampaign(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    message = models.TextField(null=True, blank=True)
+    template = models.CharField(max_length=100, null=True, blank=True)
+    tokens = models.JSONField(default=dict)
+    status = models.IntegerField(choices=public_variable.CampaignStatus, default=public_variable.CAMPAIGN_PENDING)
+    total_count = models.IntegerField(default=0)
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    class Meta:
+        db_table = 'sms_campaigns'
+
+
+class SmsRecipient(models.Model):
+    campaign = models.ForeignKey(SmsCampaign, on_delete=models.CASCADE, related_name='recipients')
+    mobile = models.CharField(max_length=20)
+    status = models.IntegerField(choices=public_variable.SmsStatus, default=public_variable.SMS_PENDING)
+    message_id = models.CharField(max_length=50, null=True, blank=True)
+    status_text = models.CharField(max_length=255, null=True, blank=True)
+    sent_at = models.DateTimeField(null=True)
+    class Meta:
+        db_table = 'sms_recipients'
+        unique_together = ('campaign', 'mobile')
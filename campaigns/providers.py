@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SendResult:
+    def __init__(self, mobile, ok, message_id=None, status_text=None):
+        self.mobile = mobile
+        self.ok = ok
+        self.message_id = message_id
+        self.status_text = status_text
+
+
+class TokenBucket:
+    """Allow `rate` calls per second with bursts of up to `capacity` calls."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class BaseProvider:
+    # max receptors per bulk send call
+    max_receptors = 200
+
+    def send_bulk(self, mobiles, message):
+        raise NotImplementedError
+
+    def send_lookup(self, mobile, template, tokens):
+        raise NotImplementedError
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """One pooled HTTP session per process, shared by every campaign."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # sends are paid and not idempotent: retry only connection errors raised before the
+            # request went out, never a read timeout or 5xx after the provider may have accepted it
+            retry = Retry(total=3, connect=3, read=0, status=0, other=0, backoff_factor=0.5)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+class KavenegarProvider(BaseProvider):
+    base_url = 'https://api.kavenegar.com/v1'
+    timeout = 10
+
+    def __init__(self, api_key=None, sender=None):
+        self.api_key = api_key or settings.KAVENEGAR_API_KEY
+        if not self.api_key:
+            # fail the task before any recipient is marked failed, they stay pending for a later run
+            raise ImproperlyConfigured('KAVENEGAR_API_KEY is not set')
+        self.sender = sender or settings.SMS_SENDER
+        self.session = get_session()
+
+    def _post(self, method, params):
+        response = self.session.post(f'{self.base_url}/{self.api_key}/{method}.json', data=params, timeout=self.timeout)
+        payload = response.json()
+        status = payload.get('return', {}).get('status')
+        return status, payload.get('return', {}).get('message'), payload.get('entries') or []
+
+    def send_bulk(self, mobiles, message):
+        params = {'receptor': ','.join(mobiles), 'message': message}
+        if self.sender:
+            params['sender'] = self.sender
+        try:
+            status, text, entries = self._post('sms/send', params)
+        except (requests.RequestException, ValueError) as e:
+            return [SendResult(mobile, False, status_text=str(e)) for mobile in mobiles]
+        if status != 200:
+            return [SendResult(mobile, False, status_text=text) for mobile in mobiles]
+        by_mobile = {str(entry.get('receptor')): entry for entry in entries}
+        results = []
+        for mobile in mobiles:
+            entry = by_mobile.get(mobile)
+            if entry is None:
+                results.append(SendResult(mobile, False, status_text=text))
+            else:
+                results.append(SendResult(mobile, True, str(entry.get('messageid')), entry.get('statustext')))
+        return results
+
+    def send_lookup(self, mobile, template, tokens):
+        params = {'receptor': mobile, 'template': template, 'type': 'sms'}
+        params.update(tokens)
+        try:
+            status, text, entries = self._post('verify/lookup', params)
+        except (requests.RequestException, ValueError) as e:
+            return SendResult(mobile, False, status_text=str(e))
+        if status != 200 or not entries:
+            return SendResult(mobile, False, status_text=text)
+        return SendResult(mobile, True, str(entries[0].get('messageid')), entries[0].get('statustext'))
+
+
+class FakeProvider(BaseProvider):
+    """
+    Offline provider for development and benchmarks. Records every call and
+    can simulate per-call latency and a random failure rate.
+    """
+
+    def __init__(self, latency=0, failure_rate=0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = []
+        self._next_id = 0
+
+    def _result(self, mobile):
+        self._next_id += 1
+        if self.random.random() < self.failure_rate:
+            return SendResult(mobile, False, status_text='fake failure')
+        return SendResult(mobile, True, str(self._next_id), 'fake sent')
+
+    def send_bulk(self, mobiles, message):
+        self.calls.append(('send', list(mobiles), message))
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._result(mobile) for mobile in mobiles]
+
+    def send_lookup(self, mobile, template, tokens):
+        self.calls.append(('lookup', mobile, template))
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(mobile)
+
+
+def get_provider():
+    return import_string(settings.SMS_PROVIDER)()
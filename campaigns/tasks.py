@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from campaigns.engine import run_campaign
+
+
+@shared_task()
+def send_campaign(campaign_id):
+    run_campaign(campaign_id)
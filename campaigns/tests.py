@@ -0,0 +1,135 @@
+from unittest import mock
+
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from campaigns import engine
+from campaigns.models import SmsCampaign, SmsRecipient
+from campaigns.providers import FakeProvider, KavenegarProvider, TokenBucket, get_session
+from utils import public_variable
+
+
+class NormalizeMobileTests(SimpleTestCase):
+    def test_variants(self):
+        for mobile in ['09121234567', '9121234567', '+98 912 123 4567', '0098-912-123-4567', '989121234567', '۰۹۱۲۱۲۳۴۵۶۷']:
+            with self.subTest(mobile=mobile):
+                self.assertEqual(engine.normalize_mobile(mobile), '09121234567')
+        for mobile in ['', '0212345678', '091212345', 'abc']:
+            with self.subTest(mobile=mobile):
+                self.assertIsNone(engine.normalize_mobile(mobile))
+
+    def test_unique_keeps_the_first_seen_order(self):
+        self.assertEqual(
+            engine.unique_mobiles(['09350000000', '+989121234567', 'bad', '09121234567', '۰۹۳۵۰۰۰۰۰۰۰']),
+            ['09350000000', '09121234567'],
+        )
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_waits_for_tokens(self):
+        clock = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        bucket = TokenBucket(2, capacity=3, clock=lambda: clock[0], sleep=sleep)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(sleeps, [])
+        bucket.acquire()
+        self.assertEqual(sleeps, [0.5])
+        clock[0] += 10
+        # refills up to the capacity only
+        for _ in range(3):
+            bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(sleeps, [0.5, 0.5])
+
+
+@override_settings(SMS_CHUNK_SIZE=2, SMS_SEND_RATE=1000, SMS_SEND_BURST=1000)
+class RunCampaignTests(TestCase):
+    mobiles = ['09121234567', '+98 912 123 4567', '09121234568', '09121234569', '۰۹۱۲۱۲۳۴۵۷۰', 'bad']
+
+    def test_bulk_messages_in_chunks(self):
+        campaign, mobiles = engine.create_campaign(self.mobiles, message='سلام')
+        self.assertEqual(mobiles, ['09121234567', '09121234568', '09121234569', '09121234570'])
+        provider = FakeProvider()
+        engine.run_campaign(campaign.id, provider=provider)
+
+        self.assertEqual(provider.calls, [
+            ('send', ['09121234567', '09121234568'], 'سلام'),
+            ('send', ['09121234569', '09121234570'], 'سلام'),
+        ])
+        campaign.refresh_from_db()
+        self.assertEqual(
+            (campaign.status, campaign.total_count, campaign.sent_count, campaign.failed_count),
+            (public_variable.CAMPAIGN_DONE, 4, 4, 0),
+        )
+        self.assertFalse(SmsRecipient.objects.exclude(status=public_variable.SMS_SENT).exists())
+        self.assertEqual(sorted(SmsRecipient.objects.values_list('message_id', flat=True)), ['1', '2', '3', '4'])
+
+        # only pending recipients are sent: a second run sends nothing
+        engine.run_campaign(campaign.id, provider=provider)
+        self.assertEqual(len(provider.calls), 2)
+
+    def test_lookups_one_number_per_call(self):
+        campaign, _ = engine.create_campaign(self.mobiles[:3], template='authenticate', tokens={'token': '1'})
+        provider = FakeProvider()
+        bucket = mock.Mock()
+        engine.run_campaign(campaign.id, provider=provider, bucket=bucket)
+        self.assertEqual(provider.calls, [('lookup', '09121234567', 'authenticate'), ('lookup', '09121234568', 'authenticate')])
+        self.assertEqual(bucket.acquire.call_count, 2)
+
+    def test_failures_are_recorded(self):
+        campaign, _ = engine.create_campaign(self.mobiles, message='سلام')
+        engine.run_campaign(campaign.id, provider=FakeProvider(failure_rate=1))
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.sent_count, campaign.failed_count), (0, 4))
+        self.assertEqual(set(SmsRecipient.objects.values_list('status', 'status_text')), {(public_variable.SMS_FAILED, 'fake failure')})
+
+    @override_settings(SMS_PROVIDER='campaigns.providers.FakeProvider')
+    def test_start_sends_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            campaign, _ = engine.start_campaign(self.mobiles, message='سلام')
+            self.assertEqual(SmsCampaign.objects.get().status, public_variable.CAMPAIGN_PENDING)
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count), (public_variable.CAMPAIGN_DONE, 4))
+
+
+class KavenegarProviderTests(SimpleTestCase):
+    def provider(self, response=None, error=None):
+        provider = KavenegarProvider(api_key='key')
+        provider.session = mock.Mock()
+        if error:
+            provider.session.post.side_effect = error
+        else:
+            provider.session.post.return_value.json.return_value = response
+        return provider
+
+    def test_results_per_receptor(self):
+        provider = self.provider({
+            'return': {'status': 200, 'message': 'تایید شد'},
+            'entries': [{'receptor': '09121234567', 'messageid': 8, 'statustext': 'در صف ارسال'}],
+        })
+        results = provider.send_bulk(['09121234567', '09121234568'], 'سلام')
+        self.assertEqual([(result.ok, result.message_id) for result in results], [(True, '8'), (False, None)])
+        self.assertEqual(provider.session.post.call_args.kwargs['data']['receptor'], '09121234567,09121234568')
+
+    def test_errors_fail_every_receptor(self):
+        for provider in [self.provider(error=requests.ConnectionError('down')), self.provider({'return': {'status': 418, 'message': 'اعتبار کافی نیست'}})]:
+            results = provider.send_bulk(['09121234567', '09121234568'], 'سلام')
+            self.assertEqual([result.ok for result in results], [False, False])
+            self.assertFalse(provider.send_lookup('09121234567', 'authenticate', {'token': '1'}).ok)
+
+    def test_retries_only_connection_errors(self):
+        # a read timeout or a 5xx may come after the provider accepted a paid send
+        retry = get_session().get_adapter('https://api.kavenegar.com').max_retries
+        self.assertEqual((retry.connect, retry.read, retry.status, retry.other), (3, 0, 0, 0))
+
+    @override_settings(KAVENEGAR_API_KEY='')
+    def test_requires_an_api_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            KavenegarProvider()
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cs_crm.settings')
 
-application = get_asgi_application()
+# initialise django before anything imports models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from admins.authentication import JWTQueryStringAuthMiddleware  # noqa: E402
+from services.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        JWTQueryStringAuthMiddleware(URLRouter(websocket_urlpatterns))
+    ),
+})
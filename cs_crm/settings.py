@@ -31,27 +31,34 @@ ALLOWED_HOSTS = ['127.0.0.1']
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'corsheaders',
     'rest_framework_simplejwt',
     'rest_framework',
+    'django_filters',
+    'channels',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'admins',
     'products',
-    'services'
+    'services',
+    'campaigns',
 ]
 
 MIDDLEWARE = [
+    'utils.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -117,6 +124,19 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma separated hosts, e.g. DATABASE_REPLICA_HOSTS=10.0.0.2,10.0.0.3
+# Safe (GET/HEAD/OPTIONS) requests read from a healthy replica, writes and
+# clients that wrote in the last REPLICA_STICKY_SECONDS stay on default.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+REPLICA_RETRY_AFTER = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -154,6 +174,134 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Cache: per-process L1 in front of redis, kept consistent through pub/sub
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'utils.cache.TwoTierCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 5000,
+            'L1_TIMEOUT': 30,
+        },
+    }
+}
+
+# Channels: websocket push of service status / operator changes
+ASGI_APPLICATION = 'cs_crm.asgi.application'
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [os.environ.get('CHANNEL_REDIS_URL', 'redis://127.0.0.1:6379/2')],
+        },
+    }
+}
+
+# Celery
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://127.0.0.1:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-service-counters': {
+        'task': 'services.tasks.reconcile_service_counters',
+        # full scans of services, only a safety net for drift
+        'schedule': datetime.timedelta(days=1),
+    },
+    'snapshot-stock': {
+        'task': 'services.tasks.snapshot_stock',
+        'schedule': datetime.timedelta(minutes=15),
+    },
+    'rollup-service-status': {
+        'task': 'services.tasks.rollup_service_status',
+        'schedule': datetime.timedelta(minutes=10),
+    },
+    'archive-services': {
+        'task': 'services.tasks.archive_services',
+        'schedule': datetime.timedelta(hours=6),
+    },
+}
+
+# Target time (seconds) a service should spend at most in a status, for the
+# SLA report; keys are public_variable.ServiceStatus codes
+SERVICE_STATUS_SLA = {
+    0: 4 * 3600,    # در حال پیگیری
+    1: 24 * 3600,   # اعزام تکنسین
+    2: 72 * 3600,   # انجام تعمیرات
+}
+
+# services.stock.take_snapshot waits at most this many seconds for the
+# stock writes in flight to commit, and skips the run otherwise
+STOCK_SNAPSHOT_WAIT = 30
+
+# Finished services untouched for this many days are moved to the
+# services_archive table (services.archive), this many per transaction
+SERVICE_ARCHIVE_AFTER = 180
+SERVICE_ARCHIVE_CHUNK = 500
+
+# Materail import: uploads up to this size are imported inside the request,
+# larger ones are queued as a background job
+MATERAIL_IMPORT_SYNC_MAX_BYTES = 256 * 1024
+MATERAIL_IMPORT_CHUNK_SIZE = 1000
+
+# SMS campaigns; the key comes from the environment only, campaigns refuse to start without it
+KAVENEGAR_API_KEY = os.environ.get('KAVENEGAR_API_KEY', '')
+SMS_SENDER = os.environ.get('SMS_SENDER', '')
+SMS_PROVIDER = 'campaigns.providers.KavenegarProvider'
+SMS_CHUNK_SIZE = 200  # kavenegar accepts up to 200 receptors per send call
+SMS_SEND_RATE = 10  # provider calls per second
+SMS_SEND_BURST = 10
+
+# List endpoints render values() rows through the compiled serializers
+# (utils.compiled_serializer) instead of DRF serializer instances
+COMPILED_SERIALIZERS = True
+
+# Patient OTP (admins.otp): codes are stored hashed for OTP_TIMEOUT seconds.
+# OTP_FIXED_CODE sends the same code every time, for development only.
+OTP_TIMEOUT = 120
+OTP_LENGTH = 5
+OTP_FIXED_CODE = os.environ.get('OTP_FIXED_CODE', '')
+# Sliding window limits (utils.ratelimit), {scope: (requests, window seconds)},
+# checked in the shared cache before any query or sms. Going over the ip or
+# phone limit starts a cooldown of (first, longest) seconds, doubled per strike.
+OTP_SEND_LIMITS = {'global': (300, 60), 'ip': (10, 3600), 'phone': (3, 600)}
+OTP_VERIFY_LIMITS = {'global': (1000, 60), 'ip': (30, 3600), 'phone': (5, 600)}
+OTP_COOLDOWN = (60, 86400)
+# request.META key holding the client address when behind a proxy, e.g. HTTP_X_REAL_IP
+# or HTTP_X_FORWARDED_FOR; for the latter CLIENT_IP_PROXY_COUNT is the number of
+# our proxies appending to it, the address is read that many entries from the right
+CLIENT_IP_HEADER = os.environ.get('CLIENT_IP_HEADER', 'REMOTE_ADDR')
+CLIENT_IP_PROXY_COUNT = int(os.environ.get('CLIENT_IP_PROXY_COUNT', 1))
+
+# Reference catalogs (utils.catalog): seconds between checks of the version
+# counter, i.e. how long another worker's write may take to show up here
+CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL', 1.0))
+
+# Request profiling: Server-Timing header and slow request log (utils.profiling).
+# When PROFILING_ENABLED is off the middleware is dropped at startup; when on,
+# staff users get the header, PROFILING_SERVER_TIMING sends it to everybody.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '') == '1'
+PROFILING_SERVER_TIMING = os.environ.get('PROFILING_SERVER_TIMING', '') == '1'
+PROFILING_SLOW_REQUEST_MS = int(os.environ.get('PROFILING_SLOW_REQUEST_MS', 500))
+PROFILING_SLOW_SAMPLE_RATE = float(os.environ.get('PROFILING_SLOW_SAMPLE_RATE', 1.0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'utils.profiling': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+    'root': {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'WARNING')},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -31,6 +31,7 @@ urlpatterns = [
     path('', include('services.urls')),
     path('api/', include('admins.urls')),
     path('api/', include('services.urls')),
+    path('api/products/', include('products.urls')),
 
 
 
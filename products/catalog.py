@@ -0,0 +1,4 @@
+from products.models import Product
+from utils.catalog import Catalog
+
+products = Catalog(Product, 'products.serializers.ProductSerializer')
@@ -1,29 +1,28 @@
-from django.shortcuts import render
-from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView, DestroyAPIView, UpdateAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView
-from .models import Admin
-from utils import public_variable
-from rest_framework.views import APIView
-from utils.sms import SmartSms
-import random
-from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework import status, viewsets
+from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.permissions import IsAuthenticated
+from admins.authentication import CachedJWTAuthentication
+from admins.permissions import IsAdminOrReadOnly
+from products.catalog import products
 from products.models import Product
-from utils.pagination import CustomPaginationClass
+from products.serializers import ProductSerializer
+from utils.catalog import CatalogReadMixin
 # Create your views here.
-class ListProduct(ListCreateAPIView, CustomPaginationClass):
-    model = Product
+class ListProduct(CatalogReadMixin, ListCreateAPIView):
+    """
+    All products from the in-process catalog (pre-rendered, with an ETag),
+    ?code= for one product by code. POST (admins only) creates a product.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
     queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    catalog = products
     name = "products"
 
-class updateProduct(RetrieveUpdateDestroyAPIView):
-    model = Product
+class updateProduct(CatalogReadMixin, RetrieveUpdateDestroyAPIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
     queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    catalog = products
     name = "update_product"
-
-
-
-
-
-    
-
@@ -0,0 +1,80 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from utils import public_variable
+
+logger = logging.getLogger(__name__)
+
+# the Service columns an ArchivedService keeps (search_text is not searched in the archive)
+ARCHIVED_FIELDS = (
+    'id', 'created_at', 'updated_at', 'title', 'type_service_id', 'user_id', 'operator_id', 'desc', 'status',
+    'status_changed_at', 'invoice_id',
+)
+
+
+def archivable(now=None, using=None):
+    """Services finished and untouched for SERVICE_ARCHIVE_AFTER days."""
+    from services.models import Service
+
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(days=getattr(settings, 'SERVICE_ARCHIVE_AFTER', 180))
+    return Service.objects.using(using).filter(status=public_variable.SERVICE_DONE, updated_at__lt=cutoff)
+
+
+def archive_chunk(chunk_size, now=None, using=None):
+    """
+    Move up to chunk_size archivable services, lowest ids first, in one short
+    transaction: the rows are locked (rows another transaction holds are
+    skipped, a later run takes them), copied with one INSERT and removed
+    with a raw DELETE. The raw DELETE sends no post_delete, so the dashboard
+    counters keep counting the moved services; their status events stay,
+    they have no foreign key constraint. Returns the number moved.
+    """
+    from services.models import ArchivedService, Service
+
+    now = now or timezone.now()
+    using = using or router.db_for_write(Service)
+    with transaction.atomic(using=using):
+        rows = list(
+            archivable(now, using).order_by('id').select_for_update(skip_locked=True).values(*ARCHIVED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        ArchivedService.objects.using(using).bulk_create([ArchivedService(archived_at=now, **row) for row in rows])
+        connection = connections[using]
+        ids = [row['id'] for row in rows]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(Service._meta.db_table)} WHERE id IN ({", ".join(["%s"] * len(ids))})',
+                ids,
+            )
+    return len(rows)
+
+
+def archive_services(chunk_size=None, max_chunks=None, pause=0.0, using=None):
+    """
+    Move every archivable service in chunks of SERVICE_ARCHIVE_CHUNK, with
+    `pause` seconds between chunks to leave room to the live traffic.
+    Each chunk commits on its own, so the first run over years of finished
+    services holds no long lock and can be stopped and resumed at any point.
+    Returns the number moved.
+    """
+    chunk_size = chunk_size or getattr(settings, 'SERVICE_ARCHIVE_CHUNK', 500)
+    now = timezone.now()
+    moved = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        count = archive_chunk(chunk_size, now=now, using=using)
+        moved += count
+        chunks += 1
+        if count < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    if moved:
+        logger.info('%s services archived', moved)
+    return moved
@@ -0,0 +1,69 @@
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotFound
+
+from services.catalog import type_services
+from services.models import Service
+from services.serializers import ArchivedServiceSerializer
+from services.views import ServiceViewSet
+from utils.async_api import async_api_view, render
+
+
+def service_view(request, action):
+    """
+    A ServiceViewSet instance used only for its configuration, so the async
+    endpoints share its queryset, query plan, filters, paginator and
+    serializer with the sync ones.
+    """
+    return ServiceViewSet(request=request, action=action, format_kwarg=None, args=(), kwargs={})
+
+
+async def warm_catalogs():
+    # ServiceSerializer reads type titles from the catalog, which cannot load on the event loop
+    await sync_to_async(type_services.warm)()
+
+
+async def serialize_all(view, queryset):
+    return view.get_serializer([service async for service in queryset], many=True).data
+
+
+@require_GET
+@async_api_view()
+async def service_list(request):
+    await warm_catalogs()
+    view = service_view(request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+    return render(view.paginator.get_paginated_data(view.get_serializer(page, many=True).data))
+
+
+@require_GET
+@async_api_view()
+async def service_detail(request, pk):
+    await warm_catalogs()
+    view = service_view(request, 'retrieve')
+    try:
+        service = await view.filter_queryset(view.get_queryset()).aget(pk=pk)
+    except Service.DoesNotExist:
+        # moved to the archive, see ServiceViewSet.retrieve
+        archived = await view.archived_queryset().filter(pk=pk).afirst()
+        if archived is None:
+            raise NotFound()
+        return render(ArchivedServiceSerializer(archived, context=view.get_serializer_context()).data)
+    return render(view.get_serializer(service).data)
+
+
+@require_GET
+@async_api_view()
+async def service_me(request):
+    await warm_catalogs()
+    view = service_view(request, 'me')
+    return render(await serialize_all(view, view.filter_queryset(view.get_queryset().filter(user=request.user))))
+
+
+@require_GET
+@async_api_view()
+async def services_assigned_to_operator(request):
+    await warm_catalogs()
+    view = service_view(request, 'services_assigned_to_operator')
+    return render(await serialize_all(view, view.filter_queryset(view.get_queryset().filter(operator=request.user))))
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from services import counters, events, history
+from utils import public_variable
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+def bulk_update_services(user, ids, changes):
+    """
+    Apply the same `changes` ({'status': ..., 'operator': Admin | None}) to
+    many services in one transaction:
+
+    - one SELECT ... FOR UPDATE loads ownership and the tracked values,
+    - one UPDATE writes every service that actually changes,
+    - the dashboard counter deltas are summed and upserted once,
+    - one INSERT appends the status history events,
+    - the websocket events of all services go out in one batch after commit.
+
+    Admins may change any service, other users only their own. This is
+    intentionally wider than ServiceViewSet.update, which only lets the
+    owner edit: the bulk endpoint is how admins dispatch services (assign
+    operators, close them) in batches. Returns [{'id': ..., 'result': ...}]
+    in the order of `ids`.
+    """
+    from services.models import Service
+
+    values = {}
+    if 'status' in changes:
+        values['status'] = changes['status']
+    if 'operator' in changes:
+        values['operator_id'] = changes['operator'].id if changes['operator'] is not None else None
+
+    using = router.db_for_write(Service)
+    results = {}
+    with transaction.atomic(using=using):
+        rows = (
+            Service.objects.using(using)
+            .select_for_update()
+            .filter(id__in=ids)
+            .order_by('id')
+            .values('id', 'user_id', *counters.TRACKED_FIELDS)
+        )
+        deltas = Counter()
+        service_events = []
+        status_events = []
+        changed_ids = []
+        now = timezone.now()
+        for row in rows:
+            service_id, owner_id = row.pop('id'), row.pop('user_id')
+            if user.type_user != public_variable.ADMIN_TYPE and owner_id != user.id:
+                results[service_id] = FORBIDDEN
+                continue
+            current = {**row, **values}
+            current['status_changed_at'] = history.status_changed_at(row, current['status'], now)
+            if current == row:
+                results[service_id] = UNCHANGED
+                continue
+            results[service_id] = UPDATED
+            changed_ids.append(service_id)
+            deltas.update(counters.service_deltas(row, current))
+            service_events.append(events.service_event(service_id, owner_id, row, current))
+            status_events.append(history.status_event(service_id, row, current, now))
+
+        if changed_ids:
+            if 'status' in values:
+                # services already in the new status keep the time they entered it
+                values['status_changed_at'] = Case(
+                    When(status=values['status'], then=F('status_changed_at')), default=Value(now)
+                )
+            Service.objects.using(using).filter(id__in=changed_ids).update(updated_at=now, **values)
+            counters.apply_deltas({key: delta for key, delta in deltas.items() if delta}, using=using)
+            history.record(status_events, using=using)
+            events.publish_on_commit(service_events, using=using)
+
+    return [{'id': service_id, 'result': results.get(service_id, NOT_FOUND)} for service_id in ids]
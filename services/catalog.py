@@ -0,0 +1,9 @@
+from services.models import TypeSercie
+from utils.catalog import Catalog
+
+type_services = Catalog(TypeSercie, 'services.serializers.TypeServiceSerializer')
+
+
+def type_service_title(type_service_id):
+    row = type_services.get(type_service_id) if type_service_id is not None else None
+    return row['title'] if row else None
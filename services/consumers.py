@@ -0,0 +1,33 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from services import events
+from utils import public_variable
+
+
+class ServiceEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/services/?token=<access token>
+    Pushes status and operator changes of the user's own services and, for
+    operators, of the services assigned to them.
+    """
+
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.groups = [events.user_group(user.id)]
+        if user.type_user == public_variable.REPAIRE_MEN_TYPE:
+            self.groups.append(events.operator_group(user.id))
+        for group in self.groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def receive_json(self, content, **kwargs):
+        # push only; nothing to receive from the client
+        pass
+
+    async def service_events(self, event):
+        for payload in event['payloads']:
+            await self.send_json(payload)
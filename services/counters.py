@@ -0,0 +1,124 @@
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+TOTAL = 'total'
+STATUS = 'status'
+OPERATOR = 'operator'
+OPERATOR_STATUS = 'operator_status'
+TYPE_SERVICE = 'type_service'
+DAY = 'day'
+
+# what the counters, websocket events and status history (services.history) compare before / after a change
+TRACKED_FIELDS = ('status', 'operator_id', 'type_service_id', 'created_at', 'status_changed_at')
+
+
+def _keys(values):
+    """Counter keys a service with these tracked values contributes to."""
+    keys = [(TOTAL, ''), (STATUS, str(values['status']))]
+    if values['operator_id'] is not None:
+        keys.append((OPERATOR, str(values['operator_id'])))
+        keys.append((OPERATOR_STATUS, f"{values['operator_id']}:{values['status']}"))
+    if values['type_service_id'] is not None:
+        keys.append((TYPE_SERVICE, str(values['type_service_id'])))
+    if values['created_at'] is not None:
+        keys.append((DAY, timezone.localdate(values['created_at']).isoformat()))
+    return keys
+
+
+def service_deltas(previous, current):
+    """
+    Counter deltas for a service going from `previous` to `current` tracked
+    values; None stands for "did not exist" (create) or "no longer exists" (delete).
+    """
+    deltas = Counter()
+    if previous is not None:
+        for key in _keys(previous):
+            deltas[key] -= 1
+    if current is not None:
+        for key in _keys(current):
+            deltas[key] += 1
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def apply_deltas(deltas, using=None):
+    """Upsert all deltas with a single statement in the caller's transaction."""
+    if not deltas:
+        return
+    from services.models import ServiceCounter
+
+    using = using or router.db_for_write(ServiceCounter)
+    qn = connections[using].ops.quote_name
+    table, dimension, key, value = (qn(name) for name in (ServiceCounter._meta.db_table, 'dimension', 'key', 'value'))
+    sql = (
+        f'INSERT INTO {table} ({dimension}, {key}, {value}) VALUES '
+        + ', '.join(['(%s, %s, %s)'] * len(deltas))
+        + f' ON CONFLICT ({dimension}, {key}) DO UPDATE SET {value} = {table}.{value} + EXCLUDED.{value}'
+    )
+    params = []
+    # fixed order so concurrent transactions lock counter rows in the same order
+    for (row_dimension, row_key), delta in sorted(deltas.items()):
+        params.extend([row_dimension, row_key, delta])
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def compute_counters(using=None):
+    """Recompute every counter from the services and services_archive tables (GROUP BY scans)."""
+    from services.models import ArchivedService, Service
+
+    counters = Counter()
+    day = TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    for services in (Service.objects.using(using).order_by(), ArchivedService.objects.using(using).order_by()):
+        counters[(TOTAL, '')] += services.count()
+        for row in services.values('status').annotate(n=Count('id')):
+            counters[(STATUS, str(row['status']))] += row['n']
+        for row in services.exclude(operator=None).values('operator_id', 'status').annotate(n=Count('id')):
+            counters[(OPERATOR, str(row['operator_id']))] += row['n']
+            counters[(OPERATOR_STATUS, f"{row['operator_id']}:{row['status']}")] += row['n']
+        for row in services.exclude(type_service=None).values('type_service_id').annotate(n=Count('id')):
+            counters[(TYPE_SERVICE, str(row['type_service_id']))] += row['n']
+        for row in services.annotate(day=day).values('day').annotate(n=Count('id')):
+            if row['day'] is not None:
+                counters[(DAY, row['day'].isoformat())] += row['n']
+    return counters
+
+
+def reconcile():
+    """
+    Correct the counters table from a full recount, without blocking writes
+    to services. The recount and the counters are read in one snapshot
+    (REPEATABLE READ on postgres), where they agree unless a counter drifted,
+    since every service write updates both in its transaction. The
+    difference is then added as deltas, like any other write, so changes
+    committed after the snapshot keep their own deltas.
+    Returns the number of counters that had drifted.
+    """
+    from services.models import ServiceCounter
+
+    using = router.db_for_write(ServiceCounter)
+    connection = connections[using]
+    # SET TRANSACTION must come first, inside an outer transaction the snapshot is the caller's
+    snapshot = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if snapshot:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        expected = compute_counters(using=using)
+        current = {
+            (row.dimension, row.key): row.value
+            for row in ServiceCounter.objects.using(using).all()
+        }
+    drift = {
+        key: expected.get(key, 0) - current.get(key, 0)
+        for key in set(expected) | set(current)
+        if expected.get(key, 0) != current.get(key, 0)
+    }
+    with transaction.atomic(using=using):
+        apply_deltas(drift, using=using)
+        # a concurrent increment rechecks the condition, a row it moved off 0 is kept
+        ServiceCounter.objects.using(using).filter(value=0).delete()
+    return len(drift)
@@ -0,0 +1,80 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+from utils import public_variable
+
+logger = logging.getLogger(__name__)
+
+# fields whose changes are pushed to the websocket subscribers
+PUSHED_FIELDS = ('status', 'operator_id')
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def operator_group(operator_id):
+    return f'operator_{operator_id}'
+
+
+def service_event(service_id, user_id, previous, current):
+    """
+    (groups, payload) for a service going from `previous` to `current`
+    tracked values, or None if nothing subscribers care about changed.
+    """
+    if previous is None or current is None:
+        return None
+    changed = [name for name in PUSHED_FIELDS if previous[name] != current[name]]
+    if not changed:
+        return None
+
+    groups = {user_group(user_id)}
+    for operator_id in (previous['operator_id'], current['operator_id']):
+        # the old operator hears about the reassignment too, so it can drop the service
+        if operator_id is not None:
+            groups.add(operator_group(operator_id))
+
+    payload = {
+        'event': 'service_changed',
+        'id': service_id,
+        'changed': [name.removesuffix('_id') for name in changed],
+        'status': current['status'],
+        'status_type': public_variable.ServiceTypeStatus.get(current['status']),
+        'previous_status': previous['status'],
+        'operator': current['operator_id'],
+        'previous_operator': previous['operator_id'],
+        'at': timezone.now().isoformat(),
+    }
+    return sorted(groups), payload
+
+
+def send_events(events):
+    """One channel layer message per group, however many services changed."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    payloads = {}
+    for groups, payload in events:
+        for group in groups:
+            payloads.setdefault(group, []).append(payload)
+    async_to_sync(group_send_all)(channel_layer, payloads)
+
+
+async def group_send_all(channel_layer, payloads):
+    for group, group_payloads in payloads.items():
+        try:
+            await channel_layer.group_send(group, {'type': 'service.events', 'payloads': group_payloads})
+        except Exception:
+            # a push failure must not fail the request that changed the services
+            logger.exception('could not push service events to %s', group)
+
+
+def publish_on_commit(events, using=None):
+    """Push the events once the surrounding transaction commits (never on rollback)."""
+    events = [event for event in events if event is not None]
+    if events:
+        transaction.on_commit(lambda: send_events(events), using=using)
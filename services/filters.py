@@ -0,0 +1,27 @@
+import django_filters
+
+from services.models import Service
+from utils import public_variable
+
+
+class ServiceFilter(django_filters.FilterSet):
+    """
+    ?status=&operator=&type_service=&is_open=&created_at_after=&created_at_before=
+    Each filter lines up with one of the (column, -created_at, -id) indexes
+    on the services table.
+    """
+    status = django_filters.MultipleChoiceFilter(choices=public_variable.ServiceStatus)
+    operator = django_filters.NumberFilter(field_name='operator_id')
+    type_service = django_filters.NumberFilter(field_name='type_service_id')
+    is_open = django_filters.BooleanFilter(method='filter_is_open')
+    created_at = django_filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Service
+        fields = ['status', 'operator', 'type_service', 'is_open', 'created_at']
+
+    def filter_is_open(self, queryset, name, value):
+        # same predicate as the partial services_operator_open_idx
+        if value:
+            return queryset.exclude(status=public_variable.SERVICE_DONE)
+        return queryset.filter(status=public_variable.SERVICE_DONE)
@@ -0,0 +1,130 @@
+import datetime
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+# operator_id of rollup rows for services without an operator
+NO_OPERATOR = 0
+
+
+def status_changed_at(previous, status, now):
+    """The status_changed_at a service gets when it is saved with status after `previous` tracked values."""
+    if previous is None or previous['status'] != status:
+        return now
+    return previous['status_changed_at']
+
+
+def status_event(service_id, previous, current, now):
+    """
+    ServiceStatusEvent (unsaved) for a service going from `previous` to
+    `current` tracked values, None if neither status nor operator changed.
+    A status change records how long the previous status lasted, when it is
+    known (services created before the history have no status_changed_at).
+    """
+    from services.models import ServiceStatusEvent
+
+    if current is None:
+        return None
+    if previous is not None and (previous['status'], previous['operator_id']) == (current['status'], current['operator_id']):
+        return None
+    seconds = None
+    if previous is not None and previous['status'] != current['status'] and previous['status_changed_at'] is not None:
+        seconds = max(0, int((now - previous['status_changed_at']).total_seconds()))
+    return ServiceStatusEvent(
+        created_at=now,
+        service_id=service_id,
+        status=current['status'],
+        previous_status=None if previous is None else previous['status'],
+        operator_id=current['operator_id'],
+        previous_operator_id=None if previous is None else previous['operator_id'],
+        seconds_in_previous=seconds,
+    )
+
+
+def record(events, using=None):
+    """Append the events (None entries are skipped) with one INSERT in the caller's transaction."""
+    from services.models import ServiceStatusEvent
+
+    events = [event for event in events if event is not None]
+    if events:
+        ServiceStatusEvent.objects.using(using).bulk_create(events)
+
+
+def sla_targets():
+    """{status: seconds} a service should leave the status within (SERVICE_STATUS_SLA)."""
+    return {int(status): seconds for status, seconds in getattr(settings, 'SERVICE_STATUS_SLA', {}).items()}
+
+
+def compute_rollups(day, using=None):
+    """
+    ServiceStatusRollup rows (unsaved) of one local day, aggregated in the
+    database from that day's events (a created_at range scan on the BRIN
+    index):
+
+    - entries: services that entered the status, by the operator they had then,
+    - exits / seconds / within_sla: stays in the status that ended that day,
+      by the operator they had when they left, with their total duration and
+      how many ended within the status' SLA target.
+    """
+    from services.models import ServiceStatusEvent, ServiceStatusRollup
+
+    tz = timezone.get_current_timezone()
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=tz)
+    events = (
+        ServiceStatusEvent.objects.using(using)
+        .filter(created_at__gte=start, created_at__lt=start + datetime.timedelta(days=1))
+        .exclude(previous_status=F('status'))
+        .order_by()
+    )
+    rows = {}
+
+    def row(status, operator_id):
+        key = (status, operator_id or NO_OPERATOR)
+        if key not in rows:
+            rows[key] = ServiceStatusRollup(day=day, status=status, operator_id=operator_id or NO_OPERATOR)
+        return rows[key]
+
+    for values in events.values('status', 'operator_id').annotate(n=Count('id')):
+        row(values['status'], values['operator_id']).entries = values['n']
+
+    targets = sla_targets()
+    within = Sum(Case(
+        *[When(Q(previous_status=status, seconds_in_previous__lte=seconds), then=Value(1)) for status, seconds in targets.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )) if targets else Value(0)
+    exits = (
+        events.filter(previous_status__isnull=False)
+        .values('previous_status', 'previous_operator_id')
+        .annotate(n=Count('id'), timed=Count('seconds_in_previous'), seconds=Sum('seconds_in_previous'), within_sla=within)
+    )
+    for values in exits:
+        rollup = row(values['previous_status'], values['previous_operator_id'])
+        rollup.exits = values['n']
+        rollup.timed_exits = values['timed']
+        rollup.seconds = values['seconds'] or 0
+        rollup.within_sla = values['within_sla'] or 0
+    return list(rows.values())
+
+
+def rollup_days(days, using=None):
+    """Rewrite the rollups of these local days from the events. Returns the number of rows written."""
+    from services.models import ServiceStatusRollup
+
+    using = using or router.db_for_write(ServiceStatusRollup)
+    written = 0
+    for day in days:
+        rows = compute_rollups(day, using=using)
+        with transaction.atomic(using=using):
+            ServiceStatusRollup.objects.using(using).filter(day=day).delete()
+            ServiceStatusRollup.objects.using(using).bulk_create(rows)
+        written += len(rows)
+    return written
+
+
+def recent_days(count=2):
+    """The last `count` local days, today included: late commits may still add events to yesterday."""
+    today = timezone.localdate()
+    return [today - datetime.timedelta(days=offset) for offset in range(count - 1, -1, -1)]
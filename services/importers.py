@@ -0,0 +1,182 @@
+import csv
+import io
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from services import stock
+from services.models import Materail
+from utils.persian import normalize_text
+
+TITLE_COLUMN = 'عنوان'
+COUNT_COLUMN = 'تعداد'
+PRICE_COLUMN = 'قیمت'
+REQUIRED_COLUMNS = [TITLE_COLUMN]
+
+
+class ImportValidationError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed_rows = 0
+        self.imported_count = 0
+        self.errors = []  # [{'row': 12, 'message': '...'}]
+
+    def add_error(self, row, message):
+        self.errors.append({'row': row, 'message': message})
+
+    def error_messages(self):
+        return [f'ردیف {error["row"]}: {error["message"]}' for error in self.errors]
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or bool(pd.isna(value))
+
+
+def _chunked(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _check_columns(columns):
+    if not all(col in columns for col in REQUIRED_COLUMNS):
+        raise ImportValidationError(f'ستون‌های مورد نیاز: {", ".join(REQUIRED_COLUMNS)}')
+
+
+def _iter_csv(file, chunk_size):
+    reader = pd.read_csv(file, encoding='utf-8', chunksize=chunk_size, dtype=object)
+    for frame in reader:
+        _check_columns(frame.columns)
+        # row numbers match the spreadsheet: header is row 1
+        yield [(index + 2, row) for index, row in zip(frame.index, frame.to_dict('records'))]
+
+
+def _iter_xlsx(file, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(col).strip() if col is not None else '' for col in next(rows, ())]
+        _check_columns(header)
+        numbered = (
+            (index + 2, dict(zip(header, values)))
+            for index, values in enumerate(rows)
+            if any(value is not None for value in values)
+        )
+        yield from _chunked(numbered, chunk_size)
+    finally:
+        workbook.close()
+
+
+def _iter_xls(file, chunk_size):
+    frame = pd.read_excel(file)
+    _check_columns(frame.columns)
+    numbered = ((index + 2, row) for index, row in zip(frame.index, frame.to_dict('records')))
+    yield from _chunked(numbered, chunk_size)
+
+
+def iter_row_chunks(file, name, chunk_size=None):
+    """Yield lists of (row_number, row_dict) without loading the whole file."""
+    chunk_size = chunk_size or settings.MATERAIL_IMPORT_CHUNK_SIZE
+    if name.endswith('.csv'):
+        return _iter_csv(file, chunk_size)
+    if name.endswith('.xls'):
+        return _iter_xls(file, chunk_size)
+    return _iter_xlsx(file, chunk_size)
+
+
+def count_rows(file, name):
+    """Cheap row count for progress reporting, None when it is not known up front."""
+    if name.endswith('.csv'):
+        text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+        try:
+            total = sum(1 for _ in csv.reader(text)) - 1
+        finally:
+            text.detach()
+        file.seek(0)
+        return max(total, 0)
+    if name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        file.seek(0)
+        return max_row - 1 if max_row else None
+    return None
+
+
+def build_material(row):
+    title = row.get(TITLE_COLUMN)
+    if _is_blank(title):
+        raise ValueError('عنوان خالی است')
+    count = row.get(COUNT_COLUMN)
+    price = row.get(PRICE_COLUMN)
+    title = str(title).strip()
+    count = int(float(count)) if not _is_blank(count) else None
+    if count is not None and count < 0:
+        raise ValueError('تعداد نمی‌تواند منفی باشد')
+    return Materail(
+        title=title,
+        search_title=normalize_text(title),
+        count=count,
+        price=float(price) if not _is_blank(price) else None,
+    )
+
+
+def import_chunk(rows, result, seen_titles):
+    """
+    Validate one chunk, check duplicates with a single query for the whole
+    chunk and write the new rows with bulk_create. Titles are compared in
+    normalized form so spelling variants (arabic yeh/kaf, zwnj, digits)
+    count as duplicates.
+    """
+    materials = []
+    errors = []
+    for row_number, row in rows:
+        try:
+            materials.append((row_number, build_material(row)))
+        except Exception as e:
+            errors.append((row_number, f'خطا در پردازش - {str(e)}'))
+
+    titles = {material.search_title for _, material in materials}
+    existing = set(Materail.objects.filter(search_title__in=titles).values_list('search_title', flat=True))
+
+    to_create = []
+    for row_number, material in materials:
+        if material.search_title in existing or material.search_title in seen_titles:
+            errors.append((row_number, f'متریال "{material.title}" قبلاً وجود دارد'))
+            continue
+        seen_titles.add(material.search_title)
+        to_create.append(material)
+
+    with transaction.atomic():
+        Materail.objects.bulk_create(to_create)
+        # bulk_create skips post_save, open the stock ledger of the new rows here
+        stock.record_opening(to_create)
+    for row_number, message in sorted(errors, key=lambda error: error[0]):
+        result.add_error(row_number, message)
+    result.imported_count += len(to_create)
+    result.processed_rows += len(rows)
+
+
+def import_materails(file, name, on_progress=None, chunk_size=None):
+    result = ImportResult()
+    seen_titles = set()
+    for rows in iter_row_chunks(file, name, chunk_size):
+        import_chunk(rows, result, seen_titles)
+        if on_progress:
+            on_progress(result)
+    return result
@@ -0,0 +1,42 @@
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+AMOUNT = DecimalField(max_digits=20, decimal_places=6)
+
+
+def line_amount():
+    """quantity * unit_price of an InvoiceLine, as a database expression."""
+    return ExpressionWrapper(F('quantity') * Coalesce(F('unit_price'), Value(0, output_field=AMOUNT)), output_field=AMOUNT)
+
+
+def total_subquery():
+    """Sum of the line amounts of the outer Invoice row."""
+    from services.models import InvoiceLine
+
+    lines = (
+        InvoiceLine.objects
+        .filter(invoice_id=OuterRef('pk'))
+        .order_by()
+        .values('invoice_id')
+        .annotate(total=Sum(line_amount()))
+        .values('total')
+    )
+    return Coalesce(Subquery(lines, output_field=AMOUNT), Value(0, output_field=AMOUNT))
+
+
+def refresh_totals(invoice_ids, using=None):
+    """Recompute the stored total of these invoices with one UPDATE (and touch updated_at)."""
+    from services.models import Invoice
+
+    invoice_ids = [invoice_id for invoice_id in invoice_ids if invoice_id is not None]
+    if invoice_ids:
+        Invoice.objects.using(using).filter(pk__in=invoice_ids).update(total=total_subquery(), updated_at=timezone.now())
+
+
+def capture_unit_prices(lines):
+    """Set unit_price from the current material price on lines that have none yet."""
+    from services.models import Materail
+
+    price = Subquery(Materail.objects.filter(pk=OuterRef('material_id')).values('price')[:1])
+    return lines.filter(unit_price=None).update(unit_price=price)
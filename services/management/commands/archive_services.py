@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from services import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move finished services older than SERVICE_ARCHIVE_AFTER days to the archive table in short '
+        'transactions; safe to stop and run again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=None, help='services per transaction (SERVICE_ARCHIVE_CHUNK)')
+        parser.add_argument('--max-chunks', type=int, default=None)
+        parser.add_argument('--pause', type=float, default=0.1, help='seconds to sleep between chunks')
+        parser.add_argument('--dry-run', action='store_true', help='only count the services that would move')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'{archive.archivable().count()} services to archive')
+            return
+        moved = archive.archive_services(
+            chunk_size=options['chunk'], max_chunks=options['max_chunks'], pause=options['pause'],
+        )
+        self.stdout.write(f'{moved} services archived')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from services import invoices
+from services.models import Invoice, InvoiceLine
+
+
+class Command(BaseCommand):
+    help = (
+        'Capture unit prices on invoice lines that predate them (from the current material price) '
+        'and recompute the stored invoice totals, in batches of primary key ranges'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        last_line_id = InvoiceLine.objects.aggregate(last=Max('id'))['last'] or 0
+        priced = 0
+        for start in range(0, last_line_id, batch_size):
+            with transaction.atomic():
+                priced += invoices.capture_unit_prices(
+                    InvoiceLine.objects.filter(id__gt=start, id__lte=start + batch_size)
+                )
+        self.stdout.write(f'captured unit prices on {priced} lines')
+
+        last_invoice_id = Invoice.objects.aggregate(last=Max('id'))['last'] or 0
+        refreshed = 0
+        for start in range(0, last_invoice_id, batch_size):
+            with transaction.atomic():
+                invoice_ids = list(
+                    Invoice.objects.filter(id__gt=start, id__lte=start + batch_size).values_list('id', flat=True)
+                )
+                invoices.refresh_totals(invoice_ids)
+            refreshed += len(invoice_ids)
+            self.stdout.write(f'  invoices {start + 1}..{start + batch_size}: {len(invoice_ids)}')
+        self.stdout.write(self.style.SUCCESS(f'recomputed {refreshed} invoice totals'))
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from admins.models import Admin
+from services.models import Service
+
+ENDPOINTS = ('list', 'detail', 'me', 'operator_queue', 'patient_profile')
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at the sync and async versions of the hot read endpoints '
+        'of a running ASGI server (e.g. daphne cs_crm.asgi:application) and compare throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+        parser.add_argument('--user', required=True, help='username the requests are made as')
+        parser.add_argument('--requests', type=int, default=500, help='requests per endpoint and path')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, help='repeatable, default all')
+
+    def handle(self, *args, **options):
+        user = Admin.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f'user {options["user"]!r} not found')
+
+        bearer = f'Bearer {AccessToken.for_user(user)}'
+        # same claims verify_otp puts in a patient token
+        patient_token = AccessToken.for_user(user)
+        patient_token['patient_id'] = user.id
+        patient_token['type'] = 'patient'
+        service = Service.objects.filter(user=user).order_by('-id').first() or Service.objects.order_by('-id').first()
+
+        paths = {
+            'list': ('services/', 'async/services/', bearer),
+            'me': ('services/me/', 'async/services/me/', bearer),
+            'operator_queue': ('services/services_assigned_to_operator/', 'async/services/services_assigned_to_operator/', bearer),
+            'patient_profile': ('users/profile/', 'async/users/profile/', f'Token {patient_token}'),
+        }
+        if service is not None:
+            paths['detail'] = (f'services/{service.id}/', f'async/services/{service.id}/', bearer)
+
+        base_url = options['base_url'].rstrip('/') + '/'
+        self.stdout.write(f'{"endpoint":<16} {"path":<6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"errors":>7}')
+        for name in options['endpoint'] or ENDPOINTS:
+            if name not in paths:
+                self.stdout.write(f'{name:<16} skipped (no service to fetch)')
+                continue
+            sync_path, async_path, authorization = paths[name]
+            for label, path in (('sync', sync_path), ('async', async_path)):
+                stats = asyncio.run(self.run(base_url + path, authorization, options['requests'], options['concurrency']))
+                self.stdout.write(
+                    f'{name:<16} {label:<6} {stats["rps"]:>8.1f} {stats["p50"]:>8.1f} {stats["p95"]:>8.1f} {stats["errors"]:>7}'
+                )
+
+    async def run(self, url, authorization, count, concurrency):
+        import aiohttp
+
+        timings, errors = [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector, headers={'Authorization': authorization}) as session:
+
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        async with session.get(url) as response:
+                            await response.read()
+                            if response.status != 200:
+                                errors += 1
+                    except aiohttp.ClientError:
+                        errors += 1
+                    timings.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(count)))
+            elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'rps': count / elapsed,
+            'p50': timings[len(timings) // 2],
+            'p95': timings[max(int(len(timings) * 0.95) - 1, 0)],
+            'errors': errors,
+        }
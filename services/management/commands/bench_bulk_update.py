@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from admins.models import Admin
+from services.models import Service
+from utils import public_variable
+
+
+class Command(BaseCommand):
+    help = 'Compare N single service updates against one bulk update (time and query count)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='username owning the services that are updated')
+        parser.add_argument('--count', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        user = Admin.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f'user {options["user"]!r} not found')
+        ids = list(Service.objects.filter(user=user).order_by('id').values_list('id', flat=True)[:options['count']])
+        if not ids:
+            raise CommandError('the user has no services')
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        statuses = (public_variable.SERVICE_DISPATCHED, public_variable.SERVICE_REPAIRING)
+
+        def single(status):
+            for service_id in ids:
+                response = client.patch(f'/api/services/{service_id}/', {'status': status}, format='json')
+                assert response.status_code == 200, response.content
+
+        def bulk(status):
+            response = client.post('/api/services/bulk/', {'ids': ids, 'status': status}, format='json')
+            assert response.status_code == 200, response.content
+
+        self.stdout.write(f'{len(ids)} services, {options["rounds"]} rounds')
+        for label, run in (('single', single), ('bulk', bulk)):
+            timings = []
+            for round_number in range(options['rounds']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    # alternate so every round really changes every service
+                    run(statuses[round_number % 2])
+                    timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f'{label:<7} best={min(timings):9.1f}ms queries={len(queries)}')
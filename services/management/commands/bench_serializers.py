@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from services.models import Materail, Service
+from services.serializers import MaterailSerializer, ServiceSerializer
+from utils.compiled_serializer import compile_serializer
+from utils.query_planning import plan_queryset
+
+
+class Command(BaseCommand):
+    help = 'Rows/sec of the DRF serializers against their compiled form, and check both render the same JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        for label, model, serializer_class in (
+            ('services', Service, ServiceSerializer),
+            ('materails', Materail, MaterailSerializer),
+        ):
+            ids = list(model.objects.order_by('-id').values_list('id', flat=True)[:options['rows']])
+            if not ids:
+                raise CommandError(f'no {label} to serialize')
+            queryset = model.objects.filter(id__in=ids).order_by('-id')
+            compiled = compile_serializer(serializer_class)
+            if compiled is None:
+                raise CommandError(f'{serializer_class.__name__} cannot be compiled')
+
+            def drf():
+                return serializer_class(plan_queryset(queryset.all(), serializer_class), many=True).data
+
+            def fast():
+                return compiled.render(compiled.values(queryset))
+
+            outputs = {}
+            self.stdout.write(f'{label}: {len(ids)} rows, best of {options["rounds"]}')
+            for name, run in (('drf', drf), ('compiled', fast)):
+                timings = []
+                for _ in range(options['rounds']):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        outputs[name] = renderer.render(run())
+                        timings.append(time.perf_counter() - started)
+                best = min(timings)
+                self.stdout.write(
+                    f'  {name:<9} {best * 1000:9.1f}ms {len(ids) / best:12,.0f} rows/s  queries={len(queries)}'
+                )
+            if outputs['drf'] != outputs['compiled']:
+                raise CommandError(f'{label}: the compiled serializer rendered different JSON')
+            self.stdout.write(self.style.SUCCESS(f'  identical output ({len(outputs["drf"]):,} bytes)'))
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from services.models import Materail
+from utils.explain import explain, index_names
+from utils.persian import normalize_text
+
+WORDS = ['لوله', 'شیر', 'پمپ', 'کابل', 'فیلتر', 'موتور', 'برد', 'سنسور', 'یخچال', 'کولر', 'پکیج', 'آبگرمکن',
+         'ترموستات', 'کمپرسور', 'خازن', 'فن', 'تسمه', 'واشر', 'بلبرینگ', 'رله']
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN ANALYZE the search queries and report whether the trigram indexes are used (postgres only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='insert this many random materials first')
+        parser.add_argument('--query', action='append', help='search terms to explain (repeatable)')
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explain_search needs the postgres database')
+
+        if options['seed']:
+            rng = random.Random(0)
+            batch = []
+            for i in range(options['seed']):
+                title = ' '.join(rng.choice(WORDS) for _ in range(3)) + f' {i}'
+                batch.append(Materail(title=title, search_title=normalize_text(title)))
+                if len(batch) == 5000:
+                    Materail.objects.bulk_create(batch)
+                    batch = []
+            Materail.objects.bulk_create(batch)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Materail._meta.db_table}')
+
+        for term in options['query'] or ['پمپ', 'كولر', 'ترموستا']:
+            query = normalize_text(term)
+            queryset = (
+                Materail.objects
+                .filter(Q(search_title__contains=query) | Q(search_title__trigram_word_similar=query))
+                .order_by('-id')[:10]
+            )
+            indexes = sorted(set(index_names(explain(queryset))))
+
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                list(queryset)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{term!r}: indexes={indexes or "SEQ SCAN"} '
+                f'p50={timings[len(timings) // 2]:.2f}ms p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms'
+            )
+
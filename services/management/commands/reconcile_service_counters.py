@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from services import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard service counters from the services table (run once after deploy)'
+
+    def handle(self, *args, **options):
+        drifted = counters.reconcile()
+        self.stdout.write(f'{drifted} counters corrected')
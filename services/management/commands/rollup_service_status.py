@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from services import history
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the service status rollups of the last --days local days from the status events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2)
+
+    def handle(self, *args, **options):
+        days = history.recent_days(options['days'])
+        written = history.rollup_days(days)
+        self.stdout.write(f'{written} rollup rows written for {days[0]} .. {days[-1]}')
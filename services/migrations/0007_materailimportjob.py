@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_alter_service_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterailImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('file', models.FileField(upload_to='imports/materails/')),
+                ('status', models.IntegerField(choices=[(0, 'در صف'), (1, 'در حال پردازش'), (2, 'انجام شد'), (3, 'ناموفق')], default=0)),
+                ('total_rows', models.IntegerField(null=True)),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('imported_count', models.IntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='materail_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'materail_import_jobs',
+            },
+        ),
+    ]
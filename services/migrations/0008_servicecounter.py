@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_materailimportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'service_counters',
+                'unique_together': {('dimension', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:46
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models, transaction
+
+from utils.migrations import AddIndexConcurrentlyIfPostgres
+from utils.persian import normalize_text
+
+BATCH_SIZE = 5000
+
+
+def backfill_search_fields(apps, schema_editor):
+    Materail = apps.get_model('services', 'Materail')
+    Service = apps.get_model('services', 'Service')
+
+    # batches in their own transactions so big tables are not locked for the whole backfill
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(Materail.objects.filter(id__gt=last_id).order_by('id').only('id', 'title')[:BATCH_SIZE])
+            if not rows:
+                break
+            for row in rows:
+                row.search_title = normalize_text(row.title)
+            Materail.objects.bulk_update(rows, ['search_title'])
+        last_id = rows[-1].id
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(Service.objects.filter(id__gt=last_id).order_by('id').only('id', 'title', 'desc')[:BATCH_SIZE])
+            if not rows:
+                break
+            for row in rows:
+                row.search_text = normalize_text(f'{row.title} {row.desc or ""}')
+            Service.objects.bulk_update(rows, ['search_text'])
+        last_id = rows[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('services', '0008_servicecounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='materail',
+            name='search_title',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='search_text',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_fields, migrations.RunPython.noop),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='materail',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_title'], name='materail_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='service',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='services_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.migrations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('services', '0009_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='service',
+            index=models.Index(fields=['-created_at', '-id'], name='services_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='service',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='services_user_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='service',
+            index=models.Index(fields=['operator', '-created_at', '-id'], name='services_operator_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='service',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='services_status_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='service',
+            index=models.Index(condition=models.Q(('status', 3), _negated=True), fields=['operator', '-created_at', '-id'], name='services_operator_open_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_list_indexes'),
+    ]
+
+    operations = [
+        # invoices_material (the auto-created m2m table) becomes the InvoiceLine
+        # table as it is: only the migration state changes here
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='InvoiceLine',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='services.invoice')),
+                        ('material', models.ForeignKey(db_column='materail_id', on_delete=django.db.models.deletion.CASCADE, to='services.materail')),
+                    ],
+                    options={
+                        'db_table': 'invoices_material',
+                        'unique_together': {('invoice', 'material')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='invoice',
+                    name='material',
+                    field=models.ManyToManyField(through='services.InvoiceLine', to='services.materail'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='invoiceline',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='invoiceline',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=6, max_digits=20, null=True),
+        ),
+        # existing totals are filled by the backfill_invoice_totals command
+        migrations.AddField(
+            model_name='invoice',
+            name='total',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=20),
+        ),
+    ]
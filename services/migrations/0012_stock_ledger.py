@@ -0,0 +1,61 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_stock(apps, schema_editor):
+    # the current counts become the opening movements, so the ledger sums to Materail.count
+    Materail = apps.get_model('services', 'Materail')
+    StockMovement = apps.get_model('services', 'StockMovement')
+    db = schema_editor.connection.alias
+    materails = Materail.objects.using(db).exclude(count__isnull=True).exclude(count=0).values_list('pk', 'count')
+    batch = []
+    for materail_id, count in materails.iterator(chunk_size=2000):
+        batch.append(StockMovement(materail_id=materail_id, quantity=count, reason=0))
+        if len(batch) >= 2000:
+            StockMovement.objects.using(db).bulk_create(batch)
+            batch = []
+    StockMovement.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0011_invoice_lines'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.IntegerField(default=0)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField()),
+                ('materail', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshot', to='services.materail')),
+            ],
+            options={
+                'db_table': 'stock_snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quantity', models.IntegerField()),
+                ('reason', models.IntegerField(choices=[(0, 'موجودی اولیه'), (1, 'مصرف در فاکتور'), (2, 'بازگشت از فاکتور'), (3, 'اصلاح موجودی')])),
+                ('invoice', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='services.invoice')),
+                ('materail', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='services.materail')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'stock_movements',
+                'indexes': [models.Index(fields=['materail', 'id'], name='stock_movements_materail_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_stock, migrations.RunPython.noop),
+    ]
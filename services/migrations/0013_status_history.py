@@ -0,0 +1,68 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:31
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.migrations import AddIndexConcurrentlyIfPostgres
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('services', '0012_stock_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='status_changed_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ServiceStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.IntegerField(choices=[(0, 'در حال پیگیری'), (1, 'اعزام تکنسین'), (2, 'انجام تعمیرات'), (3, 'پایان یافته')])),
+                ('operator_id', models.BigIntegerField(default=0)),
+                ('entries', models.IntegerField(default=0)),
+                ('exits', models.IntegerField(default=0)),
+                ('timed_exits', models.IntegerField(default=0)),
+                ('seconds', models.BigIntegerField(default=0)),
+                ('within_sla', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'service_status_rollups',
+                'unique_together': {('day', 'status', 'operator_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('status', models.IntegerField(choices=[(0, 'در حال پیگیری'), (1, 'اعزام تکنسین'), (2, 'انجام تعمیرات'), (3, 'پایان یافته')])),
+                ('previous_status', models.IntegerField(choices=[(0, 'در حال پیگیری'), (1, 'اعزام تکنسین'), (2, 'انجام تعمیرات'), (3, 'پایان یافته')], null=True)),
+                ('seconds_in_previous', models.IntegerField(null=True)),
+                ('operator', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('previous_operator', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('service', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_events', to='services.service')),
+            ],
+            options={
+                'db_table': 'service_status_events',
+            },
+        ),
+        # BRIN is postgres only, the sqlite benchmark database goes without it
+        AddIndexConcurrentlyIfPostgres(
+            model_name='servicestatusevent',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['created_at'], name='status_events_created_brin'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='servicestatusevent',
+            index=models.Index(fields=['service', 'id'], name='status_events_service_idx'),
+        ),
+    ]
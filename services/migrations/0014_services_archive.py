@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_status_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # only the empty table: existing finished services are moved by the
+    # archive_services task / command in short chunks, not in this migration
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedService',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('title', models.CharField(max_length=300)),
+                ('desc', models.TextField(null=True)),
+                ('status', models.IntegerField(choices=[(0, 'در حال پیگیری'), (1, 'اعزام تکنسین'), (2, 'انجام تعمیرات'), (3, 'پایان یافته')])),
+                ('status_changed_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField()),
+                ('invoice', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='services.invoice')),
+                ('operator', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('type_service', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='services.typesercie')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_services', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'services_archive',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+def zero_negative_counts(apps, schema_editor):
+    # counts set negative before the check existed go back to 0, recorded as adjustments (reason 3)
+    # so the ledger still sums to count
+    Materail = apps.get_model('services', 'Materail')
+    StockMovement = apps.get_model('services', 'StockMovement')
+    db = schema_editor.connection.alias
+    negative = list(Materail.objects.using(db).filter(count__lt=0).values_list('pk', 'count'))
+    StockMovement.objects.using(db).bulk_create([
+        StockMovement(materail_id=materail_id, quantity=-count, reason=3) for materail_id, count in negative
+    ])
+    Materail.objects.using(db).filter(pk__in=[materail_id for materail_id, _ in negative]).update(count=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0014_services_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(zero_negative_counts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='materail',
+            constraint=models.CheckConstraint(check=models.Q(('count__gte', 0)), name='materail_count_not_negative'),
+        ),
+    ]
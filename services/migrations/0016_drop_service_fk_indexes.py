@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0015_materail_count_not_negative'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='service',
+            name='operator',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services_as_operator', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='service',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='services_as_user', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Q
 from admins.models import Admin
 from utils import public_variable
+from utils.persian import normalize_text
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.utils import timezone
 # Create your models here.
 class TypeSercie(models.Model):
     title = models.TextField()
@@ -16,17 +20,138 @@ class Materail(models.Model):
     title = models.CharField(max_length=300)
     count =  models.IntegerField(null=True)
     price = models.DecimalField(max_digits=20, decimal_places=6, null=True)
+    # normalized title for search and duplicate checks
+    search_title = models.CharField(max_length=300, default='', editable=False, db_index=True)
     class Meta:
         db_table = 'materail'
+        indexes = [
+            GinIndex(fields=['search_title'], name='materail_search_trgm', opclasses=['gin_trgm_ops']),
+        ]
+        constraints = [
+            # stock never goes negative, whatever path writes count
+            models.CheckConstraint(check=Q(count__gte=0), name='materail_count_not_negative'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.search_title = normalize_text(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_title'}
+        elif update_fields is None and not self._state.adding:
+            # count changes only through services.stock, a save must not write back a stale value
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'count'
+            ]
+        super().save(*args, **kwargs)
+
+
+class MaterailImportJob(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    user = models.ForeignKey(Admin, on_delete=models.SET_NULL, null=True, related_name='materail_imports')
+    file = models.FileField(upload_to='imports/materails/')
+    status = models.IntegerField(choices=public_variable.ImportStatus, default=public_variable.IMPORT_PENDING)
+    total_rows = models.IntegerField(null=True)
+    processed_rows = models.IntegerField(default=0)
+    imported_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    message = models.TextField(null=True, blank=True)
+    class Meta:
+        db_table = 'materail_import_jobs'
 
 
 class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    material = models.ManyToManyField(Materail)
+    material = models.ManyToManyField(Materail, through='InvoiceLine')
+    # sum of quantity * unit_price over the lines, kept up to date by services.invoices
+    total = models.DecimalField(max_digits=20, decimal_places=6, default=0)
     class Meta:
         db_table = 'invoices'
 
+
+class InvoiceLine(models.Model):
+    """
+    A material on an invoice, with the quantity and the unit price captured
+    when it was added. Lives in the table of the former auto-created m2m.
+    """
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='lines')
+    material = models.ForeignKey(Materail, on_delete=models.CASCADE, db_column='materail_id')
+    quantity = models.PositiveIntegerField(default=1)
+    # null only for lines created before prices were captured, see backfill_invoice_totals
+    unit_price = models.DecimalField(max_digits=20, decimal_places=6, null=True)
+    class Meta:
+        db_table = 'invoices_material'
+        unique_together = ('invoice', 'material')
+
+    def stock_values(self):
+        """(materail_id, quantity) the line takes out of stock, None if deferred."""
+        if 'material_id' not in self.__dict__ or 'quantity' not in self.__dict__:
+            return None
+        return self.material_id, self.quantity
+
+    def save(self, *args, **kwargs):
+        """
+        Save and move the stock of the line's materail in the same
+        transaction; raises services.stock.InsufficientStock (and saves
+        nothing) when there is not enough.
+        """
+        from services import stock
+
+        if self.unit_price is None:
+            self.unit_price = Materail.objects.filter(pk=self.material_id).values_list('price', flat=True).first()
+        using = kwargs.get('using') or router.db_for_write(InvoiceLine, instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if not self._state.adding:
+                # the committed row, locked: concurrent edits of the line apply their deltas one after the other
+                previous = (
+                    InvoiceLine.objects.using(using).select_for_update().filter(pk=self.pk)
+                    .values_list('material_id', 'quantity').first()
+                )
+            super().save(*args, **kwargs)
+            movements = stock.line_movements(previous, self.stock_values(), self.invoice_id)
+            stock.apply_movements(
+                [movement for movement in movements if movement[1] < 0], public_variable.STOCK_CONSUME, using=using
+            )
+            stock.apply_movements(
+                [movement for movement in movements if movement[1] > 0], public_variable.STOCK_RETURN, using=using
+            )
+
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger: every change of Materail.count (quantity > 0
+    in, < 0 out), written by services.stock in the transaction that changes
+    the count.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    materail = models.ForeignKey(Materail, on_delete=models.CASCADE, related_name='stock_movements')
+    quantity = models.IntegerField()
+    reason = models.IntegerField(choices=public_variable.StockMovementReason)
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, related_name='stock_movements')
+    user = models.ForeignKey(Admin, on_delete=models.SET_NULL, null=True, related_name='stock_movements')
+    class Meta:
+        db_table = 'stock_movements'
+        indexes = [
+            # the ledger tail of a materail after its snapshot
+            models.Index(fields=['materail', 'id'], name='stock_movements_materail_idx'),
+        ]
+
+
+class StockSnapshot(models.Model):
+    """
+    Ledger balance of a materail up to last_movement_id, folded in
+    periodically by services.stock.take_snapshot so balance queries only
+    sum the movements after it.
+    """
+    materail = models.OneToOneField(Materail, on_delete=models.CASCADE, related_name='stock_snapshot')
+    balance = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField()
+    class Meta:
+        db_table = 'stock_snapshots'
+
     
 
 class Service(models.Model):
@@ -34,22 +159,176 @@ class Service(models.Model):
     updated_at = models.DateTimeField(auto_now=True) 
     title = models.CharField(max_length=300)
     type_service = models.ForeignKey(TypeSercie, on_delete=models.SET_NULL, null=True)
-    user = models.ForeignKey(Admin, on_delete=models.CASCADE, related_name='services_as_user')
-    operator = models.ForeignKey(Admin, on_delete=models.SET_NULL, null=True, related_name='services_as_operator')
+    user = models.ForeignKey(Admin, on_delete=models.CASCADE, related_name='services_as_user', db_index=False)
+    operator = models.ForeignKey(Admin, on_delete=models.SET_NULL, null=True, related_name='services_as_operator', db_index=False)
     desc = models.TextField(null=True)
     status = models.IntegerField(choices=public_variable.ServiceStatus, default=0)
+    # when the service entered its current status, null for services older than the status history
+    status_changed_at = models.DateTimeField(null=True, editable=False)
     invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True)
+    # normalized title + desc for search
+    search_text = models.TextField(default='', editable=False)
     
     class Meta:
         db_table = 'services'
+        indexes = [
+            GinIndex(fields=['search_text'], name='services_search_trgm', opclasses=['gin_trgm_ops']),
+            # one per list access path, each ending in the list sort order
+            models.Index(fields=['-created_at', '-id'], name='services_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='services_user_created_idx'),
+            models.Index(fields=['operator', '-created_at', '-id'], name='services_operator_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='services_status_created_idx'),
+            models.Index(
+                fields=['operator', '-created_at', '-id'],
+                name='services_operator_open_idx',
+                condition=~Q(status=public_variable.SERVICE_DONE),
+            ),
+        ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked = instance.tracked_values()
+        return instance
 
+    def tracked_values(self):
+        """Values the dashboard counters and status history depend on, None if some are deferred."""
+        from services.counters import TRACKED_FIELDS
 
+        if any(name not in self.__dict__ for name in TRACKED_FIELDS):
+            return None
+        return {name: self.__dict__[name] for name in TRACKED_FIELDS}
 
+    def save(self, *args, **kwargs):
+        """
+        Save and update the dashboard counters and the status history in
+        the same transaction. Also refreshes the normalized search text and,
+        after commit, pushes status / operator changes to the websocket
+        subscribers.
+        """
+        from services import counters, events, history
 
+        self.search_text = normalize_text(f'{self.title} {self.desc or ""}')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'title', 'desc'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
 
+        using = kwargs.get('using') or router.db_for_write(Service, instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if not self._state.adding:
+                previous = getattr(self, '_tracked', None)
+                if previous is None:
+                    previous = Service.objects.using(using).filter(pk=self.pk).values(*counters.TRACKED_FIELDS).first()
+            now = timezone.now()
+            if 'status' in self.__dict__:
+                self.status_changed_at = history.status_changed_at(previous, self.status, now)
+                if kwargs.get('update_fields') is not None and 'status' in kwargs['update_fields']:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'status_changed_at'}
+            super().save(*args, **kwargs)
+            self._tracked = self.tracked_values()
+            if self._tracked is None:
+                self.refresh_from_db(using=using, fields=['status', 'operator', 'type_service', 'created_at', 'status_changed_at'])
+                self._tracked = self.tracked_values()
+            counters.apply_deltas(counters.service_deltas(previous, self._tracked), using=using)
+            history.record([history.status_event(self.pk, previous, self._tracked, now)], using=using)
+            events.publish_on_commit([events.service_event(self.pk, self.user_id, previous, self._tracked)], using=using)
 
 
+class ServiceCounter(models.Model):
+    """
+    Pre-aggregated service counts for the dashboard, kept up to date by
+    Service.save / delete and rewritten by the periodic reconciliation.
+    """
+    dimension = models.CharField(max_length=20)
+    key = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+    class Meta:
+        db_table = 'service_counters'
+        unique_together = ('dimension', 'key')
+
+
+class ServiceStatusEvent(models.Model):
+    """
+    Append-only history of service status / operator changes, one row per
+    change, written by Service.save and services.bulk in the transaction of
+    the change (see services.history). Rows are only ever inserted with a
+    growing created_at, so a BRIN index keeps time range scans cheap at any
+    size. No foreign key constraints: the history outlives deleted and
+    archived services.
+    """
+    created_at = models.DateTimeField()
+    service = models.ForeignKey(Service, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='status_events')
+    status = models.IntegerField(choices=public_variable.ServiceStatus)
+    previous_status = models.IntegerField(choices=public_variable.ServiceStatus, null=True)
+    operator = models.ForeignKey(Admin, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+')
+    previous_operator = models.ForeignKey(Admin, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+')
+    # how long the previous status lasted, set when the status changed and its start is known
+    seconds_in_previous = models.IntegerField(null=True)
+    class Meta:
+        db_table = 'service_status_events'
+        # only these two (the foreign keys have db_index=False), every index is paid on each insert
+        indexes = [
+            BrinIndex(fields=['created_at'], name='status_events_created_brin', autosummarize=True),
+            models.Index(fields=['service', 'id'], name='status_events_service_idx'),
+        ]
+
+
+class ServiceStatusRollup(models.Model):
+    """
+    Status history per (local day, status, operator), rewritten from the
+    events by services.history.rollup_days. operator_id is 0 for services
+    without an operator.
+    """
+    day = models.DateField()
+    status = models.IntegerField(choices=public_variable.ServiceStatus)
+    operator_id = models.BigIntegerField(default=0)
+    # services that entered the status
+    entries = models.IntegerField(default=0)
+    # stays in the status that ended, those with a known duration, their total seconds and how many met the SLA
+    exits = models.IntegerField(default=0)
+    timed_exits = models.IntegerField(default=0)
+    seconds = models.BigIntegerField(default=0)
+    within_sla = models.IntegerField(default=0)
+    class Meta:
+        db_table = 'service_status_rollups'
+        unique_together = ('day', 'status', 'operator_id')
+
+
+
+
+
+
+
+
+
+
+    
+
+class ArchivedService(models.Model):
+    """
+    Finished services moved out of the services table by
+    services.archive.archive_services, keeping their id, so the hot table
+    and its indexes only hold the services still being worked on. Read only;
+    still counted by the dashboard counters. The foreign keys have no
+    database constraint so a move never checks or locks the referenced rows.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    title = models.CharField(max_length=300)
+    type_service = models.ForeignKey(TypeSercie, on_delete=models.SET_NULL, db_constraint=False, null=True, related_name='+')
+    user = models.ForeignKey(Admin, on_delete=models.CASCADE, db_constraint=False, related_name='archived_services')
+    operator = models.ForeignKey(Admin, on_delete=models.SET_NULL, db_constraint=False, null=True, related_name='+')
+    desc = models.TextField(null=True)
+    status = models.IntegerField(choices=public_variable.ServiceStatus)
+    status_changed_at = models.DateTimeField(null=True)
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, db_constraint=False, null=True, related_name='+')
+    archived_at = models.DateTimeField()
+    class Meta:
+        db_table = 'services_archive'
 
+    def tracked_values(self):
+        from services.counters import TRACKED_FIELDS
 
-    
\ No newline at end of file
+        return {name: getattr(self, name) for name in TRACKED_FIELDS}
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from services.consumers import ServiceEventsConsumer
+
+websocket_urlpatterns = [
+    path('ws/services/', ServiceEventsConsumer.as_asgi()),
+]
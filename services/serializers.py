@@ -1,35 +1,128 @@
+from django.db import transaction
 from rest_framework import serializers
 from services.models import Service, Invoice, Materail
-from .models import Materail, Invoice, Service
+from .models import ArchivedService, Materail, Invoice, InvoiceLine, Service, MaterailImportJob, StockMovement, TypeSercie
+from admins.models import Admin
+from services import catalog, stock
 from utils import public_variable
 
+
+class StockErrorsMixin:
+    """Save in one transaction and report a stock shortage as a validation error."""
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except stock.InsufficientStock as e:
+            raise serializers.ValidationError({
+                'material': 'موجودی متریال کافی نیست',
+                'shortages': {str(materail_id): missing for materail_id, missing in e.shortages.items()},
+            })
+
+
+class TypeServiceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TypeSercie
+        fields = ['id', 'title', 'code']
+
+
 class MaterailSerializer(serializers.ModelSerializer):
+    count = serializers.IntegerField(min_value=0, allow_null=True, required=False)
+
     class Meta:
         model = Materail
-        fields = '__all__'
+        exclude = ['search_title']
+
+    def update(self, instance, validated_data):
+        # a new count is recorded as a stock adjustment, Materail.save never writes count
+        with transaction.atomic():
+            if 'count' in validated_data:
+                request = self.context.get('request')
+                stock.set_count(instance, validated_data.pop('count'), user=getattr(request, 'user', None))
+            return super().update(instance, validated_data)
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    reason_type = serializers.SerializerMethodField()
+
+    def get_reason_type(self, obj):
+        return dict(public_variable.StockMovementReason).get(obj.reason)
+
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'created_at', 'quantity', 'reason', 'reason_type', 'invoice', 'user']
+
+
+class StockAdjustSerializer(serializers.Serializer):
+    quantity = serializers.IntegerField()
+
+    def validate_quantity(self, value):
+        if value == 0:
+            raise serializers.ValidationError('مقدار نمی‌تواند صفر باشد')
+        return value
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class MaterailImportJobSerializer(serializers.ModelSerializer):
+    status_type = serializers.SerializerMethodField()
+
+    def get_status_type(self, obj):
+        return dict(public_variable.ImportStatus).get(obj.status)
+
+    class Meta:
+        model = MaterailImportJob
+        fields = ['id', 'created_at', 'updated_at', 'status', 'status_type', 'total_rows', 'processed_rows', 'imported_count', 'errors', 'message']
+
+
+class InvoiceLineSerializer(StockErrorsMixin, serializers.ModelSerializer):
+    # unit_price is captured from the material when the line is added
+    class Meta:
+        model = InvoiceLine
+        fields = ['id', 'invoice', 'material', 'quantity', 'unit_price']
+        read_only_fields = ['unit_price']
+
+
+class InvoiceSerializer(StockErrorsMixin, serializers.ModelSerializer):
     # Nested serialization for many-to-many relation
     material = MaterailSerializer(many=True, read_only=True)
     material_ids = serializers.PrimaryKeyRelatedField(queryset=Materail.objects.all(), many=True, write_only=True, source='material')
+    lines = InvoiceLineSerializer(many=True, read_only=True)
 
     class Meta:
         model = Invoice
-        fields = ['id', 'created_at', 'updated_at', 'material', 'material_ids']
+        fields = ['id', 'created_at', 'updated_at', 'material', 'material_ids', 'lines', 'total']
+        read_only_fields = ['total']
 
 
 class ServiceSerializer(serializers.ModelSerializer):
     invoice = InvoiceSerializer(read_only=True)
     invoice_id = serializers.PrimaryKeyRelatedField(queryset=Invoice.objects.all(), source='invoice', write_only=True)
     status_type = serializers.SerializerMethodField()
+    # read from the type service catalog, not joined
+    type_service_title = serializers.SerializerMethodField()
+    # method fields for the compiled list rendering (utils.compiled_serializer)
+    compiled_fields = {
+        'status_type': ('status', public_variable.ServiceTypeStatus.get),
+        'type_service_title': ('type_service', catalog.type_service_title),
+    }
 
     def get_status_type(self, obj):
         return public_variable.ServiceTypeStatus.get(obj.status)
 
+    def get_type_service_title(self, obj):
+        return catalog.type_service_title(obj.type_service_id)
+
     class Meta:
         model = Service
-        fields = ['id', 'created_at', 'updated_at', 'title', 'type_service', 'user', 'operator', 'desc', 'status', 'invoice', 'invoice_id', 'status_type']
+        fields = ['id', 'created_at', 'updated_at', 'title', 'type_service', 'type_service_title', 'user', 'operator', 'desc', 'status', 'invoice', 'invoice_id', 'status_type']
+
+
+class ArchivedServiceSerializer(ServiceSerializer):
+    """An archived service rendered like a live one, plus when it was archived."""
+
+    class Meta(ServiceSerializer.Meta):
+        model = ArchivedService
+        fields = ServiceSerializer.Meta.fields + ['archived_at']
 
 
 #only save first data
@@ -37,3 +130,22 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['title', 'user', 'desc'] 
+
+
+class ServiceBulkUpdateSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=500)
+    status = serializers.ChoiceField(choices=public_variable.ServiceStatus, required=False)
+    operator = serializers.PrimaryKeyRelatedField(
+        queryset=Admin.objects.filter(type_user=public_variable.REPAIRE_MEN_TYPE), allow_null=True, required=False
+    )
+    close = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs.pop('close'):
+            if attrs.get('status', public_variable.SERVICE_DONE) != public_variable.SERVICE_DONE:
+                raise serializers.ValidationError('بستن سرویس با وضعیت دیگری ممکن نیست')
+            attrs['status'] = public_variable.SERVICE_DONE
+        if 'status' not in attrs and 'operator' not in attrs:
+            raise serializers.ValidationError('هیچ تغییری ارسال نشده است')
+        attrs['ids'] = list(dict.fromkeys(attrs['ids']))
+        return attrs
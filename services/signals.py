@@ -0,0 +1,82 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from services import counters, invoices, stock
+from services.catalog import type_services
+from services.models import ArchivedService, Invoice, InvoiceLine, Materail, Service, TypeSercie
+from utils import public_variable
+
+
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=ArchivedService)
+def decrement_service_counters(sender, instance, using, **kwargs):
+    # fired inside the delete transaction, for queryset and cascade deletes too
+    # (archive moves delete without it, the moved services stay counted)
+    previous = instance.tracked_values()
+    if previous is None:
+        return
+    counters.apply_deltas(counters.service_deltas(previous, None), using=using)
+
+
+@receiver(post_save, sender=TypeSercie)
+@receiver(post_delete, sender=TypeSercie)
+def invalidate_type_services(sender, **kwargs):
+    type_services.invalidate()
+
+
+@receiver(post_save, sender=InvoiceLine)
+@receiver(post_delete, sender=InvoiceLine)
+def refresh_invoice_total(sender, instance, using, **kwargs):
+    invoices.refresh_totals([instance.invoice_id], using=using)
+
+
+@receiver(post_delete, sender=InvoiceLine)
+def return_line_stock(sender, instance, using, origin=None, **kwargs):
+    # also fired for invoice.material.remove / clear and cascades from invoice deletes
+    previous = instance.stock_values()
+    if previous is None:
+        return
+    deleting = getattr(origin, 'model', type(origin))
+    if deleting is Materail:
+        # the materail and its ledger go away with the line
+        return
+    # a movement must not point at an invoice that is deleted in the same transaction
+    invoice_id = None if deleting is Invoice else instance.invoice_id
+    stock.apply_movements(stock.line_movements(previous, None, invoice_id), public_variable.STOCK_RETURN, using=using)
+
+
+@receiver(post_save, sender=Materail)
+def record_opening_stock(sender, instance, created, using, **kwargs):
+    if created:
+        stock.record_opening([instance], using=using)
+
+
+@receiver(m2m_changed, sender=Invoice.material.through)
+def invoice_material_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    invoice.material.add/remove/set/clear (and the reverse side) write the
+    lines in bulk without InvoiceLine.save; capture prices, stock and
+    totals here.
+    """
+    lines = InvoiceLine.objects.using(using).filter(**{'material' if reverse else 'invoice': instance})
+    if action == 'pre_clear' and reverse:
+        instance._cleared_invoice_ids = list(lines.values_list('invoice_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_add':
+        added = lines.filter(**{'invoice__in' if reverse else 'material__in': pk_set})
+        invoices.capture_unit_prices(added)
+        # all added lines in one conditional update, InsufficientStock rolls the add back
+        stock.consume_lines(added, using=using)
+    if not reverse:
+        invoice_ids = [instance.pk]
+    elif action == 'post_clear':
+        invoice_ids = getattr(instance, '_cleared_invoice_ids', [])
+    else:
+        invoice_ids = pk_set
+    invoices.refresh_totals(invoice_ids, using=using)
+    if not reverse:
+        # the caller (e.g. InvoiceSerializer) goes on to render this instance
+        instance.refresh_from_db(using=using, fields=['total', 'updated_at'])
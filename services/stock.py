@@ -0,0 +1,253 @@
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from utils import public_variable
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Some materails do not have enough stock; shortages is {materail_id: missing quantity}."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(', '.join(f'{materail_id}: {missing}' for materail_id, missing in sorted(shortages.items())))
+
+
+def _per_materail(value_by_materail):
+    return Case(
+        *[When(pk=materail_id, then=Value(value)) for materail_id, value in value_by_materail.items()],
+        output_field=IntegerField(),
+    )
+
+
+def apply_movements(movements, reason, user=None, using=None):
+    """
+    Move stock for [(materail_id, quantity, invoice_id)] (quantity > 0 adds,
+    < 0 takes out) and append them to the ledger, all or nothing:
+
+    - one UPDATE changes the count of every materail with
+      count = count + delta, only where the result is not negative, so
+      concurrent consumers never lose an update or oversell,
+    - if any materail is short nothing is changed and InsufficientStock
+      is raised,
+    - one INSERT appends the movements.
+
+    Materails with a null count do not track stock and are skipped.
+    """
+    from services.models import Materail, StockMovement
+
+    if not movements:
+        return []
+    deltas = Counter()
+    for materail_id, quantity, invoice_id in movements:
+        deltas[materail_id] += quantity
+
+    using = using or router.db_for_write(Materail)
+    with transaction.atomic(using=using):
+        materails = Materail.objects.using(using)
+        tracked = set(materails.filter(pk__in=list(deltas), count__isnull=False).values_list('pk', flat=True))
+        changed = {materail_id: delta for materail_id, delta in deltas.items() if materail_id in tracked and delta}
+        if changed:
+            updated = materails.filter(pk__in=list(changed), count__gte=_per_materail({
+                materail_id: -delta for materail_id, delta in changed.items()
+            })).update(count=F('count') + _per_materail(changed), updated_at=timezone.now())
+            if updated != len(changed):
+                counts = dict(materails.filter(pk__in=list(changed)).values_list('pk', 'count'))
+                raise InsufficientStock({
+                    materail_id: -(counts.get(materail_id) or 0) - delta
+                    for materail_id, delta in changed.items()
+                    if (counts.get(materail_id) or 0) + delta < 0
+                })
+        rows = [
+            StockMovement(materail_id=materail_id, quantity=quantity, reason=reason, invoice_id=invoice_id, user=user)
+            for materail_id, quantity, invoice_id in movements
+            if materail_id in tracked and quantity
+        ]
+        return StockMovement.objects.using(using).bulk_create(rows)
+
+
+def consume_lines(lines, using=None):
+    """Take the quantities of these InvoiceLine rows (a queryset) out of stock."""
+    movements = [
+        (materail_id, -quantity, invoice_id)
+        for materail_id, quantity, invoice_id in lines.values_list('material_id', 'quantity', 'invoice_id')
+    ]
+    return apply_movements(movements, public_variable.STOCK_CONSUME, using=using)
+
+
+def line_movements(previous, current, invoice_id):
+    """
+    Movements for an invoice line going from previous to current
+    (materail_id, quantity) values, None for created / deleted.
+    """
+    movements = []
+    if previous is not None:
+        movements.append((previous[0], previous[1], invoice_id))
+    if current is not None:
+        movements.append((current[0], -current[1], invoice_id))
+    if previous is not None and current is not None and previous[0] == current[0]:
+        movements = [(current[0], previous[1] - current[1], invoice_id)]
+    return [movement for movement in movements if movement[1]]
+
+
+def record_opening(materails, using=None):
+    """Opening movements for newly created materails that track stock."""
+    from services.models import StockMovement
+
+    rows = [
+        StockMovement(materail_id=materail.pk, quantity=materail.count, reason=public_variable.STOCK_OPENING)
+        for materail in materails
+        if materail.count
+    ]
+    return StockMovement.objects.using(using).bulk_create(rows)
+
+
+def set_count(materail, count, user=None, using=None):
+    """Set the stock of a materail to count, recorded as one adjustment movement."""
+    from services.models import Materail, StockMovement
+
+    using = using or router.db_for_write(Materail)
+    with transaction.atomic(using=using):
+        current = Materail.objects.using(using).select_for_update().filter(pk=materail.pk).values_list('count', flat=True).get()
+        Materail.objects.using(using).filter(pk=materail.pk).update(count=count, updated_at=timezone.now())
+        if count is not None and count != (current or 0):
+            StockMovement.objects.using(using).create(
+                materail_id=materail.pk, quantity=count - (current or 0), reason=public_variable.STOCK_ADJUST, user=user
+            )
+    materail.count = count
+
+
+def balances(materail_ids, using=None):
+    """
+    Stock per materail from the ledger: the last snapshot plus the movements
+    after it, so only the recent tail of the ledger is summed.
+    """
+    from services.models import StockMovement, StockSnapshot
+
+    snapshots = {
+        row['materail_id']: row
+        for row in StockSnapshot.objects.using(using).filter(materail_id__in=materail_ids).values('materail_id', 'balance', 'last_movement_id')
+    }
+    result = {materail_id: snapshots[materail_id]['balance'] if materail_id in snapshots else 0 for materail_id in materail_ids}
+    after = Q()
+    for materail_id in materail_ids:
+        after |= Q(materail_id=materail_id, id__gt=snapshots[materail_id]['last_movement_id'] if materail_id in snapshots else 0)
+    if materail_ids:
+        tail = StockMovement.objects.using(using).filter(after).order_by().values('materail_id').annotate(total=Sum('quantity'))
+        for row in tail:
+            result[row['materail_id']] += row['total']
+    return result
+
+
+def committed_watermark(using=None, timeout=None):
+    """
+    The highest movement id below which no movement can still appear, None
+    if in-flight writers did not finish within `timeout` seconds.
+
+    Ids come from a sequence before the inserting transaction commits, so
+    max(id) can be ahead of a movement still in flight. Every stock writer
+    changes a row (the count, the line) before it inserts movements, so a
+    transaction holding an id below the visible max already had an xid when
+    that max was read. On postgres the read takes an xid of its own, then
+    waits until no transaction older than it is running (its own, when
+    called inside an outer transaction, is not waited for). Nothing is
+    locked, writers never wait on this reader.
+    """
+    from services.models import StockMovement
+
+    using = using or router.db_for_write(StockMovement)
+    connection = connections[using]
+    table = connection.ops.quote_name(StockMovement._meta.db_table)
+    if connection.vendor != 'postgresql':
+        # sqlite serializes writers, a committed max id has nothing in flight below it
+        return StockMovement.objects.using(using).aggregate(last=Max('id'))['last'] or 0
+
+    timeout = getattr(settings, 'STOCK_SNAPSHOT_WAIT', 30) if timeout is None else timeout
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'SELECT (SELECT max(id) FROM {table}), pg_current_xact_id()')
+        last_id, xid = cursor.fetchone()
+    deadline = time.monotonic() + timeout
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                'SELECT NOT EXISTS (SELECT 1 FROM pg_snapshot_xip(pg_current_snapshot()) AS running WHERE running < %s::xid8)',
+                [str(xid)],
+            )
+            if cursor.fetchone()[0]:
+                return last_id or 0
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0.05)
+
+
+def take_snapshot(using=None):
+    """
+    Fold the movements since the previous snapshot into the snapshots of
+    the materails that had some, up to the committed watermark, and compare
+    every materail's ledger balance with Materail.count. Returns the
+    materails whose count does not match the ledger ({id: (count, ledger)}).
+    """
+    from services.models import Materail, StockMovement, StockSnapshot
+
+    using = using or router.db_for_write(StockSnapshot)
+    last_id = committed_watermark(using=using)
+    if last_id is None:
+        logger.warning('stock snapshot skipped: writers still in flight')
+        return {}
+    with transaction.atomic(using=using):
+        # one run at a time: the snapshot rows are only written here
+        snapshots = {snapshot.materail_id: snapshot for snapshot in StockSnapshot.objects.using(using).select_for_update()}
+        # every run folds all movements up to its watermark, the highest one is where the previous run stopped
+        since = max((snapshot.last_movement_id for snapshot in snapshots.values()), default=0)
+        totals = Counter()
+        if last_id > since:
+            tail = (
+                StockMovement.objects.using(using)
+                .filter(id__gt=since, id__lte=last_id)
+                .order_by()
+                .values('materail_id')
+                .annotate(total=Sum('quantity'))
+            )
+            totals.update({row['materail_id']: row['total'] for row in tail})
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for materail_id, total in totals.items():
+            snapshot = snapshots.get(materail_id)
+            if snapshot is None:
+                snapshot = StockSnapshot(materail_id=materail_id, balance=total, last_movement_id=last_id, taken_at=now)
+                snapshots[materail_id] = snapshot
+                to_create.append(snapshot)
+            else:
+                snapshot.balance += total
+                snapshot.last_movement_id = last_id
+                snapshot.taken_at = now
+                to_update.append(snapshot)
+        StockSnapshot.objects.using(using).bulk_create(to_create)
+        StockSnapshot.objects.using(using).bulk_update(to_update, ['balance', 'last_movement_id', 'taken_at'], batch_size=1000)
+
+    # ledger (snapshots + the movements after the watermark) and count from one snapshot of the database
+    connection = connections[using]
+    # SET TRANSACTION must come first, inside an outer transaction the snapshot is the caller's
+    repeatable_read = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if repeatable_read:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        ledger = {materail_id: snapshot.balance for materail_id, snapshot in snapshots.items()}
+        recent = StockMovement.objects.using(using).filter(id__gt=last_id).order_by().values('materail_id').annotate(total=Sum('quantity'))
+        for row in recent:
+            ledger[row['materail_id']] = ledger.get(row['materail_id'], 0) + row['total']
+        counts = dict(Materail.objects.using(using).filter(pk__in=list(ledger)).values_list('pk', 'count'))
+    return {
+        materail_id: (counts[materail_id], balance)
+        for materail_id, balance in ledger.items()
+        if materail_id in counts and counts[materail_id] is not None and counts[materail_id] != balance
+    }
@@ -0,0 +1,70 @@
+import logging
+
+from celery import shared_task
+
+from services import archive, counters, history, stock
+from services.importers import ImportValidationError, count_rows, import_materails
+from services.models import MaterailImportJob
+from utils import public_variable
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task()
+def import_materails_job(job_id):
+    job = MaterailImportJob.objects.get(id=job_id)
+    MaterailImportJob.objects.filter(id=job_id).update(status=public_variable.IMPORT_RUNNING)
+
+    def on_progress(result):
+        MaterailImportJob.objects.filter(id=job_id).update(
+            processed_rows=result.processed_rows,
+            imported_count=result.imported_count,
+            errors=result.errors,
+        )
+
+    try:
+        with job.file.open('rb') as file:
+            total_rows = count_rows(file, job.file.name)
+            MaterailImportJob.objects.filter(id=job_id).update(total_rows=total_rows)
+            result = import_materails(file, job.file.name, on_progress=on_progress)
+    except ImportValidationError as e:
+        MaterailImportJob.objects.filter(id=job_id).update(status=public_variable.IMPORT_FAILED, message=str(e))
+        return
+    except Exception as e:
+        MaterailImportJob.objects.filter(id=job_id).update(
+            status=public_variable.IMPORT_FAILED,
+            message=f'خطا در پردازش فایل: {str(e)}',
+        )
+        raise
+
+    MaterailImportJob.objects.filter(id=job_id).update(
+        status=public_variable.IMPORT_DONE,
+        processed_rows=result.processed_rows,
+        imported_count=result.imported_count,
+        errors=result.errors,
+        message=f'{result.imported_count} متریال با موفقیت وارد شد',
+    )
+
+
+@shared_task()
+def reconcile_service_counters():
+    return counters.reconcile()
+
+
+@shared_task()
+def snapshot_stock():
+    drift = stock.take_snapshot()
+    if drift:
+        logger.warning('materail count differs from the stock ledger: %s', drift)
+    return len(drift)
+
+
+@shared_task()
+def rollup_service_status(days=2):
+    """Rebuild the time-in-status rollups of the last `days` local days from the status events."""
+    return history.rollup_days(history.recent_days(days))
+
+
+@shared_task()
+def archive_services():
+    return archive.archive_services()
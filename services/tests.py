@@ -1,3 +1,1079 @@
-from django.test import TestCase
+import base64
+import datetime
+import decimal
+import io
+import json
+import random
+import threading
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from admins.filters import AdminFilter
+from admins.models import Admin
+from services import archive, counters, history, stock
+from services.catalog import type_services
+from services.filters import ServiceFilter
+from services.models import (
+    ArchivedService, Invoice, InvoiceLine, Materail, MaterailImportJob, Service, ServiceCounter, ServiceStatusEvent, TypeSercie,
+)
+from services.serializers import (
+    ArchivedServiceSerializer, InvoiceSerializer, MaterailSerializer, ServiceSerializer, TypeServiceSerializer,
+)
+from utils import public_variable
+from utils.compiled_serializer import compile_serializer
+from utils.explain import explain, has_seq_scan, index_names
+from utils.pagination import CustomPaginationClass
+
+
+def run_together(count, target):
+    """Run target(index) in `count` threads released at the same moment; returns what each one returned or raised."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target(index, barrier)
+        except Exception as e:
+            results[index] = e
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@skipUnless(connection.vendor == 'postgresql', 'sqlite serializes writers, the races need postgres')
+class StockConcurrencyTests(TransactionTestCase):
+    """Concurrent stock writers: no lost update, no oversold stock, the ledger sums to the count."""
+
+    def assert_ledger_matches(self, materail):
+        materail.refresh_from_db()
+        self.assertGreaterEqual(materail.count, 0)
+        self.assertEqual(stock.balances([materail.pk])[materail.pk], materail.count)
+
+    def test_concurrent_adds_never_oversell(self):
+        materail = Materail.objects.create(title='race add', count=50, price=1)
+        invoices = [Invoice.objects.create() for _ in range(20)]
+
+        def add(index, barrier):
+            barrier.wait()
+            with transaction.atomic():
+                invoices[index].material.add(materail, through_defaults={'quantity': 3})
+            return 3
+
+        results = run_together(len(invoices), add)
+        added = [result for result in results if result == 3]
+        refused = [result for result in results if isinstance(result, stock.InsufficientStock)]
+        self.assertEqual(len(added) + len(refused), len(invoices), results)
+        self.assertEqual(len(added), 16)
+        materail.refresh_from_db()
+        self.assertEqual(materail.count, 50 - 3 * len(added))
+        self.assertEqual(InvoiceLine.objects.filter(material=materail).count(), len(added))
+        self.assert_ledger_matches(materail)
+
+    def test_concurrent_edits_of_a_line_apply_each_delta(self):
+        materail = Materail.objects.create(title='race edit', count=100, price=1)
+        invoice = Invoice.objects.create()
+        invoice.material.add(materail, through_defaults={'quantity': 1})
+        line_id = InvoiceLine.objects.get(invoice=invoice).pk
+        quantities = [2, 5, 9, 3, 7, 4, 8, 6]
+
+        def edit(index, barrier):
+            # every thread loads the line before any of them saves, all see quantity 1
+            line = InvoiceLine.objects.get(pk=line_id)
+            barrier.wait()
+            line.quantity = quantities[index]
+            line.save()
+
+        results = run_together(len(quantities), edit)
+        self.assertEqual(results, [None] * len(quantities))
+        line = InvoiceLine.objects.get(pk=line_id)
+        self.assertIn(line.quantity, quantities)
+        materail.refresh_from_db()
+        self.assertEqual(materail.count, 100 - line.quantity)
+        self.assert_ledger_matches(materail)
+
+    def test_adds_and_edits_race_on_one_materail(self):
+        materail = Materail.objects.create(title='race mixed', count=30, price=1)
+        invoice = Invoice.objects.create()
+        invoice.material.add(materail, through_defaults={'quantity': 1})
+        line_id = InvoiceLine.objects.get(invoice=invoice).pk
+        others = [Invoice.objects.create() for _ in range(6)]
+
+        def work(index, barrier):
+            if index < len(others):
+                barrier.wait()
+                with transaction.atomic():
+                    others[index].material.add(materail, through_defaults={'quantity': 4})
+                return
+            line = InvoiceLine.objects.get(pk=line_id)
+            barrier.wait()
+            line.quantity = 2 + index
+            line.save()
+
+        results = run_together(len(others) + 4, work)
+        for result in results:
+            if result is not None:
+                self.assertIsInstance(result, stock.InsufficientStock)
+        used = sum(InvoiceLine.objects.filter(material=materail).values_list('quantity', flat=True))
+        materail.refresh_from_db()
+        self.assertEqual(materail.count, 30 - used)
+        self.assert_ledger_matches(materail)
+
+    def test_snapshot_waits_for_movements_in_flight(self):
+        materail = Materail.objects.create(title='snapshot', count=10, price=1)
+        inserted, release = threading.Event(), threading.Event()
+
+        def writer():
+            try:
+                with transaction.atomic():
+                    stock.apply_movements([(materail.pk, -1, None)], public_variable.STOCK_CONSUME)
+                    inserted.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            inserted.wait(10)
+            self.assertIsNone(stock.committed_watermark(timeout=0.2))
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(stock.take_snapshot(), {})
+        self.assertEqual(materail.stock_snapshot.balance, 9)
+        self.assert_ledger_matches(materail)
+
+
+class MaterailCountTests(TestCase):
+    def test_snapshot_inside_a_transaction(self):
+        # TestCase runs every test in a transaction, SET TRANSACTION would fail here on postgres
+        materail = Materail.objects.create(title='count', count=5, price=1)
+        stock.apply_movements([(materail.pk, -2, None)], public_variable.STOCK_CONSUME)
+        self.assertEqual(stock.take_snapshot(), {})
+        self.assertEqual(materail.stock_snapshot.balance, 3)
+
+    def test_count_cannot_be_set_negative(self):
+        materail = Materail.objects.create(title='count', count=5, price=1)
+        serializer = MaterailSerializer(materail, data={'count': -5}, partial=True)
+        with self.assertRaises(ValidationError):
+            serializer.is_valid(raise_exception=True)
+        materail.refresh_from_db()
+        self.assertEqual(materail.count, 5)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Queries per read action, independent of the number of rows: the query
+    plans (utils.query_planning) and compiled serializers must not fall back
+    to one query per row or per relation.
+    """
+    # postgres reads the planner estimate before counting a small table
+    ESTIMATE = 1 if connection.vendor == 'postgresql' else 0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.user = Admin.objects.create(username='customer', type_user=public_variable.USER_TYPE)
+        cls.operator = Admin.objects.create(username='operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+        type_service = TypeSercie.objects.create(title='کولر', code=1)
+        cls.materails = [Materail.objects.create(title=f'قطعه {index}', count=100, price=10) for index in range(3)]
+        cls.invoices = []
+        for index in range(6):
+            invoice = Invoice.objects.create()
+            invoice.material.add(*cls.materails[:2], through_defaults={'quantity': 1})
+            cls.invoices.append(invoice)
+            Service.objects.create(
+                title=f'سرویس {index}', user=cls.user, operator=cls.operator, type_service=type_service, invoice=invoice,
+            )
+        cls.service = Service.objects.order_by('id').first()
+
+    def setUp(self):
+        # counts cached by the paginator and a type catalog loaded by another test would hide queries
+        cache.clear()
+        type_services.warm()
+        self.client = APIClient()
+
+    def get(self, path, user=None):
+        self.client.force_authenticate(user or self.admin)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_materail_list(self):
+        # page, count, page validators
+        with self.assertNumQueries(3):
+            self.get('/api/materails/')
+
+    def test_materail_detail(self):
+        # validators, row
+        with self.assertNumQueries(2):
+            self.get(f'/api/materails/{self.materails[0].pk}/')
+
+    def test_invoice_list(self):
+        # validators, invoices, their materails and lines
+        with self.assertNumQueries(4):
+            response = self.get('/api/invoices/')
+        self.assertEqual(len(response.data), len(self.invoices))
+
+    def test_invoice_detail(self):
+        # validators, invoice, its materails and lines
+        with self.assertNumQueries(4):
+            self.get(f'/api/invoices/{self.invoices[0].pk}/')
+
+    def test_service_list(self):
+        # page, count, page validators, the invoices' materails and lines
+        with self.assertNumQueries(5 + self.ESTIMATE):
+            response = self.get('/api/services/')
+        self.assertEqual(len(response.data['results']), len(self.invoices))
+
+    def test_service_detail(self):
+        # validators, service, the invoice's materails and lines
+        with self.assertNumQueries(4):
+            self.get(f'/api/services/{self.service.pk}/')
+
+    def test_service_me(self):
+        with self.assertNumQueries(4):
+            response = self.get('/api/services/me/', user=self.user)
+        self.assertEqual(len(response.data), len(self.invoices))
+
+    def test_services_assigned_to_operator(self):
+        with self.assertNumQueries(4):
+            response = self.get('/api/services/services_assigned_to_operator/', user=self.operator)
+        self.assertEqual(len(response.data), len(self.invoices))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'the indexes are chosen by the postgres planner')
+class ListIndexTests(TestCase):
+    """
+    Every service / admin list query is a range scan of its composite index
+    (ending in the list ordering) on a table large enough for the planner
+    to prefer it over a sequential scan.
+    """
+    SERVICES = 30000
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        Admin.objects.bulk_create(
+            [Admin(username=f'user_{i}', phone=f'+98912{i:07d}', type_user=public_variable.USER_TYPE) for i in range(2000)]
+            + [Admin(username=f'operator_{i}', type_user=public_variable.REPAIRE_MEN_TYPE) for i in range(50)],
+        )
+        user_ids = list(Admin.objects.filter(type_user=public_variable.USER_TYPE).values_list('id', flat=True))
+        operator_ids = list(Admin.objects.filter(type_user=public_variable.REPAIRE_MEN_TYPE).values_list('id', flat=True))
+        statuses = [status for status, _ in public_variable.ServiceStatus]
+        Service.objects.bulk_create([
+            Service(
+                title=f'service {i}',
+                user_id=rng.choice(user_ids),
+                operator_id=rng.choice(operator_ids) if rng.random() < 0.8 else None,
+                # most services end up done, so the open queue is a small slice
+                status=public_variable.SERVICE_DONE if rng.random() < 0.85 else rng.choice(statuses),
+            )
+            for i in range(cls.SERVICES)
+        ], batch_size=5000)
+        with connection.cursor() as cursor:
+            # created_at is auto_now_add, spread it over the last year
+            cursor.execute(f"UPDATE {Service._meta.db_table} SET created_at = now() - random() * interval '365 days'")
+            cursor.execute(f'ANALYZE {Service._meta.db_table}')
+            cursor.execute(f'ANALYZE {Admin._meta.db_table}')
+        cls.user = Admin.objects.filter(type_user=public_variable.USER_TYPE).first()
+        cls.operator = Admin.objects.filter(type_user=public_variable.REPAIRE_MEN_TYPE).first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # pg_class.reltuples is not rolled back, the paginator of later tests would trust it
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Service._meta.db_table}')
+            cursor.execute(f'ANALYZE {Admin._meta.db_table}')
+
+    def assert_uses_index(self, queryset, expected):
+        queryset = queryset[:10]
+        plan = explain(queryset)
+        self.assertIn(expected, set(index_names(plan)), plan)
+        self.assertFalse(has_seq_scan(plan, queryset.model._meta.db_table), plan)
+
+    def test_service_lists(self):
+        services = Service.objects.order_by('-created_at', '-id')
+        since = (timezone.now() - datetime.timedelta(days=7)).isoformat()
+        for label, queryset, expected in [
+            ('list', services, 'services_created_idx'),
+            ('list by created_at', ServiceFilter({'created_at_after': since}, queryset=services).qs, 'services_created_idx'),
+            ('list by status', ServiceFilter({'status': ['1']}, queryset=services).qs, 'services_status_created_idx'),
+            ('me', services.filter(user=self.user), 'services_user_created_idx'),
+            ('operator queue', services.filter(operator=self.operator), 'services_operator_created_idx'),
+            (
+                'operator open queue',
+                ServiceFilter({'is_open': 'true'}, queryset=services.filter(operator=self.operator)).qs,
+                'services_operator_open_idx',
+            ),
+        ]:
+            with self.subTest(label):
+                self.assert_uses_index(queryset, expected)
+
+    def test_admin_lists(self):
+        operators = Admin.objects.filter(type_user=public_variable.REPAIRE_MEN_TYPE).order_by('-created', '-id')
+        self.assert_uses_index(AdminFilter({}, queryset=operators).qs, 'admins_type_created_idx')
+        self.assert_uses_index(
+            Admin.objects.filter(phone=self.user.phone, type_user=public_variable.USER_TYPE), 'admins_phone_type_idx'
+        )
+
+
+class ServiceEventsTests(TransactionTestCase):
+    """
+    ws/services/ through the project's ASGI application and the in-memory
+    channel layer. Not a TestCase: the pushes are sent on commit and the
+    consumer reads the user from another thread.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Admin.objects.create(username='customer', type_user=public_variable.USER_TYPE)
+        self.operator = Admin.objects.create(username='operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+        self.other_operator = Admin.objects.create(username='other operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+        self.service = Service.objects.create(title='سرویس', user=self.user, operator=self.operator)
+        # the in-memory layer is process wide, drop groups left by an earlier test
+        async_to_sync(get_channel_layer().flush)()
+        self.communicators = []
+
+    async def connect(self, user=None, token=None):
+        from cs_crm.asgi import application
+
+        if user is not None:
+            token = str(AccessToken.for_user(user))
+        path = 'ws/services/' + (f'?token={token}' if token else '')
+        communicator = WebsocketCommunicator(application, path, headers=[(b'origin', b'http://testserver')])
+        connected, code = await communicator.connect()
+        if connected:
+            self.communicators.append(communicator)
+        return communicator, connected, code
+
+    async def disconnect(self):
+        for communicator in self.communicators:
+            await communicator.disconnect()
+
+    async def change(self, **fields):
+        def save():
+            for name, value in fields.items():
+                setattr(self.service, name, value)
+            self.service.save()
+        await database_sync_to_async(save)()
+
+    async def test_rejects_missing_and_invalid_tokens(self):
+        for token in (None, 'not-a-token'):
+            with self.subTest(token=token):
+                _, connected, code = await self.connect(token=token)
+                self.assertFalse(connected)
+                self.assertEqual(code, 4401)
+
+    async def test_owner_receives_the_status_change(self):
+        communicator, connected, _ = await self.connect(self.user)
+        self.assertTrue(connected)
+        await self.change(status=public_variable.SERVICE_DONE)
+
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['event'], 'service_changed')
+        self.assertEqual(event['id'], self.service.pk)
+        self.assertEqual(event['changed'], ['status'])
+        self.assertEqual(event['status'], public_variable.SERVICE_DONE)
+        self.assertEqual(event['status_type'], public_variable.ServiceTypeStatus.get(public_variable.SERVICE_DONE))
+        self.assertEqual(event['previous_status'], 0)
+        self.assertEqual(event['operator'], self.operator.pk)
+        self.assertEqual(event['previous_operator'], self.operator.pk)
+        self.assertIn('at', event)
+        await self.disconnect()
+
+    async def test_reassignment_reaches_the_owner_and_both_operators(self):
+        subscribers = [(await self.connect(user))[0] for user in (self.user, self.operator, self.other_operator)]
+        await self.change(operator=self.other_operator)
+
+        for communicator in subscribers:
+            event = await communicator.receive_json_from()
+            self.assertEqual(event['changed'], ['operator'])
+            self.assertEqual(event['operator'], self.other_operator.pk)
+            self.assertEqual(event['previous_operator'], self.operator.pk)
+        await self.disconnect()
+
+    async def test_others_receive_nothing(self):
+        stranger = await database_sync_to_async(Admin.objects.create)(username='stranger', type_user=public_variable.USER_TYPE)
+        other_operator, _, _ = await self.connect(self.other_operator)
+        other_user, _, _ = await self.connect(stranger)
+        await self.change(status=public_variable.SERVICE_DONE)
+
+        self.assertTrue(await other_operator.receive_nothing())
+        self.assertTrue(await other_user.receive_nothing())
+        await self.disconnect()
+
+    async def test_operator_groups_are_only_joined_by_operators(self):
+        # a customer only joins its own group, an operator its queue as well
+        await self.connect(self.user)
+        await self.connect(self.operator)
+        groups = get_channel_layer().groups
+        self.assertIn(f'user_{self.user.pk}', groups)
+        self.assertNotIn(f'operator_{self.user.pk}', groups)
+        self.assertIn(f'operator_{self.operator.pk}', groups)
+        await self.disconnect()
+
+    async def test_unpushed_fields_and_rollbacks_send_nothing(self):
+        communicator, _, _ = await self.connect(self.user)
+        await self.change(title='عنوان تازه')
+        self.assertTrue(await communicator.receive_nothing())
+
+        def rolled_back():
+            with transaction.atomic():
+                self.service.status = public_variable.SERVICE_DONE
+                self.service.save()
+                transaction.set_rollback(True)
+        await database_sync_to_async(rolled_back)()
+        self.assertTrue(await communicator.receive_nothing())
+        await self.disconnect()
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        for index in range(5):
+            Service.objects.create(title=f'سرویس {index}', user=cls.admin)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, cursor):
+        return self.client.get('/api/services/', {'cursor': cursor, 'page_item_count': 2})
+
+    def encode(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_walks_the_pages(self):
+        response = self.get('')
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, list(Service.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_tampered_cursors_are_not_found(self):
+        for label, cursor in [
+            ('not base64 json', 'abc'),
+            ('not an object', self.encode([1, 2])),
+            ('missing keys', self.encode({'v': ['2025-01-01T00:00:00+00:00', 1]})),
+            ('position not a list', self.encode({'v': 5, 'p': 2, 'r': False})),
+            ('position too short', self.encode({'v': ['2025-01-01T00:00:00+00:00'], 'p': 2, 'r': False})),
+            ('position too long', self.encode({'v': ['2025-01-01T00:00:00+00:00', 1, 2], 'p': 2, 'r': False})),
+            ('not a datetime', self.encode({'v': ['yesterday', 1], 'p': 2, 'r': False})),
+            ('not an id', self.encode({'v': ['2025-01-01T00:00:00+00:00', 'one'], 'p': 2, 'r': False})),
+            ('null value', self.encode({'v': [None, 1], 'p': 2, 'r': False})),
+            ('nested value', self.encode({'v': [['2025-01-01'], {}], 'p': 2, 'r': False})),
+        ]:
+            with self.subTest(label):
+                self.assertEqual(self.get(cursor).status_code, 404)
+
+
+class EstimateCountTests(TestCase):
+    """Below the estimate threshold result_count is exact, never a cached one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        Service.objects.create(title='سرویس', user=cls.admin, operator=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def count(self, **params):
+        response = self.client.get('/api/services/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['result_count']
+
+    def test_count_follows_writes(self):
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(self.count(operator=self.admin.pk), 1)
+        Service.objects.create(title='سرویس', user=self.admin, operator=self.admin)
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(self.count(operator=self.admin.pk), 2)
+
+    def test_empty_queryset(self):
+        paginator = CustomPaginationClass()
+        paginator.count_mode = 'estimate'
+        paginator.view = None
+        self.assertEqual(paginator.get_result_count(Service.objects.none()), 0)
+
+
+class ImportStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Admin.objects.create(username='owner', type_user=public_variable.REPAIRE_MEN_TYPE)
+        cls.other = Admin.objects.create(username='other', type_user=public_variable.USER_TYPE)
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.job = MaterailImportJob.objects.create(user=cls.owner, file='imports/materails/a.xlsx', errors=[{'row': 2}])
+
+    def status_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/materails/import_status/{self.job.pk}/')
+
+    def test_only_the_creator_and_admins_see_the_job(self):
+        self.assertEqual(self.status_for(self.owner).status_code, 200)
+        self.assertEqual(self.status_for(self.admin).data['errors'], [{'row': 2}])
+        self.assertEqual(self.status_for(self.other).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.materails = [Materail.objects.create(title=f'قطعه {index}', count=10, price=10) for index in range(3)]
+        cls.service = Service.objects.create(title='سرویس', user=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assert_revalidates(self, path):
+        """200 with an ETag, then 304 for it; returns the ETag."""
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Authorization', response['Vary'])
+        not_modified = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        return response
+
+    def test_list_page(self):
+        etag = self.assert_revalidates('/api/materails/')['ETag']
+        self.client.patch(f'/api/materails/{self.materails[0].pk}/', {'title': 'تازه'}, format='json')
+        response = self.client.get('/api/materails/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_page_changes_with_a_deleted_row(self):
+        etag = self.assert_revalidates('/api/materails/')['ETag']
+        self.materails[1].delete()
+        self.assertEqual(self.client.get('/api/materails/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail(self):
+        path = f'/api/materails/{self.materails[0].pk}/'
+        response = self.assert_revalidates(path)
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.client.patch(path, {'title': 'تازه'}, format='json')
+        changed = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertEqual(changed.data['title'], 'تازه')
+
+    def test_service_and_admin_detail(self):
+        self.assert_revalidates(f'/api/services/{self.service.pk}/')
+        self.assert_revalidates(f'/api/admins/detail/{self.admin.pk}?type={public_variable.ADMIN_TYPE}')
+
+    def test_missing_detail_is_not_found(self):
+        self.assertEqual(self.client.get('/api/materails/0/').status_code, 404)
+
+
+class SearchTests(TestCase):
+    """?search= matches whichever way the persian text or digits were typed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Admin.objects.create(username='user', type_user=public_variable.ADMIN_TYPE)
+        cls.materail = Materail.objects.create(title='كيك يخچال ۱۲', count=1, price=1)
+        Materail.objects.create(title='لوله', count=1, price=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, text):
+        response = self.client.get('/api/materails/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_arabic_and_persian_variants(self):
+        for text in ['کیک', 'كيك', 'یخچال 12', 'يخچال ١٢', 'یخچال ۱۲']:
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), [self.materail.pk])
+
+
+@override_settings(CATALOG_CHECK_INTERVAL=0)
+class CatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.customer = Admin.objects.create(username='customer', type_user=public_variable.USER_TYPE)
+        cls.cooler = TypeSercie.objects.create(title='کولر', code=1)
+
+    def setUp(self):
+        # a snapshot loaded by another test has version 0 as well
+        cache.clear()
+        type_services._snapshot = None
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_write_bumps_the_version_and_reloads(self):
+        etag = self.client.get('/api/type_services/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/type_services/', {'title': 'پکیج', 'code': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(cache.get(type_services.version_key), 1)
+
+        response = self.client.get('/api/type_services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['code'] for row in json.loads(response.content)], [1, 2])
+        self.assertEqual(type_services.snapshot().version, 1)
+        self.assertEqual(self.client.get('/api/type_services/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_lookup_by_code(self):
+        self.assertEqual(self.client.get('/api/type_services/', {'code': 1}).data, [{'id': self.cooler.pk, 'title': 'کولر', 'code': 1}])
+        self.assertEqual(self.client.get('/api/type_services/', {'code': 9}).data, [])
+        self.assertEqual(self.client.get('/api/type_services/', {'code': 'x'}).data, [])
+        self.assertEqual(self.client.get(f'/api/type_services/{self.cooler.pk}/').data['title'], 'کولر')
+
+    def test_only_admins_write(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/type_services/').status_code, 200)
+        self.assertEqual(self.client.post('/api/type_services/', {'title': 'پکیج', 'code': 2}, format='json').status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/type_services/{self.cooler.pk}/').status_code, 403)
+        self.assertTrue(TypeSercie.objects.filter(pk=self.cooler.pk).exists())
+
+
+class CompiledSerializerTests(TestCase):
+    """The compiled values() rendering gives the same JSON as the DRF serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Admin.objects.create(username='customer', type_user=public_variable.USER_TYPE)
+        operator = Admin.objects.create(username='operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+        type_service = TypeSercie.objects.create(title='کولر', code=1)
+        materails = [
+            Materail.objects.create(title='قطعه', count=100, price=decimal.Decimal('1234.500000')),
+            Materail.objects.create(title='بدون قیمت', count=None, price=None),
+            Materail.objects.create(title='کسری', count=0, price=decimal.Decimal('0.000001')),
+        ]
+        invoice = Invoice.objects.create()
+        invoice.material.add(materails[0], through_defaults={'quantity': 3})
+        invoice.material.add(materails[1], through_defaults={'quantity': 1})
+        Service.objects.create(
+            title='کامل', desc='توضیح', user=cls.user, operator=operator, type_service=type_service, invoice=invoice,
+            status=public_variable.SERVICE_DONE,
+        )
+        # null foreign keys and desc, an invoice without lines
+        Service.objects.create(title='خالی', user=cls.user, invoice=Invoice.objects.create())
+        Service.objects.create(title='بدون فاکتور', user=cls.user)
+        when = datetime.datetime(2024, 3, 20, 23, 45, 1, 123456, tzinfo=datetime.timezone.utc)
+        Service.objects.update(created_at=when)
+        Materail.objects.filter(pk=materails[2].pk).update(created_at=when.replace(microsecond=0))
+        ArchivedService.objects.create(
+            id=10 ** 6, created_at=when, updated_at=when, title='بایگانی', user=cls.user, type_service=type_service,
+            status=public_variable.SERVICE_DONE, invoice=invoice, archived_at=when,
+        )
+
+    def setUp(self):
+        type_services.warm()
+
+    def assert_same(self, serializer_class, queryset):
+        compiled = compile_serializer(serializer_class)
+        self.assertIsNotNone(compiled)
+        queryset = queryset.order_by('id')
+        self.assertEqual(
+            JSONRenderer().render(compiled.render(compiled.values(queryset))),
+            JSONRenderer().render(serializer_class(queryset, many=True).data),
+        )
+
+    def test_same_output(self):
+        for serializer_class, queryset in [
+            (MaterailSerializer, Materail.objects.all()),
+            (InvoiceSerializer, Invoice.objects.all()),
+            (ServiceSerializer, Service.objects.all()),
+            (ArchivedServiceSerializer, ArchivedService.objects.all()),
+            (TypeServiceSerializer, TypeSercie.objects.all()),
+        ]:
+            for tz in ['UTC', 'Asia/Tehran']:
+                with self.subTest(serializer_class.__name__, tz=tz), timezone.override(tz):
+                    self.assert_same(serializer_class, queryset)
+
+
+def stored_counters():
+    return {(row.dimension, row.key): row.value for row in ServiceCounter.objects.exclude(value=0)}
+
+
+class BulkUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.owner = Admin.objects.create(username='owner', type_user=public_variable.USER_TYPE)
+        cls.other = Admin.objects.create(username='other', type_user=public_variable.USER_TYPE)
+        cls.operator = Admin.objects.create(username='operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+        cls.own = [Service.objects.create(title=f'سرویس {index}', user=cls.owner) for index in range(2)]
+        cls.foreign = Service.objects.create(title='دیگری', user=cls.other)
+        cls.done = Service.objects.create(title='بسته', user=cls.owner, status=public_variable.SERVICE_DONE)
+
+    def bulk(self, user, **data):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/services/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row['id'], row['result']) for row in response.data['results']]
+
+    def test_results_per_item(self):
+        missing = Service.objects.order_by('-id').first().pk + 1
+        ids = [self.own[0].pk, missing, self.foreign.pk, self.done.pk, self.own[1].pk, self.own[0].pk]
+        self.assertEqual(self.bulk(self.owner, ids=ids, close=True), [
+            (self.own[0].pk, 'updated'),
+            (missing, 'not_found'),
+            (self.foreign.pk, 'forbidden'),
+            (self.done.pk, 'unchanged'),
+            (self.own[1].pk, 'updated'),
+        ])
+        # the rejected items do not roll the others back
+        self.assertEqual(
+            dict(Service.objects.values_list('id', 'status')),
+            {
+                self.own[0].pk: public_variable.SERVICE_DONE, self.own[1].pk: public_variable.SERVICE_DONE,
+                self.foreign.pk: public_variable.SERVICE_PENDING, self.done.pk: public_variable.SERVICE_DONE,
+            },
+        )
+        self.assertEqual(
+            sorted(ServiceStatusEvent.objects.filter(previous_status=public_variable.SERVICE_PENDING).values_list('service_id', flat=True)),
+            sorted(service.pk for service in self.own),
+        )
+
+    def test_admin_updates_any_service(self):
+        ids = [self.own[0].pk, self.foreign.pk]
+        self.assertEqual(self.bulk(self.admin, ids=ids, operator=self.operator.pk), [(pk, 'updated') for pk in ids])
+        self.assertEqual(set(Service.objects.filter(operator=self.operator).values_list('id', flat=True)), set(ids))
+
+    def test_counters_follow(self):
+        before = stored_counters()
+        self.bulk(self.admin, ids=[self.own[0].pk, self.foreign.pk], status=public_variable.SERVICE_REPAIRING, operator=self.operator.pk)
+        after = stored_counters()
+        self.assertEqual(after, {key: value for key, value in counters.compute_counters().items() if value})
+        self.assertEqual(after[(counters.STATUS, str(public_variable.SERVICE_PENDING))], before[(counters.STATUS, str(public_variable.SERVICE_PENDING))] - 2)
+        self.assertEqual(after[(counters.STATUS, str(public_variable.SERVICE_REPAIRING))], 2)
+        self.assertEqual(after[(counters.OPERATOR, str(self.operator.pk))], 2)
+
+    def test_invalid_requests(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for data in [{'ids': [self.own[0].pk]}, {'ids': [], 'close': True}, {'ids': [self.own[0].pk], 'operator': self.owner.pk}]:
+            with self.subTest(data=data):
+                self.assertEqual(client.post('/api/services/bulk/', data, format='json').status_code, 400)
+
+
+class InvoiceLineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.filter = Materail.objects.create(title='فیلتر', count=10, price=decimal.Decimal('250.5'))
+        cls.pump = Materail.objects.create(title='پمپ', count=1, price=decimal.Decimal('1000'))
+        cls.invoice = Invoice.objects.create()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_total(self, total):
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total, decimal.Decimal(total))
+
+    def test_create_update_delete(self):
+        response = self.client.post('/api/invoice_lines/', {'invoice': self.invoice.pk, 'material': self.filter.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(decimal.Decimal(response.data['unit_price']), decimal.Decimal('250.5'))
+        self.assert_total('501')
+        line = f"/api/invoice_lines/{response.data['id']}/"
+
+        # the captured price stays when the materail price changes
+        Materail.objects.filter(pk=self.filter.pk).update(price=300)
+        self.assertEqual(self.client.patch(line, {'quantity': 3}, format='json').status_code, 200)
+        self.assert_total('751.5')
+        self.filter.refresh_from_db()
+        self.assertEqual(self.filter.count, 7)
+
+        self.client.post('/api/invoice_lines/', {'invoice': self.invoice.pk, 'material': self.pump.pk, 'quantity': 1}, format='json')
+        self.assert_total('1751.5')
+        lines = self.client.get('/api/invoice_lines/', {'invoice': self.invoice.pk}).data
+        self.assertEqual([row['material'] for row in lines], [self.filter.pk, self.pump.pk])
+        self.assertEqual(self.client.get('/api/invoice_lines/', {'invoice': Invoice.objects.create().pk}).data, [])
+
+        self.assertEqual(self.client.delete(line).status_code, 204)
+        self.assert_total('1000')
+        self.filter.refresh_from_db()
+        self.assertEqual(self.filter.count, 10)
+
+    def test_insufficient_stock(self):
+        response = self.client.post('/api/invoice_lines/', {'invoice': self.invoice.pk, 'material': self.pump.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['shortages'], {str(self.pump.pk): '1'})
+        self.assertFalse(InvoiceLine.objects.exists())
+        self.assert_total('0')
+
+
+class InvoiceLineMigrationTests(TransactionTestCase):
+    """0011 reuses the invoices_material rows as lines; backfill_invoice_totals prices them."""
+    before = [('services', '0010_list_indexes')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.after = executor.loader.graph.leaf_nodes('services')
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        materail = apps.get_model('services', 'Materail').objects.create(title='فیلتر', count=10, price=decimal.Decimal('12.5'))
+        self.invoice_id = apps.get_model('services', 'Invoice').objects.create().pk
+        apps.get_model('services', 'Invoice').material.through.objects.create(invoice_id=self.invoice_id, materail_id=materail.pk)
+        self.materail_id = materail.pk
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(self.after)
+
+    def test_rows_become_lines(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        InvoiceLine = apps.get_model('services', 'InvoiceLine')
+        self.assertEqual(
+            list(InvoiceLine.objects.values_list('invoice_id', 'material_id', 'quantity', 'unit_price')),
+            [(self.invoice_id, self.materail_id, 1, None)],
+        )
+
+        call_command('backfill_invoice_totals', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(InvoiceLine.objects.get().unit_price, decimal.Decimal('12.5'))
+        self.assertEqual(apps.get_model('services', 'Invoice').objects.get().total, decimal.Decimal('12.5'))
+
+
+class ServiceCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.customer = Admin.objects.create(username='customer', type_user=public_variable.USER_TYPE)
+        cls.operators = [Admin.objects.create(username=f'operator {index}', type_user=public_variable.REPAIRE_MEN_TYPE) for index in range(2)]
+        cls.type_service = TypeSercie.objects.create(title='کولر', code=1)
+
+    def assert_counters(self, expected):
+        self.assertEqual(stored_counters(), {key: value for key, value in expected.items() if value})
+        self.assertEqual(stored_counters(), {key: value for key, value in counters.compute_counters().items() if value})
+
+    def test_upserts_follow_the_service(self):
+        service = Service.objects.create(title='سرویس', user=self.customer, type_service=self.type_service)
+        day = (counters.DAY, timezone.localdate(service.created_at).isoformat())
+        pending, repairing = str(public_variable.SERVICE_PENDING), str(public_variable.SERVICE_REPAIRING)
+        first, second = (str(operator.pk) for operator in self.operators)
+        self.assert_counters({
+            (counters.TOTAL, ''): 1, (counters.STATUS, pending): 1, (counters.TYPE_SERVICE, str(self.type_service.pk)): 1, day: 1,
+        })
+
+        service.operator = self.operators[0]
+        service.save()
+        service.status = public_variable.SERVICE_REPAIRING
+        service.save(update_fields=['status'])
+        self.assert_counters({
+            (counters.TOTAL, ''): 1, (counters.STATUS, repairing): 1, (counters.TYPE_SERVICE, str(self.type_service.pk)): 1, day: 1,
+            (counters.OPERATOR, first): 1, (counters.OPERATOR_STATUS, f'{first}:{repairing}'): 1,
+        })
+
+        service.operator = self.operators[1]
+        service.save()
+        self.assertEqual(stored_counters()[(counters.OPERATOR_STATUS, f'{second}:{repairing}')], 1)
+        self.assertNotIn((counters.OPERATOR, first), stored_counters())
+
+        service.delete()
+        self.assert_counters({})
+
+    def test_reconcile(self):
+        for index in range(3):
+            Service.objects.create(title=f'سرویس {index}', user=self.customer, operator=self.operators[0])
+        self.assertEqual(counters.reconcile(), 0)
+
+        expected = stored_counters()
+        ServiceCounter.objects.filter(dimension=counters.TOTAL).update(value=10)
+        ServiceCounter.objects.filter(dimension=counters.OPERATOR).delete()
+        ServiceCounter.objects.create(dimension=counters.STATUS, key=str(public_variable.SERVICE_DONE), value=4)
+        self.assertEqual(counters.reconcile(), 3)
+        self.assertEqual(stored_counters(), expected)
+        self.assertFalse(ServiceCounter.objects.filter(value=0).exists())
+
+    def test_dashboard(self):
+        Service.objects.create(title='سرویس', user=self.customer, operator=self.operators[0], type_service=self.type_service)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        self.assertEqual(client.get('/api/dashboard/services/').status_code, 403)
+
+        client.force_authenticate(self.admin)
+        response = client.get('/api/dashboard/services/', {'days': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['operator'], [
+            {'operator': self.operators[0].pk, 'count': 1, 'status': {str(public_variable.SERVICE_PENDING): 1}},
+        ])
+        self.assertEqual(response.data['type_service'], [{'type_service': self.type_service.pk, 'count': 1}])
+        self.assertEqual([day['count'] for day in response.data['days']], [0, 1])
+
+
+@override_settings(SERVICE_STATUS_SLA={public_variable.SERVICE_PENDING: 3600, public_variable.SERVICE_DISPATCHED: 3600})
+class StatusHistoryTests(TestCase):
+    START = datetime.datetime(2025, 6, 1, 8, 0, tzinfo=datetime.timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        cls.customer = Admin.objects.create(username='customer', type_user=public_variable.USER_TYPE)
+        cls.operator = Admin.objects.create(username='operator', type_user=public_variable.REPAIRE_MEN_TYPE)
+
+    def setUp(self):
+        self.now = self.START
+        patcher = mock.patch('django.utils.timezone.now', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def at(self, seconds, service, **changes):
+        self.now = self.START + datetime.timedelta(seconds=seconds)
+        for name, value in changes.items():
+            setattr(service, name, value)
+        service.save()
+
+    def build_history(self):
+        """
+        first: pending 1800s (operator assigned after 600s), dispatched 7200s, done
+        second: pending 5400s, dispatched
+        """
+        first = Service.objects.create(title='اول', user=self.customer)
+        second = Service.objects.create(title='دوم', user=self.customer)
+        self.at(600, first, operator=self.operator)
+        self.at(1800, first, status=public_variable.SERVICE_DISPATCHED)
+        self.at(5400, second, status=public_variable.SERVICE_DISPATCHED)
+        self.at(9000, first, status=public_variable.SERVICE_DONE)
+        history.rollup_days([self.START.date()])
+        return first, second
+
+    def get(self, path, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.admin)
+        return client.get(path, {'days': 1})
+
+    def test_history_rows(self):
+        first, _ = self.build_history()
+        pending, dispatched, done = public_variable.SERVICE_PENDING, public_variable.SERVICE_DISPATCHED, public_variable.SERVICE_DONE
+        self.assertEqual(
+            list(first.status_events.order_by('id').values_list('previous_status', 'status', 'previous_operator', 'operator', 'seconds_in_previous')),
+            [
+                (None, pending, None, None, None),
+                (pending, pending, None, self.operator.pk, None),
+                (pending, dispatched, self.operator.pk, self.operator.pk, 1800),
+                (dispatched, done, self.operator.pk, self.operator.pk, 7200),
+            ],
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.status_changed_at, self.START + datetime.timedelta(seconds=9000))
+
+    def test_time_in_status(self):
+        self.build_history()
+        response = self.get('/api/dashboard/services/time_in_status/')
+        self.assertEqual(response.status_code, 200)
+        by_status = {row['status']: row for row in response.data['status']}
+        self.assertEqual(
+            {code: (row['entries'], row['exits'], row['avg_seconds']) for code, row in by_status.items()},
+            {
+                public_variable.SERVICE_PENDING: (2, 2, 3600),
+                public_variable.SERVICE_DISPATCHED: (2, 1, 7200),
+                public_variable.SERVICE_REPAIRING: (0, 0, None),
+                public_variable.SERVICE_DONE: (1, 0, None),
+            },
+        )
+        self.assertEqual(response.data['operator'], [{
+            'operator': self.operator.pk,
+            'done': 1,
+            'status': {
+                public_variable.SERVICE_PENDING: {'entries': 0, 'exits': 1, 'avg_seconds': 1800},
+                public_variable.SERVICE_DISPATCHED: {'entries': 1, 'exits': 1, 'avg_seconds': 7200},
+                public_variable.SERVICE_DONE: {'entries': 1, 'exits': 0, 'avg_seconds': None},
+            },
+        }])
+
+    def test_sla(self):
+        self.build_history()
+        response = self.get('/api/dashboard/services/sla/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['status'], row['target_seconds'], row['exits'], row['within_sla'], row['ratio']) for row in response.data['status']],
+            [(public_variable.SERVICE_PENDING, 3600, 2, 1, 0.5), (public_variable.SERVICE_DISPATCHED, 3600, 1, 0, 0.0)],
+        )
+        self.assertEqual([row['day'] for row in response.data['day']], [self.START.date().isoformat()])
+
+    def test_admins_only(self):
+        for path in ['/api/dashboard/services/time_in_status/', '/api/dashboard/services/sla/']:
+            for user in [self.customer, self.operator]:
+                with self.subTest(path, user=user.username):
+                    self.assertEqual(self.get(path, user).status_code, 403)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Admin.objects.create(username='admin', type_user=public_variable.ADMIN_TYPE)
+        old = timezone.now() - datetime.timedelta(days=200)
+        cls.eligible = [
+            Service.objects.create(title=f'قدیمی {index}', user=cls.admin, status=public_variable.SERVICE_DONE) for index in range(5)
+        ]
+        cls.recent_done = Service.objects.create(title='تازه', user=cls.admin, status=public_variable.SERVICE_DONE)
+        cls.old_open = Service.objects.create(title='باز', user=cls.admin)
+        Service.objects.filter(pk__in=[service.pk for service in [*cls.eligible, cls.old_open]]).update(updated_at=old)
+
+    def test_moves_only_eligible_rows_in_chunks(self):
+        before = stored_counters()
+        self.assertEqual(archive.archive_services(chunk_size=2, max_chunks=1), 2)
+        self.assertEqual(list(ArchivedService.objects.order_by('id').values_list('id', flat=True)), [service.pk for service in self.eligible[:2]])
+
+        self.assertEqual(archive.archive_services(chunk_size=2), 3)
+        self.assertEqual(set(ArchivedService.objects.values_list('id', flat=True)), {service.pk for service in self.eligible})
+        self.assertEqual(set(Service.objects.values_list('id', flat=True)), {self.recent_done.pk, self.old_open.pk})
+        archived = ArchivedService.objects.get(pk=self.eligible[0].pk)
+        self.assertEqual((archived.title, archived.status, archived.user_id), ('قدیمی 0', public_variable.SERVICE_DONE, self.admin.pk))
+        # moved services stay counted
+        self.assertEqual(stored_counters(), before)
+
+    def test_idempotent(self):
+        self.assertEqual(archive.archive_services(), 5)
+        archived = list(ArchivedService.objects.order_by('id').values_list('id', 'archived_at'))
+        self.assertEqual(archive.archive_services(), 0)
+        self.assertEqual(list(ArchivedService.objects.order_by('id').values_list('id', 'archived_at')), archived)
+
+    def test_retrieve_falls_back_to_the_archive(self):
+        archive.archive_services()
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(f'/api/services/{self.eligible[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['id'], response.data['title']), (self.eligible[0].pk, 'قدیمی 0'))
+        self.assertIsNotNone(response.data['archived_at'])
+        self.assertEqual(client.get(f'/api/services/{self.recent_done.pk}/').data['title'], 'تازه')
+        self.assertEqual(client.get(f'/api/services/{self.old_open.pk + 100}/').status_code, 404)
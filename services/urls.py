@@ -1,6 +1,8 @@
 from rest_framework.routers import DefaultRouter,SimpleRouter
-from services.views import ServiceViewSet, InvoiceViewSet, MaterailViewSet
+from django.urls import path
+from services.views import ServiceViewSet, InvoiceViewSet, InvoiceLineViewSet, MaterailViewSet, ServiceDashboardView, ServiceSlaView, ServiceTimeInStatusView, TypeServiceViewSet
 from rest_framework import routers
+from services import async_views
 
 app_name = "admins"
 
@@ -8,5 +10,16 @@ router = routers.SimpleRouter()
 
 router.register(r'materails', MaterailViewSet)
 router.register(r'invoices', InvoiceViewSet)
+router.register(r'invoice_lines', InvoiceLineViewSet)
 router.register(r'services', ServiceViewSet)
-urlpatterns = router.urls
\ No newline at end of file
+router.register(r'type_services', TypeServiceViewSet)
+urlpatterns = router.urls + [
+    path('dashboard/services/', ServiceDashboardView.as_view(), name=ServiceDashboardView.name),
+    path('dashboard/services/time_in_status/', ServiceTimeInStatusView.as_view(), name=ServiceTimeInStatusView.name),
+    path('dashboard/services/sla/', ServiceSlaView.as_view(), name=ServiceSlaView.name),
+    # async (ASGI) versions of the hot read endpoints
+    path('async/services/', async_views.service_list, name='async_service_list'),
+    path('async/services/me/', async_views.service_me, name='async_service_me'),
+    path('async/services/services_assigned_to_operator/', async_views.services_assigned_to_operator, name='async_services_assigned_to_operator'),
+    path('async/services/<int:pk>/', async_views.service_detail, name='async_service_detail'),
+]
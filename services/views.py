@@ -1,95 +1,233 @@
 import operator
-import pandas as pd
-from django.shortcuts import render
+from django.conf import settings
+from django.shortcuts import render, get_object_or_404
 from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView, DestroyAPIView, UpdateAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView
 from utils.sms import SmartSms
-from services.models import Service, Invoice, Materail
+from services.models import ArchivedService, Service, Invoice, InvoiceLine, Materail, MaterailImportJob, ServiceCounter, ServiceStatusRollup, TypeSercie
+from services import counters, history, stock
+from services.catalog import type_services
 from rest_framework import viewsets
-from services.serializers import ServiceSerializer, InvoiceSerializer, MaterailSerializer, ServiceCreateSerializer
+from services.serializers import ArchivedServiceSerializer, ServiceSerializer, InvoiceSerializer, InvoiceLineSerializer, MaterailSerializer, ServiceCreateSerializer, MaterailImportJobSerializer, ServiceBulkUpdateSerializer, StockAdjustSerializer, StockMovementSerializer, TypeServiceSerializer
+from services.bulk import bulk_update_services
+from services.importers import ImportValidationError, import_materails
+from services.tasks import import_materails_job
 from utils.pagination import CustomPaginationClass
+from utils.query_planning import QueryPlanMixin, plan_queryset
+from utils.conditional import ConditionalGetMixin
+from utils.compiled_serializer import CompiledReadMixin
+from utils.catalog import CatalogReadMixin
+from utils.profiling import ProfilingMixin
+from utils.export import export_response
+from utils.search import TrigramSearchFilter
+from services.filters import ServiceFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from utils import public_variable
 from rest_framework.decorators import action
 from rest_framework import permissions
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from admins.authentication import CachedJWTAuthentication
+from admins.permissions import IsAdmin, IsAdminOrReadOnly
 from rest_framework import status, permissions, viewsets
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from rest_framework.views import APIView
+import datetime
 
 # Create your views here.
 
+MATERAIL_EXPORT_COLUMNS = [
+    ('شناسه', 'id', None),
+    ('عنوان', 'title', None),
+    ('تعداد', 'count', None),
+    ('قیمت', 'price', None),
+    ('تاریخ ایجاد', 'created_at', None),
+    ('تاریخ ویرایش', 'updated_at', None),
+]
+
+SERVICE_EXPORT_COLUMNS = [
+    ('شناسه', 'id', None),
+    ('عنوان', 'title', None),
+    ('نوع سرویس', 'type_service_id', None),
+    ('کاربر', 'user_id', None),
+    ('اپراتور', 'operator_id', None),
+    ('توضیحات', 'desc', None),
+    ('وضعیت', 'status', public_variable.ServiceTypeStatus.get),
+    ('فاکتور', 'invoice_id', None),
+    ('تاریخ ایجاد', 'created_at', None),
+    ('تاریخ ویرایش', 'updated_at', None),
+]
+
  
-class MaterailViewSet(viewsets.ModelViewSet):
+class MaterailViewSet(ConditionalGetMixin, CompiledReadMixin, QueryPlanMixin, ProfilingMixin, viewsets.ModelViewSet):
     queryset = Materail.objects.all()
     serializer_class = MaterailSerializer
     pagination_class = CustomPaginationClass
-    authentication_classes = [JWTAuthentication]
+    filter_backends = [TrigramSearchFilter]
+    search_field = 'search_title'
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     @action(detail=False, methods=['post'])
     def import_excel(self, request):
         """
-        Import materials from Excel file
+        Import materials from Excel file.
+        Small files are imported inside the request, larger ones are queued
+        as a background job that can be polled through import_status.
         """
         try:
             file = request.FILES.get('file')
             if not file:
                 return Response({'detail': 'فایل ارسال نشده است'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Read Excel file
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file, encoding='utf-8')
-            else:
-                df = pd.read_excel(file)
-
-            # Validate columns
-            required_columns = ['عنوان']
-            if not all(col in df.columns for col in required_columns):
-                return Response({
-                    'detail': f'ستون‌های مورد نیاز: {", ".join(required_columns)}'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            imported_count = 0
-            errors = []
-
-            for index, row in df.iterrows():
-                try:
-                    # Create material
-                    material_data = {
-                        'title': str(row['عنوان']).strip(),
-                        'count': int(row.get('تعداد', 0)) if pd.notna(row.get('تعداد')) else None,
-                        'price': float(row.get('قیمت', 0)) if pd.notna(row.get('قیمت')) else None,
-                    }
-
-                    # Check if material already exists
-                    if Materail.objects.filter(title=material_data['title']).exists():
-                        errors.append(f'ردیف {index + 2}: متریال "{material_data["title"]}" قبلاً وجود دارد')
-                        continue
-
-                    Materail.objects.create(**material_data)
-                    imported_count += 1
-
-                except Exception as e:
-                    errors.append(f'ردیف {index + 2}: خطا در پردازش - {str(e)}')
+            if file.size > settings.MATERAIL_IMPORT_SYNC_MAX_BYTES:
+                job = MaterailImportJob.objects.create(user=request.user, file=file)
+                import_materails_job.delay(job.id)
+                return Response(MaterailImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
+            result = import_materails(file, file.name)
             return Response({
-                'imported_count': imported_count,
-                'errors': errors,
-                'message': f'{imported_count} متریال با موفقیت وارد شد'
+                'imported_count': result.imported_count,
+                'errors': result.error_messages(),
+                'message': f'{result.imported_count} متریال با موفقیت وارد شد'
             })
 
+        except ImportValidationError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'detail': f'خطا در پردازش فایل: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream all materials matching the list filters as csv or xlsx (?file_format=xlsx)
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        return export_response(queryset, MATERAIL_EXPORT_COLUMNS, 'materails', request.query_params.get('file_format', 'csv'))
+
+    @action(detail=False, methods=['get'], url_path=r'import_status/(?P<job_id>\d+)')
+    def import_status(self, request, job_id=None):
+        """
+        Progress and per-row errors of a background import job, for the user
+        who started it or an admin
+        """
+        jobs = MaterailImportJob.objects.all()
+        if request.user.type_user != public_variable.ADMIN_TYPE:
+            jobs = jobs.filter(user=request.user)
+        job = get_object_or_404(jobs, id=job_id)
+        return Response(MaterailImportJobSerializer(job).data)
+
+    @action(detail=True, methods=['get', 'post'], url_path='stock')
+    def stock(self, request, pk=None):
+        """
+        Current count, ledger balance and the last movements of a material.
+        POST {"quantity": n} adds (n > 0) or removes (n < 0) stock as an adjustment.
+        """
+        materail = self.get_object()
+        if request.method == 'POST':
+            serializer = StockAdjustSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                stock.apply_movements(
+                    [(materail.pk, serializer.validated_data['quantity'], None)], public_variable.STOCK_ADJUST, user=request.user
+                )
+            except stock.InsufficientStock as e:
+                return Response({
+                    'material': 'موجودی متریال کافی نیست',
+                    'shortages': {str(materail_id): missing for materail_id, missing in e.shortages.items()},
+                }, status=status.HTTP_400_BAD_REQUEST)
+            materail.refresh_from_db(fields=['count'])
+        movements = materail.stock_movements.order_by('-id')[:50]
+        return Response({
+            'materail': materail.pk,
+            'count': materail.count,
+            'balance': stock.balances([materail.pk])[materail.pk],
+            'movements': StockMovementSerializer(movements, many=True).data,
+        })
+
+class TypeServiceViewSet(CatalogReadMixin, viewsets.ModelViewSet):
+    """
+    Service types, read from the in-process catalog (pre-rendered list with
+    an ETag, ?code= for one type by code)
+    """
+    queryset = TypeSercie.objects.all()
+    serializer_class = TypeServiceSerializer
+    catalog = type_services
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrReadOnly]
+
+class InvoiceViewSet(ConditionalGetMixin, QueryPlanMixin, ProfilingMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
+    # line changes touch the invoice's updated_at, material edits do not
+    conditional_fields = ('updated_at', 'material__updated_at')
+
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """
+        Invoice count and total amount of the last ?days= (default 30), overall
+        and per day, summed in the database from the stored invoice totals
+        """
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        tz = timezone.get_current_timezone()
+        first_day = timezone.localdate() - datetime.timedelta(days=days - 1)
+        invoices = Invoice.objects.filter(
+            created_at__gte=datetime.datetime.combine(first_day, datetime.time.min, tzinfo=tz)
+        ).order_by()
 
-class ServiceViewSet(viewsets.ModelViewSet):
-    queryset = Service.objects.all()
+        summary = invoices.aggregate(count=Count('id'), total=Sum('total'))
+        per_day = (
+            invoices
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values('day')
+            .annotate(count=Count('id'), total=Sum('total'))
+            .order_by('day')
+        )
+        return Response({
+            'count': summary['count'],
+            'total': str(summary['total'] or 0),
+            'days': [
+                {'day': row['day'].isoformat(), 'count': row['count'], 'total': str(row['total'])}
+                for row in per_day
+            ],
+        })
+
+
+class InvoiceLineViewSet(ProfilingMixin, viewsets.ModelViewSet):
+    """
+    Lines of an invoice (?invoice=<id>). The unit price is captured from the
+    material when the line is created; the invoice total follows every change.
+    """
+    queryset = InvoiceLine.objects.order_by('id')
+    serializer_class = InvoiceLineSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        invoice_id = self.request.query_params.get('invoice')
+        if invoice_id and invoice_id.isdigit():
+            queryset = queryset.filter(invoice_id=invoice_id)
+        return queryset
+
+class ServiceViewSet(ConditionalGetMixin, CompiledReadMixin, QueryPlanMixin, ProfilingMixin, viewsets.ModelViewSet):
+    queryset = Service.objects.order_by('-created_at', '-id')
     serializer_class = ServiceSerializer
+    conditional_fields = ('updated_at', 'invoice__updated_at', 'invoice__material__updated_at')
+    conditional_catalogs = (type_services,)
     pagination_class = CustomPaginationClass
-    authentication_classes = [JWTAuthentication]
+    pagination_count_mode = 'estimate'
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
+    filterset_class = ServiceFilter
+    search_field = 'search_text'
+    compiled_read_actions = ('list', 'me', 'services_assigned_to_operator')
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -102,6 +240,8 @@ class ServiceViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return ServiceCreateSerializer
+        if self.action == 'bulk':
+            return ServiceBulkUpdateSerializer
         return ServiceSerializer
 
 
@@ -131,22 +271,209 @@ class ServiceViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         return Response(serializer.data)
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Services moved to the archive (services.archive) are still found by
+        id, read only.
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = self.archived_queryset().filter(pk=kwargs['pk']).first()
+            if archived is None:
+                raise
+            return Response(ArchivedServiceSerializer(archived, context=self.get_serializer_context()).data)
+
+    def archived_queryset(self):
+        return plan_queryset(ArchivedService.objects.all(), ArchivedServiceSerializer)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Change status and/or operator of many services at once:
+        {"ids": [...], "status": 1, "operator": 5, "close": false}
+        Returns the result (updated, unchanged, not_found, forbidden) per id.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        ids = changes.pop('ids')
+        return Response({'results': bulk_update_services(request.user, ids, changes)})
+
     @action(detail=False, methods=['get'])
     def me(self, request):
         user = request.user
-        services = Service.objects.filter(user=user)
-        serializer = self.get_serializer(services, many=True)
-        return Response(serializer.data)
+        services = self.filter_queryset(self.get_queryset().filter(user=user))
+        return self.conditional_response(request, services, lambda: Response(self.serialize_many(services)))
 
     
     @action(detail=False, methods=['get'])
     def services_assigned_to_operator(self, request):
         user = request.user
-        services = Service.objects.filter(operator=user)
-        serializer = self.get_serializer(services, many=True)
-        return Response(serializer.data)
-    
-    
+        services = self.filter_queryset(self.get_queryset().filter(operator=user))
+        return self.conditional_response(request, services, lambda: Response(self.serialize_many(services)))
 
-    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream all services matching the list filters as csv or xlsx (?file_format=xlsx)
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        return export_response(queryset, SERVICE_EXPORT_COLUMNS, 'services', request.query_params.get('file_format', 'csv'))
+
+
+class ServiceDashboardView(APIView):
+    """
+    Service counts per status, operator, type and day, read from the
+    pre-aggregated counters instead of scanning the services table.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    name = "service_dashboard"
+
+    def get(self, request):
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        today = timezone.localdate()
+        first_day = (today - datetime.timedelta(days=days - 1)).isoformat()
+
+        rows = ServiceCounter.objects.filter(
+            dimension__in=[counters.TOTAL, counters.STATUS, counters.OPERATOR, counters.OPERATOR_STATUS, counters.TYPE_SERVICE]
+        ) | ServiceCounter.objects.filter(dimension=counters.DAY, key__gte=first_day)
+        values = {}
+        for dimension, key, value in rows.values_list('dimension', 'key', 'value'):
+            values.setdefault(dimension, {})[key] = value
+
+        status_counts = values.get(counters.STATUS, {})
+        operators = {}
+        for key, value in values.get(counters.OPERATOR_STATUS, {}).items():
+            if not value:
+                continue
+            operator_id, status_code = key.split(':')
+            operators.setdefault(operator_id, {})[status_code] = value
+
+        return Response({
+            'total': values.get(counters.TOTAL, {}).get('', 0),
+            'status': [
+                {'status': code, 'title': title, 'count': status_counts.get(str(code), 0)}
+                for code, title in public_variable.ServiceStatus
+            ],
+            'operator': [
+                {'operator': int(key), 'count': value, 'status': operators.get(key, {})}
+                for key, value in values.get(counters.OPERATOR, {}).items() if value
+            ],
+            'type_service': [
+                {'type_service': int(key), 'count': value}
+                for key, value in values.get(counters.TYPE_SERVICE, {}).items() if value
+            ],
+            'days': [
+                {'day': day.isoformat(), 'count': values.get(counters.DAY, {}).get(day.isoformat(), 0)}
+                for day in (today - datetime.timedelta(days=offset) for offset in range(days - 1, -1, -1))
+            ],
+        })
+
+
+class ServiceStatusReportView(APIView):
+    """Base of the reports read from the status history rollups of the last ?days= (default 30) local days."""
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get_rollups(self, request):
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        first_day = timezone.localdate() - datetime.timedelta(days=days - 1)
+        rollups = ServiceStatusRollup.objects.filter(day__gte=first_day).order_by()
+        operator = request.query_params.get('operator')
+        if operator and operator.isdigit():
+            rollups = rollups.filter(operator_id=operator)
+        return days, rollups
+
+
+def average(seconds, count):
+    return round(seconds / count) if count else None
+
+
+class ServiceTimeInStatusView(ServiceStatusReportView):
+    """
+    How long services stay in each status (average over the stays that
+    ended, for those with a known start) and how many entered / left it,
+    overall and per operator (?operator= for one), from the rollups
+    """
+    name = "service_time_in_status"
+
+    def get(self, request):
+        days, rollups = self.get_rollups(request)
+        totals = Sum('entries'), Sum('exits'), Sum('timed_exits'), Sum('seconds')
+        fields = dict(zip(('entries', 'exits', 'timed_exits', 'seconds'), totals))
+
+        by_status = {row['status']: row for row in rollups.values('status').annotate(**fields)}
+        operators = {}
+        for row in rollups.exclude(operator_id=history.NO_OPERATOR).values('operator_id', 'status').annotate(**fields):
+            operators.setdefault(row['operator_id'], {})[row['status']] = {
+                'entries': row['entries'],
+                'exits': row['exits'],
+                'avg_seconds': average(row['seconds'], row['timed_exits']),
+            }
+
+        return Response({
+            'days': days,
+            'status': [
+                {
+                    'status': code,
+                    'title': title,
+                    'entries': by_status.get(code, {}).get('entries', 0),
+                    'exits': by_status.get(code, {}).get('exits', 0),
+                    'avg_seconds': average(by_status.get(code, {}).get('seconds', 0), by_status.get(code, {}).get('timed_exits', 0)),
+                }
+                for code, title in public_variable.ServiceStatus
+            ],
+            'operator': [
+                {
+                    'operator': operator_id,
+                    # services the operator closed
+                    'done': statuses.get(public_variable.SERVICE_DONE, {}).get('entries', 0),
+                    'status': statuses,
+                }
+                for operator_id, statuses in sorted(operators.items())
+            ],
+        })
+
+
+class ServiceSlaView(ServiceStatusReportView):
+    """
+    Share of the stays in each status that ended within its target
+    (SERVICE_STATUS_SLA), overall and per day, from the rollups
+    """
+    name = "service_sla"
+
+    def get(self, request):
+        days, rollups = self.get_rollups(request)
+        targets = history.sla_targets()
+        rollups = rollups.filter(status__in=list(targets))
+        fields = {'exits': Sum('timed_exits'), 'within_sla': Sum('within_sla')}
+
+        def entry(row):
+            return {
+                'exits': row['exits'],
+                'within_sla': row['within_sla'],
+                'ratio': round(row['within_sla'] / row['exits'], 4) if row['exits'] else None,
+            }
+
+        by_status = {row['status']: row for row in rollups.values('status').annotate(**fields)}
+        per_day = {}
+        for row in rollups.values('day', 'status').annotate(**fields):
+            per_day.setdefault(row['day'], {})[row['status']] = entry(row)
 
+        empty = {'exits': 0, 'within_sla': 0}
+        return Response({
+            'days': days,
+            'status': [
+                {'status': code, 'title': title, 'target_seconds': targets[code], **entry(by_status.get(code, empty))}
+                for code, title in public_variable.ServiceStatus if code in targets
+            ],
+            'day': [{'day': day.isoformat(), 'status': statuses} for day, statuses in sorted(per_day.items())],
+        })
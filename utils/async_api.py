@@ -0,0 +1,84 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from admins.authentication import CachedJWTAuthentication
+
+
+def render(data, status=200):
+    """JSON response rendered the same way the DRF views render it."""
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def authenticate(request):
+    """
+    Async CachedJWTAuthentication. Token validation is plain CPU work, only
+    the principal_cache lookup runs in a worker thread.
+    """
+    authenticator = CachedJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated()
+    validated_token = authenticator.get_validated_token(raw_token)
+    return await sync_to_async(authenticator.get_user)(validated_token)
+
+
+def check_permissions(request, permission_classes):
+    """
+    As APIView.perform_authentication and check_permissions, in a worker
+    thread since the authenticators may query: 401 only when an
+    authenticator could not identify the client.
+    """
+    request.user
+    for permission_class in permission_classes:
+        permission = permission_class()
+        if not permission.has_permission(request, None):
+            if request.authenticators and not request.successful_authenticator:
+                raise NotAuthenticated()
+            raise PermissionDenied(getattr(permission, 'message', None), getattr(permission, 'code', None))
+
+
+def async_api_view(permission_classes=None):
+    """
+    Decorator for the async read endpoints: authenticates like the sync
+    views (JWT, or the given DRF permission classes with the default
+    authenticators instead), hands the view a DRF Request so filters /
+    paginators / serializers work unchanged, and renders APIExceptions the
+    way DRF's exception handler does.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if permission_classes is None:
+                authenticators = [CachedJWTAuthentication()]
+                drf_request = Request(request)
+            else:
+                authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+                drf_request = Request(request, authenticators=authenticators)
+            try:
+                if permission_classes is None:
+                    drf_request.user = await authenticate(request)
+                else:
+                    await sync_to_async(check_permissions)(drf_request, permission_classes)
+                return await view(drf_request, *args, **kwargs)
+            except APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                status = exc.status_code
+                auth_header = None
+                if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                    # as APIView.handle_exception: 403 when the first authenticator has no challenge
+                    auth_header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+                    if not auth_header:
+                        status = 403
+                response = render(data, status=status)
+                if auth_header:
+                    response['WWW-Authenticate'] = auth_header
+                return response
+        return wrapper
+    return decorator
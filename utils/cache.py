@@ -0,0 +1,289 @@
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from utils import profiling
+
+CLEAR_ALL = '*'
+
+# DEL the key only if it still holds ARGV[1]
+DELETE_IF_EQUAL = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# INCRBY the key only if it exists (an INCR on a missing or just expired key
+# would create it without a TTL), nil if it does not
+INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+class LocalLRU:
+    """Bounded in-process store with per-entry expiry (L1)."""
+
+    def __init__(self, max_entries, max_timeout):
+        self.max_entries = max_entries
+        self.max_timeout = max_timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        ttl = self.max_timeout if timeout is None else min(timeout, self.max_timeout)
+        if ttl <= 0:
+            self.delete(key)
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache(BaseCache):
+    """
+    Django cache backend with a bounded in-process L1 in front of Redis (L2).
+
+    Every write publishes the key on a pub/sub channel and each process runs
+    a listener thread that drops the key from its L1, so workers do not serve
+    each other stale values for longer than the publish latency. L1 entries
+    also expire after L1_TIMEOUT seconds as a backstop.
+
+    OPTIONS:
+        L1_MAX_ENTRIES  max keys kept per process (default 1000)
+        L1_TIMEOUT      max seconds a key lives in L1 (default 30)
+        CHANNEL         invalidation channel (default 'cache-invalidation')
+        CLIENT_CLASS    redis client class built with from_url (default
+                        'redis.Redis', 'fakeredis.FakeRedis' for tests)
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._url = server if isinstance(server, str) else server[0]
+        self._client_class = import_string(options.get('CLIENT_CLASS', 'redis.Redis'))
+        self._channel = options.get('CHANNEL', 'cache-invalidation')
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self._node = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._local = None
+        self._stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'sets': 0, 'deletes': 0, 'invalidations': 0}
+
+    # ---- plumbing --------------------------------------------------------
+
+    def _ensure(self):
+        # (re)initialise after fork so each worker has its own connection and listener
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._client = self._client_class.from_url(self._url)
+            self._local = LocalLRU(self._l1_max_entries, self._l1_timeout)
+            thread = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    data = message['data']
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    node, _, key = data.partition('|')
+                    if node == self._node:
+                        continue
+                    self._count('invalidations')
+                    if key == CLEAR_ALL:
+                        self._local.clear()
+                    else:
+                        self._local.delete(key)
+            except Exception:
+                # redis went away: drop L1 (we may have missed invalidations) and retry
+                self._local.clear()
+                time.sleep(1)
+
+    def _publish(self, key):
+        self._client.publish(self._channel, f'{self._node}|{key}')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+        profiling.record_cache(name)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        # relative seconds: None never expires, non-positive deletes the key
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else max(0, timeout)
+
+    def dumps(self, value):
+        # plain ints are stored as-is so INCRBY works on them
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    # ---- cache API -------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        raw = self._local.get(key)
+        if raw is not None:
+            self._count('l1_hits')
+            return self.loads(raw)
+        pipe = self._client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        raw, pttl = pipe.execute()
+        if raw is None:
+            self._count('misses')
+            return default
+        self._count('l2_hits')
+        self._local.set(key, raw, None if pttl < 0 else pttl / 1000)
+        return self.loads(raw)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        raw = self.dumps(value)
+        if timeout is not None and timeout <= 0:
+            self._client.delete(key)
+            self._local.delete(key)
+        else:
+            self._client.set(key, raw, px=None if timeout is None else int(timeout * 1000))
+            self._local.set(key, raw if isinstance(raw, bytes) else str(raw).encode(), timeout)
+        self._count('sets')
+        self._publish(key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            return False
+        added = self._client.set(key, self.dumps(value), nx=True, px=None if timeout is None else int(timeout * 1000))
+        if added:
+            self._count('sets')
+            self._local.delete(key)
+            self._publish(key)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            touched = self._client.persist(key)
+        else:
+            touched = self._client.pexpire(key, int(timeout * 1000))
+        self._local.delete(key)
+        self._publish(key)
+        return bool(touched)
+
+    def delete(self, key, version=None):
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        deleted = self._client.delete(key)
+        self._local.delete(key)
+        self._count('deletes')
+        self._publish(key)
+        return bool(deleted)
+
+    def delete_if_equal(self, key, value, version=None):
+        """Atomically delete key if it holds value; True if it was deleted."""
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        deleted = self._client.eval(DELETE_IF_EQUAL, 1, key, self.dumps(value))
+        if deleted:
+            self._local.delete(key)
+            self._count('deletes')
+            self._publish(key)
+        return bool(deleted)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def incr(self, key, delta=1, version=None):
+        self._ensure()
+        key = self.make_and_validate_key(key, version=version)
+        value = self._client.eval(INCR_IF_EXISTS, 1, key, delta)
+        if value is None:
+            raise ValueError("Key '%s' not found." % key)
+        self._local.delete(key)
+        self._publish(key)
+        return value
+
+    def clear(self):
+        self._ensure()
+        self._client.flushdb()
+        self._local.clear()
+        self._publish(CLEAR_ALL)
+        return True
+
+    def close(self, **kwargs):
+        # connections are pooled by the redis client and reused across requests
+        pass
+
+
+def delete_if_equal(cache, key, value):
+    """
+    Compare-and-delete on any cache: atomic on TwoTierCache, a get and a
+    delete on backends without delete_if_equal (locmem in tests and
+    benchmarks), where two racing callers may both see the value.
+    """
+    if hasattr(cache, 'delete_if_equal'):
+        return cache.delete_if_equal(key, value)
+    if cache.get(key) != value:
+        return False
+    return cache.delete(key)
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+class CatalogSnapshot:
+    """One version of a catalog: the serialized rows, indexed by id and code, and the JSON body of the list."""
+
+    def __init__(self, version, rows, key_field):
+        self.version = version
+        self.rows = rows
+        self.by_id = {row['id']: row for row in rows}
+        self.by_code = {row[key_field]: row for row in rows} if key_field else {}
+        self.body = JSONRenderer().render(list(rows))
+        self.etag = f'"{hashlib.md5(self.body).hexdigest()}"'
+
+
+class Catalog:
+    """
+    A small reference table (a few hundred rows, written a few times a day)
+    held per process, so reads and lookups never reach the database.
+
+    The rows are serialized once with `serializer` (a dotted path, so a
+    serializer module can use the catalog it feeds) and kept with the list
+    response body and its ETag. A version counter in the default cache is
+    bumped after every committed write (see invalidate); a process reloads
+    when the counter differs from its snapshot. The counter is read at most
+    every CATALOG_CHECK_INTERVAL seconds, so per-row lookups in a serializer
+    cost a dict access.
+    """
+
+    def __init__(self, model, serializer, key_field='code'):
+        self.model = model
+        self.serializer = serializer
+        self.key_field = key_field
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f'catalog_version:{self.model._meta.label_lower}'
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < getattr(settings, 'CATALOG_CHECK_INTERVAL', 1.0):
+            return snapshot
+        version = cache.get(self.version_key, 0)
+        if snapshot is not None and (snapshot.version == version or in_event_loop()):
+            # async views refresh the catalog through sync_to_async (see warm), a reload cannot run on the event loop
+            self._checked_at = now
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self.load(version)
+            self._checked_at = now
+            return self._snapshot
+
+    def load(self, version):
+        serializer_class = import_string(self.serializer)
+        # from the primary: a lagging replica's rows would be kept under the new version
+        queryset = self.model._default_manager.using(router.db_for_write(self.model)).order_by('id')
+        rows = serializer_class(queryset, many=True).data
+        return CatalogSnapshot(version, tuple(dict(row) for row in rows), self.key_field)
+
+    def warm(self):
+        """snapshot() for async code: await sync_to_async(catalog.warm)() before serializing."""
+        self.snapshot()
+
+    def get(self, pk):
+        """The serialized row with this id, None if there is none."""
+        return self.snapshot().by_id.get(pk)
+
+    def get_by_code(self, code):
+        return self.snapshot().by_code.get(code)
+
+    def all(self):
+        return self.snapshot().rows
+
+    def invalidate(self):
+        """Bump the version once the current transaction commits (outside one, immediately)."""
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        if not cache.add(self.version_key, 1, timeout=None):
+            try:
+                cache.incr(self.version_key)
+            except ValueError:
+                cache.set(self.version_key, 1, timeout=None)
+        # this process sees its own write on the next access
+        self._checked_at = 0.0
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class CatalogReadMixin:
+    """
+    list and retrieve of a viewset served from `catalog`: the list is the
+    pre-rendered body with a strong ETag (304 when If-None-Match matches),
+    ?<key_field>= picks one row by code. Writes go through the viewset as
+    usual and invalidate the catalog from the model's signals.
+    """
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        snapshot = self.catalog.snapshot()
+        code = request.query_params.get(self.catalog.key_field)
+        if code is not None:
+            row = snapshot.by_code.get(int(code)) if code.lstrip('-').isdigit() else None
+            return Response([row] if row else [])
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (
+            snapshot.etag in {tag.removeprefix('W/') for tag in parse_etags(if_none_match)} or if_none_match.strip() == '*'
+        ):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(snapshot.body, content_type='application/json')
+        response['ETag'] = snapshot.etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        value = self.kwargs[lookup_url_kwarg]
+        row = self.catalog.get(int(value)) if str(value).isdigit() else None
+        if row is None:
+            raise NotFound()
+        return Response(row)
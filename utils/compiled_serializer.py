@@ -0,0 +1,221 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from utils import profiling
+
+# fields whose to_representation returns the database value unchanged
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.ReadOnlyField)
+
+VALUE, DATETIME, COMPUTED, ONE, MANY = range(5)
+OWNER = '_owner'
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def is_iso_datetime(field):
+    # a DateTimeField rendered as ISO 8601 in the current timezone
+    return (
+        type(field) is serializers.DateTimeField and settings.USE_TZ and not hasattr(field, 'timezone')
+        and getattr(field, 'format', api_settings.DATETIME_FORMAT) is not None
+        and getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() == ISO_8601
+    )
+
+
+def iso_datetime(value, tz, to_representation):
+    """DateTimeField.to_representation with the current timezone passed in."""
+    if not timezone.is_aware(value):
+        return to_representation(value)
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class CompiledSerializer:
+    """
+    Read-only form of a ModelSerializer that renders values() rows instead
+    of model instances. Every field is resolved once at compile time into a
+    values() key and a converter, so rendering a row is a loop over plain
+    dicts: no model instances, no get_attribute / to_representation
+    dispatch per field. The output is the same as the serializer's (same
+    keys, order and value formatting), so the rendered JSON is identical.
+
+    - model fields and primary key relations are read from the row; types
+      that need formatting (datetimes, decimals, ...) use the bound DRF
+      field's to_representation
+    - SerializerMethodFields must be listed in the serializer's
+      `compiled_fields` as {name: (source column, function)}
+    - a nested serializer on a forward FK is joined into the same values()
+      query, a nested many=True serializer (m2m or reverse FK) is read with
+      one query for all rows
+    """
+
+    def __init__(self, serializer, model, prefix=''):
+        self.model = model
+        self.prefix = prefix
+        self.pk_key = prefix + model._meta.pk.name
+        self.entries = []
+        computed = getattr(serializer, 'compiled_fields', {})
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in computed:
+                    raise NotCompilable(f'{type(serializer).__name__}.{name} has no compiled_fields entry')
+                source, function = computed[name]
+                self.entries.append((COMPUTED, name, prefix + source, function))
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise NotCompilable(f'{type(serializer).__name__}.{name} has source {field.source!r}')
+
+            model_field = model._meta.get_field(field.source)
+            if isinstance(field, serializers.ListSerializer):
+                self.entries.append((MANY, name, self.pk_key, Relation(model_field, field.child)))
+            elif isinstance(field, serializers.BaseSerializer):
+                if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                    raise NotCompilable(f'{type(serializer).__name__}.{name} is not a forward relation')
+                child = CompiledSerializer(field, model_field.related_model, prefix + field.source + '__')
+                self.entries.append((ONE, name, prefix + field.source, child))
+            elif isinstance(field, ManyRelatedField):
+                raise NotCompilable(f'{type(serializer).__name__}.{name} is a many related field')
+            elif isinstance(field, RelatedField):
+                if field.__class__ is not serializers.PrimaryKeyRelatedField or field.pk_field is not None:
+                    raise NotCompilable(f'{type(serializer).__name__}.{name} is a {type(field).__name__}')
+                # values() returns the id of the related row
+                self.entries.append((VALUE, name, prefix + field.source, None))
+            elif is_iso_datetime(field):
+                self.entries.append((DATETIME, name, prefix + field.source, field.to_representation))
+            elif type(field) in PASSTHROUGH_FIELDS:
+                self.entries.append((VALUE, name, prefix + field.source, None))
+            elif isinstance(field, (serializers.FileField, serializers.HyperlinkedIdentityField)):
+                raise NotCompilable(f'{type(serializer).__name__}.{name} needs a model instance')
+            else:
+                self.entries.append((VALUE, name, prefix + field.source, field.to_representation))
+
+    def keys(self):
+        """The values() keys the rows must contain."""
+        keys = []
+        for kind, name, key, extra in self.entries:
+            keys.append(key)
+            if kind == ONE:
+                keys.extend(extra.keys())
+        return list(dict.fromkeys(keys))
+
+    def values(self, queryset):
+        """The rows of queryset, with the same filters and ordering, as values() dicts."""
+        return queryset.select_related(None).prefetch_related(None).values(*self.keys())
+
+    def fetch_many(self, rows, state):
+        # state[id(relation)] = {owner id: [rendered children]} for every many entry, nested ones included
+        for kind, name, key, extra in self.entries:
+            if kind == ONE:
+                extra.fetch_many([row for row in rows if row[key] is not None], state)
+            elif kind == MANY:
+                owner_ids = {row[key] for row in rows}
+                state[id(extra)] = extra.fetch(owner_ids, state) if owner_ids else {}
+
+    def render_row(self, row, state):
+        data = {}
+        for kind, name, key, extra in self.entries:
+            if kind == VALUE:
+                value = row[key]
+                data[name] = value if value is None or extra is None else extra(value)
+            elif kind == DATETIME:
+                value = row[key]
+                data[name] = None if value is None else iso_datetime(value, state['timezone'], extra)
+            elif kind == COMPUTED:
+                data[name] = extra(row[key])
+            elif kind == ONE:
+                data[name] = None if row[key] is None else extra.render_row(row, state)
+            else:
+                data[name] = state[id(extra)].get(row[key], [])
+        return data
+
+    def render(self, rows):
+        """Serialized data of values() rows (a list, or a values() queryset)."""
+        with profiling.serializer_timer():
+            rows = list(rows)
+            # DateTimeField looks the current timezone up for every value, do it once
+            state = {'timezone': timezone.get_current_timezone()}
+            self.fetch_many(rows, state)
+            return [self.render_row(row, state) for row in rows]
+
+
+class Relation:
+    """A nested many=True serializer: the children of many owners read with one values() query."""
+
+    def __init__(self, model_field, child_serializer):
+        self.child = CompiledSerializer(child_serializer, model_field.related_model)
+        if model_field.many_to_many and model_field.concrete:
+            # forward m2m: filter through the reverse relation, like prefetch_related does
+            self.lookup = model_field.related_query_name()
+        elif model_field.one_to_many:
+            self.lookup = model_field.field.name
+        else:
+            raise NotCompilable(f'{model_field.name} is not a m2m or reverse foreign key')
+        self.manager = model_field.related_model._default_manager
+
+    def fetch(self, owner_ids, state):
+        rows = list(
+            self.manager.filter(**{f'{self.lookup}__in': owner_ids})
+            .values(*self.child.keys(), **{OWNER: F(self.lookup)})
+        )
+        self.child.fetch_many(rows, state)
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[OWNER], []).append(self.child.render_row(row, state))
+        return grouped
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """CompiledSerializer for serializer_class, None if it uses something that cannot be compiled."""
+    serializer = serializer_class()
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return None
+    try:
+        return CompiledSerializer(serializer, model)
+    except NotCompilable:
+        return None
+
+
+class CompiledReadMixin:
+    """
+    Render the list actions of a viewset through the compiled serializer
+    (see CompiledSerializer), falling back to the DRF serializer when it
+    cannot be compiled or COMPILED_SERIALIZERS is off.
+    """
+    compiled_read_actions = ('list',)
+
+    def get_compiled_serializer(self):
+        if not getattr(settings, 'COMPILED_SERIALIZERS', True) or self.action not in self.compiled_read_actions:
+            return None
+        return compile_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.render(page))
+        return Response(compiled.render(queryset))
+
+    def serialize_many(self, queryset):
+        """Serialized data of every row of queryset."""
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return self.get_serializer(queryset, many=True).data
+        return compiled.render(compiled.values(queryset))
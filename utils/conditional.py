@@ -0,0 +1,122 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class NotModified(Exception):
+    """Raised from paginate_queryset when the page is unchanged, answered with a 304 by list."""
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for list and retrieve, answered with 304 before any
+    row is serialized when the client's validators still match.
+
+    A paginated list gets an ETag from its page: the page ids in order, the
+    result count and the max of `conditional_fields` over those ids (one
+    aggregate by primary key), so a list request never aggregates the whole
+    filtered set. retrieve and unpaginated lists take the validators from
+    one aggregate (max of `conditional_fields` plus the row count) over the
+    filtered queryset.
+
+    `conditional_fields` should cover everything the serializer renders,
+    e.g. the updated_at of nested relations. Lists only get an ETag: a
+    deleted row lowers the count but not max(updated_at). Rendered values
+    that come from a utils.catalog.Catalog are covered by listing it in
+    `conditional_catalogs`.
+    """
+    conditional_fields = ('updated_at',)
+    conditional_catalogs = ()
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.conditional_response(request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+        self.page_etag = None
+        try:
+            response = super().list(request, *args, **kwargs)
+        except NotModified:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        if self.page_etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.page_etag
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs), detail=True
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list' and self.request.method in ('GET', 'HEAD'):
+            self.page_etag = self.get_page_etag(self.request, page)
+            if self.is_not_modified(self.request, self.page_etag, None):
+                raise NotModified()
+        return page
+
+    def get_page_etag(self, request, page):
+        """Weak ETag of a list page (model instances or values() rows)."""
+        ids = [row['id'] if isinstance(row, dict) else row.pk for row in page]
+        stamps = ''
+        if ids:
+            values = self.get_queryset().model._default_manager.filter(pk__in=ids).order_by().aggregate(
+                **{f'_max_{index}': Max(field) for index, field in enumerate(self.conditional_fields)},
+            )
+            stamps = '|'.join(value.isoformat() if value else '' for value in values.values())
+        # the count the response shows, from the paginator's count strategy
+        result_count = getattr(self.paginator, 'get_result_count_value', None)
+        count = result_count() if result_count else ''
+        catalogs = '|'.join(catalog.snapshot().etag for catalog in self.conditional_catalogs)
+        digest = hashlib.md5(f'{request.get_full_path()}|{ids}|{count}|{stamps}|{catalogs}'.encode()).hexdigest()
+        return f'W/"{digest}"'
+
+    def get_validators(self, request, queryset):
+        """(etag, last_modified) of the queryset, None if it is empty."""
+        joins = any('__' in field for field in self.conditional_fields)
+        values = queryset.order_by().aggregate(
+            _count=Count('pk', distinct=joins),
+            **{f'_max_{index}': Max(field) for index, field in enumerate(self.conditional_fields)},
+        )
+        count = values.pop('_count')
+        if not count:
+            return None
+        last_modified = max((value for value in values.values() if value is not None), default=None)
+        stamp = last_modified.isoformat() if last_modified else ''
+        catalogs = '|'.join(catalog.snapshot().etag for catalog in self.conditional_catalogs)
+        digest = hashlib.md5(f'{request.get_full_path()}|{count}|{stamp}|{catalogs}'.encode()).hexdigest()
+        return f'W/"{digest}"', last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # weak comparison, and If-Modified-Since is ignored when present
+            return etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in parse_etags(if_none_match)} or if_none_match.strip() == '*'
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return bool(last_modified and if_modified_since and int(last_modified.timestamp()) <= if_modified_since)
+
+    def conditional_response(self, request, queryset, build_response, detail=False):
+        """304 if the client's validators still match, otherwise build_response() with validators set."""
+        validators = self.get_validators(request, queryset)
+        if validators is None:
+            return build_response()
+        etag, last_modified = validators
+        last_modified = last_modified if detail else None
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = build_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,180 @@
+import contextvars
+import hashlib
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'db_pin'
+
+_routing = contextvars.ContextVar('db_routing', default=None)
+_unhealthy = {}  # alias -> monotonic time until which it is skipped
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.alias = None
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def mark_unhealthy(alias):
+    _unhealthy[alias] = time.monotonic() + getattr(settings, 'REPLICA_RETRY_AFTER', 30)
+
+
+def is_healthy(alias):
+    until = _unhealthy.get(alias)
+    if until is not None:
+        if until > time.monotonic():
+            return False
+        del _unhealthy[alias]
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        mark_unhealthy(alias)
+        return False
+    return True
+
+
+def choose_replica():
+    replicas = get_replicas()
+    random.shuffle(replicas)
+    for alias in replicas:
+        if is_healthy(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Send reads to a healthy replica while ReplicaRoutingMiddleware has marked
+    the current request as safe. Everything else (writes, celery tasks, shell,
+    migrations) stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica:
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            # one replica per request so all of its reads see the same snapshot
+            state.alias = choose_replica()
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def use_primary(view):
+    """Per-view override: always read from the primary."""
+    view.db_routing = 'primary'
+    return view
+
+
+def use_replica(view):
+    """Per-view override: read from a replica even while the client is pinned."""
+    view.db_routing = 'replica'
+    return view
+
+
+def _view_routing(view_func):
+    for candidate in (view_func, getattr(view_func, 'cls', None), getattr(view_func, 'view_class', None)):
+        routing = getattr(candidate, 'db_routing', None)
+        if routing:
+            return routing
+    return None
+
+
+def _pin_key(request):
+    auth = request.headers.get('Authorization')
+    if not auth:
+        return None
+    return 'db_pin:' + hashlib.sha1(auth.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether reads may use a replica. After a successful
+    write the client is pinned to the primary for REPLICA_STICKY_SECONDS
+    (by cookie, and by Authorization header for token clients) so it reads
+    its own writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def is_pinned(self, request):
+        pinned_until = request.COOKIES.get(PIN_COOKIE)
+        try:
+            if pinned_until and float(pinned_until) > time.time():
+                return True
+        except ValueError:
+            pass
+        key = _pin_key(request)
+        return bool(key and cache.get(key))
+
+    def pin(self, request, response):
+        seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True)
+        key = _pin_key(request)
+        if key:
+            cache.set(key, 1, timeout=seconds)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not get_replicas():
+            return self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        token = _routing.set(RoutingState(safe and not self.is_pinned(request)))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if not safe and response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not get_replicas():
+            return await self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        pinned = safe and await sync_to_async(self.is_pinned)(request)
+        token = _routing.set(RoutingState(safe and not pinned))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if not safe and response.status_code < 400:
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is None:
+            return None
+        routing = _view_routing(view_func)
+        if routing == 'primary':
+            state.use_replica = False
+        elif routing == 'replica' and request.method in SAFE_METHODS:
+            state.use_replica = True
+        return None
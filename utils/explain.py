@@ -0,0 +1,28 @@
+import json
+
+from django.db import connections
+
+
+def explain(queryset, analyze=True):
+    """EXPLAIN (FORMAT JSON) a queryset on postgres and return the root plan node."""
+    sql, params = queryset.query.sql_with_params()
+    options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+        plan = cursor.fetchone()[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return plan[0]['Plan']
+
+
+def index_names(node):
+    """Names of every index the plan touches."""
+    if 'Index Name' in node:
+        yield node['Index Name']
+    for child in node.get('Plans', []):
+        yield from index_names(child)
+
+
+def has_seq_scan(node, table):
+    if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') == table:
+        return True
+    return any(has_seq_scan(child, table) for child in node.get('Plans', []))
@@ -0,0 +1,83 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one tuple per row using a server-side cursor. `columns` is a list
+    of (header, field, formatter) and only the listed fields are selected.
+    """
+    fields = [field for _, field, _ in columns]
+    queryset = queryset.select_related(None).prefetch_related(None).values_list(*fields)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield tuple(
+            formatter(value) if formatter else value
+            for (_, _, formatter), value in zip(columns, row)
+        )
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(rows, headers):
+    writer = csv.writer(Echo())
+    # BOM so Excel opens the persian headers as utf-8
+    yield '\ufeff' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _xlsx_value(value):
+    if hasattr(value, 'tzinfo') and value.tzinfo is not None:
+        # excel has no timezone support, write the local time the API shows
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def build_xlsx(rows, headers):
+    """Write rows with a write-only workbook into a spooled temp file."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(headers))
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_response(queryset, columns, filename, file_format='csv'):
+    headers = [header for header, _, _ in columns]
+    rows = iter_export_rows(queryset, columns)
+    if file_format == 'xlsx':
+        return FileResponse(
+            build_xlsx(rows, headers),
+            as_attachment=True,
+            filename=f'{filename}.xlsx',
+            content_type=XLSX_CONTENT_TYPE,
+        )
+    response = StreamingHttpResponse(stream_csv(rows, headers), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
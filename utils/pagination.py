@@ -1,27 +1,284 @@
+import base64
+import hashlib
+import json
 from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
 # Create your views here.
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CountedPaginator(Paginator):
+    """Django paginator whose total comes from a callable instead of COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count_func, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count_func = count_func
+
+    @cached_property
+    def count(self):
+        return self._count_func()
+
 
 class CustomPaginationClass(PageNumberPagination):
-    page_size = 2  # this is equivalent to your 'page_item_count'
+    page_size = 10  # this is equivalent to your 'page_item_count'
     page_size_query_param = 'page_item_count' # this sets the param name for the page size
-    max_page_size = 5
+    max_page_size = 100
+
+    # keyset mode: enabled by the `cursor` query param or `pagination_mode = 'cursor'` on the view
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created_at', '-id')
+
+    # result_count strategy: 'exact', 'estimate' (postgres planner stats) or 'cached'
+    count_mode = 'exact'
+    count_cache_timeout = 60
+    estimate_exact_threshold = 10000
 
     def get_paginated_response(self, data):
-        return Response(OrderedDict([
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
         ('page_count', self.get_page_size(self.request)), # total # on current page
-        ('page_number', int(self.request.query_params.get(self.page_query_param, 1))),
-        ('result_count', self.page.paginator.count),     # total # of objects that will be paginated
+        ('page_number', self.get_page_number_value()),
+        ('result_count', self.get_result_count_value()),     # total # of objects that will be paginated
         ('next', self.get_next_link()),
         ('previous', self.get_previous_link()),
         ('results', data)
-        ]))
+        ])
 
     def get_page_size(self, request):
+        for param in ('count_page', 'page_item_count'):
+            if param in request.GET:
+                try:
+                    size = int(request.GET[param])
+                except (TypeError, ValueError):
+                    break
+                if size > 0:
+                    return min(size, self.max_page_size)
+                break
+        return self.page_size
+
+    # ---- page number mode -------------------------------------------------
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountedPaginator(queryset, page_size, lambda: self.get_result_count(queryset))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.cursor = None
+        if self.use_cursor(request, view):
+            return self.paginate_keyset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for the async views. The page rows come from the
+        async ORM; the count runs in a worker thread, and so does keyset mode.
+        """
+        self.request = request
+        self.view = view
+        self.cursor = None
+        if self.use_cursor(request, view):
+            results = await sync_to_async(self.paginate_keyset)(queryset, request, view)
+            self.cursor_result_count = await sync_to_async(self.get_result_count)(queryset)
+            return results
+
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await sync_to_async(self.get_result_count)(queryset)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
+
+    def get_page_number_value(self):
+        if self.cursor is not None:
+            return self.cursor_page_number
+        return int(self.request.query_params.get(self.page_query_param, 1))
+
+    def get_result_count_value(self):
+        if self.cursor is not None:
+            if self.cursor_result_count is None:
+                self.cursor_result_count = self.get_result_count(self.cursor_queryset)
+            return self.cursor_result_count
+        return self.page.paginator.count
+
+    def get_next_link(self):
+        if self.cursor is not None:
+            return self.get_cursor_link(self.next_position, self.cursor_page_number + 1, reverse=False)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.cursor is not None:
+            return self.get_cursor_link(self.previous_position, self.cursor_page_number - 1, reverse=True)
+        return super().get_previous_link()
+
+    # ---- result count ------------------------------------------------------
+
+    def get_count_mode(self):
+        return getattr(self.view, 'pagination_count_mode', self.count_mode)
+
+    def get_result_count(self, queryset):
+        mode = self.get_count_mode()
+        if mode == 'estimate':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None and estimate >= self.estimate_exact_threshold:
+                return estimate
+            # small results are cheap to count and must not lag behind writes
+            mode = 'exact'
+        if mode == 'cached':
+            return self.cached_count(queryset)
+        return queryset.count()
+
+    def cached_count(self, queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        key = f'pagination_count:{queryset.model._meta.db_table}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, timeout=self.count_cache_timeout)
+        return count
+
+    def estimate_count(self, queryset):
+        """
+        Read the row estimate from postgres planner statistics. Unfiltered
+        querysets use pg_class.reltuples, filtered ones the EXPLAIN estimate.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] > 0 else None
+            try:
+                sql, params = queryset.order_by().query.sql_with_params()
+            except EmptyResultSet:
+                return 0
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+    # ---- keyset mode -------------------------------------------------------
+
+    def use_cursor(self, request, view):
+        if self.cursor_query_param in request.query_params:
+            return True
+        return getattr(view, 'pagination_mode', None) == 'cursor'
+
+    def get_cursor_ordering(self):
+        return getattr(self.view, 'cursor_ordering', self.cursor_ordering)
+
+    def encode_cursor(self, position, page_number, reverse):
+        payload = json.dumps({'v': position, 'p': page_number, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model, ordering):
+        """
+        (position, page number, reverse) from the cursor param; the position
+        holds one value of the model's type per ordering field. Anything a
+        client tampered with is a 404, never an error in the query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, 1, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            raw, page_number, reverse = payload['v'], int(payload['p']), bool(payload['r'])
+            if not isinstance(raw, list) or len(raw) != len(ordering):
+                raise ValueError('cursor position does not match the ordering')
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, raw)
+            ]
+            if None in position:
+                raise ValueError('cursor position has a null value')
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('cursor نامعتبر است')
+        return position, page_number, reverse
+
+    def keyset_filter(self, ordering, values):
+        """
+        Build `(a, b) > (x, y)` for the given ordering as an OR of prefixes so
+        the database can walk the (created_at, id) index from the position.
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+            for prev_field, prev_value in zip(ordering[:index], values):
+                term &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= term
+        return condition
+
+    def get_position(self, obj, ordering):
+        position = []
+        for field in ordering:
+            # rows are model instances, or dicts for values() querysets
+            value = obj[field.lstrip('-')] if isinstance(obj, dict) else getattr(obj, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def paginate_keyset(self, queryset, request, view):
+        page_size = self.get_page_size(request)
+        ordering = tuple(self.get_cursor_ordering())
+        position, page_number, reverse = self.decode_cursor(request, queryset.model, ordering)
+
+        self.cursor = request.query_params.get(self.cursor_query_param, '')
+        self.cursor_queryset = queryset
+        self.cursor_result_count = None
+        self.cursor_page_number = max(page_number, 1)
+
+        walk = ordering
+        if reverse:
+            walk = tuple(f[1:] if f.startswith('-') else f'-{f}' for f in ordering)
+        queryset = queryset.order_by(*walk)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(walk, position))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = None
+        self.previous_position = None
+        if results:
+            first, last = results[0], results[-1]
+            if has_more or reverse:
+                self.next_position = self.get_position(last, ordering)
+            if (has_more if reverse else position is not None):
+                self.previous_position = self.get_position(first, ordering)
+        return results
 
-        if 'count_page' in request.GET:
-            return int(request.GET['count_page'])
-        else:
-            return 10
-        
+    def get_cursor_link(self, position, page_number, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, page_number, reverse))
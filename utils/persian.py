@@ -0,0 +1,60 @@
+import re
+
+import phonenumbers
+
+PERSIAN_DIGITS = '۰۱۲۳۴۵۶۷۸۹'
+ARABIC_DIGITS = '٠١٢٣٤٥٦٧٨٩'
+
+DIGITS_TABLE = str.maketrans(PERSIAN_DIGITS + ARABIC_DIGITS, '0123456789' * 2)
+
+CHARACTERS_TABLE = str.maketrans({
+    'ي': 'ی',  # arabic yeh
+    'ى': 'ی',  # alef maksura
+    'ك': 'ک',  # arabic kaf
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    '\u200c': ' ',  # zwnj
+    '\u200d': '',  # zwj
+    '\u0640': '',  # tatweel
+})
+
+DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+SPACES = re.compile(r'\s+')
+
+
+def normalize_digits(text):
+    """Replace persian and arabic digits with ascii ones."""
+    return text.translate(DIGITS_TABLE)
+
+
+def normalize_text(text):
+    """
+    Canonical form used both when indexing and when querying: arabic
+    letters mapped to persian, zwnj to space, diacritics and tatweel
+    removed, ascii digits, lower case and single spaces.
+    """
+    if not text:
+        return ''
+    text = normalize_digits(str(text)).translate(CHARACTERS_TABLE)
+    text = DIACRITICS.sub('', text)
+    return SPACES.sub(' ', text).strip().lower()
+
+
+def normalize_phone(value, region='IR'):
+    """
+    E.164 form of a phone number ('+989121234567') as Admin.phone stores it,
+    whatever the spacing, dashes, 0 / 0098 prefix or persian digits; None
+    if it is not a valid number.
+    """
+    if not value:
+        return None
+    try:
+        number = phonenumbers.parse(normalize_digits(str(value)), region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
@@ -0,0 +1,218 @@
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import time
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_profile = contextvars.ContextVar('request_profile', default=None)
+
+CACHE_EVENTS = {'l1_hits': 'hits', 'l2_hits': 'hits', 'misses': 'misses'}
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.statements = {}  # sql -> [count, ms]
+        self.serializer_ms = 0.0
+        self.serializer_depth = 0
+        self.cache = {'hits': 0, 'misses': 0}
+
+    def record_sql(self, sql, ms):
+        self.sql_count += 1
+        self.sql_ms += ms
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, ms]
+        else:
+            entry[0] += 1
+            entry[1] += ms
+
+    def duplicated_statements(self, limit=10):
+        duplicated = [
+            {'sql': sql[:1000], 'count': count, 'ms': round(ms, 2)}
+            for sql, (count, ms) in self.statements.items() if count > 1
+        ]
+        duplicated.sort(key=lambda item: (item['count'], item['ms']), reverse=True)
+        return duplicated[:limit]
+
+    def timings(self):
+        now = time.perf_counter()
+        return {
+            'total_ms': (now - self.started) * 1000,
+            'view_ms': (now - self.view_started) * 1000 if self.view_started is not None else 0.0,
+            'sql_ms': self.sql_ms,
+            'serializer_ms': self.serializer_ms,
+        }
+
+
+def record_cache(event):
+    """Called by the cache backend for every lookup (see TwoTierCache._count)."""
+    profile = _profile.get()
+    if profile is not None and event in CACHE_EVENTS:
+        profile.cache[CACHE_EVENTS[event]] += 1
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_sql(sql, (time.perf_counter() - started) * 1000)
+
+
+def install_sql_wrapper(sender, connection, **kwargs):
+    # stays on the connection for its lifetime, outside a profiled request it only reads the context var
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+@contextlib.contextmanager
+def serializer_timer():
+    """Add the time spent in the block, minus its SQL, to the profile's serializer time."""
+    profile = _profile.get()
+    if profile is None or profile.serializer_depth:
+        yield
+        return
+    profile.serializer_depth += 1
+    started, sql_ms = time.perf_counter(), profile.sql_ms
+    try:
+        yield
+    finally:
+        profile.serializer_depth -= 1
+        # lazy relations loaded while rendering are already counted as sql
+        profile.serializer_ms += (time.perf_counter() - started) * 1000 - (profile.sql_ms - sql_ms)
+
+
+@lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    """Subclass of serializer_class whose to_representation time is added to the profile."""
+
+    class TimedSerializer(serializer_class):
+        def to_representation(self, instance):
+            with serializer_timer():
+                return super().to_representation(instance)
+
+    TimedSerializer.__name__ = serializer_class.__name__
+    TimedSerializer.__qualname__ = serializer_class.__qualname__
+    return TimedSerializer
+
+
+class ProfilingMixin:
+    """
+    DRF hook for ProfilingMiddleware: while a request is profiled the
+    serializers of the view are timed. Outside a profiled request it costs
+    one context var lookup.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if _profile.get() is None:
+            return super().get_serializer(*args, **kwargs)
+        serializer_class = timed_serializer_class(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+def server_timing(profile, timings):
+    return ', '.join([
+        f'total;dur={timings["total_ms"]:.1f}',
+        f'view;dur={timings["view_ms"]:.1f}',
+        f'sql;dur={timings["sql_ms"]:.1f};desc="{profile.sql_count} queries"',
+        f'ser;dur={timings["serializer_ms"]:.1f}',
+        f'cache;desc="{profile.cache["hits"]} hits, {profile.cache["misses"]} misses"',
+    ])
+
+
+class ProfilingMiddleware:
+    """
+    Per-request SQL count/time, serializer time, cache hits/misses and view
+    time, sent back as a Server-Timing header to staff users (to every
+    client with PROFILING_SERVER_TIMING) and logged as one JSON line for requests slower than PROFILING_SLOW_REQUEST_MS
+    (sampled by PROFILING_SLOW_SAMPLE_RATE), with the SQL statements that
+    ran more than once.
+
+    With PROFILING_ENABLED off the middleware removes itself from the chain
+    and no database wrapper is installed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PROFILING_SERVER_TIMING', False)
+        self.slow_ms = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500)
+        self.sample_rate = getattr(settings, 'PROFILING_SLOW_SAMPLE_RATE', 1.0)
+        connection_created.connect(install_sql_wrapper, dispatch_uid='utils.profiling.install_sql_wrapper')
+        # connections of this thread opened before the signal was connected
+        for connection in connections.all(initialized_only=True):
+            install_sql_wrapper(None, connection)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _profile.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+        return None
+
+    def finish(self, request, response, profile):
+        timings = profile.timings()
+        # the header tells query counts and timings, not for any client
+        if self.server_timing or getattr(getattr(request, 'user', None), 'is_staff', False):
+            response['Server-Timing'] = server_timing(profile, timings)
+        if timings['total_ms'] >= self.slow_ms and random.random() < self.sample_rate:
+            log_slow_request(request, response, profile, timings)
+        return response
+
+
+def log_slow_request(request, response, profile, timings):
+    user = getattr(request, 'user', None)
+    record = {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user_id': getattr(user, 'pk', None),
+        **{key: round(value, 1) for key, value in timings.items()},
+        'sql_count': profile.sql_count,
+        'cache': profile.cache,
+        'duplicated_sql': profile.duplicated_statements(),
+    }
+    logger.warning('slow request %s', json.dumps(record, ensure_ascii=False), extra={'profile': record})
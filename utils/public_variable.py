@@ -10,6 +10,11 @@ TypeUser = (
 )
 
 
+SERVICE_PENDING = 0
+SERVICE_DISPATCHED = 1
+SERVICE_REPAIRING = 2
+SERVICE_DONE = 3
+
 ServiceStatus = (
     (0,'در حال پیگیری'),
     (1, 'اعزام تکنسین'),
@@ -25,9 +30,50 @@ ServiceTypeStatus = {
     3:'پایان یافته'
 
 }
-    
 
 
+IMPORT_PENDING = 0
+IMPORT_RUNNING = 1
+IMPORT_DONE = 2
+IMPORT_FAILED = 3
+
+ImportStatus = (
+    (0, 'در صف'),
+    (1, 'در حال پردازش'),
+    (2, 'انجام شد'),
+    (3, 'ناموفق'),
+)
+
+
+SMS_PENDING = 0
+SMS_SENT = 1
+SMS_FAILED = 2
 
+SmsStatus = (
+    (0, 'در صف'),
+    (1, 'ارسال شد'),
+    (2, 'ناموفق'),
+)
 
+CAMPAIGN_PENDING = 0
+CAMPAIGN_RUNNING = 1
+CAMPAIGN_DONE = 2
 
+CampaignStatus = (
+    (0, 'در صف'),
+    (1, 'در حال ارسال'),
+    (2, 'پایان یافته'),
+)
+
+
+STOCK_OPENING = 0
+STOCK_CONSUME = 1
+STOCK_RETURN = 2
+STOCK_ADJUST = 3
+
+StockMovementReason = (
+    (0, 'موجودی اولیه'),
+    (1, 'مصرف در فاکتور'),
+    (2, 'بازگشت از فاکتور'),
+    (3, 'اصلاح موجودی'),
+)
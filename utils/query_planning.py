@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+
+def _related_paths(serializer, model, prefix='', in_prefetch=False):
+    """
+    Walk the readable fields of a serializer and return the relation paths
+    it touches as (select_related, prefetch_related) lists.
+    """
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = prefix + field.source
+        if isinstance(field, (serializers.ListSerializer, ManyRelatedField)):
+            prefetch.append(path)
+            child = getattr(field, 'child', None)
+            if isinstance(child, serializers.BaseSerializer):
+                _, nested = _related_paths(child, model_field.related_model, path + '__', True)
+                prefetch.extend(nested)
+        elif isinstance(field, serializers.BaseSerializer):
+            # a forward FK rendered as a nested object needs the related row
+            (prefetch if in_prefetch else select).append(path)
+            nested_select, nested_prefetch = _related_paths(field, model_field.related_model, path + '__', in_prefetch)
+            (prefetch if in_prefetch else select).extend(nested_select)
+            prefetch.extend(nested_prefetch)
+        # plain PrimaryKeyRelatedField on a forward FK reads <field>_id, no query needed
+    return select, prefetch
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+    """Return (select_related, prefetch_related) tuples derived from the serializer tree."""
+    serializer = serializer_class()
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        # plain Serializer, e.g. the input of an action
+        return (), ()
+    select, prefetch = _related_paths(serializer, model)
+    return tuple(select), tuple(prefetch)
+
+
+def plan_queryset(queryset, serializer_class):
+    select, prefetch = get_query_plan(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class QueryPlanMixin:
+    """
+    Apply select_related/prefetch_related to the viewset queryset based on the
+    serializer used for the current action, so nested serializers do not run
+    one query per row.
+    """
+
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), self.get_serializer_class())
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+LIMITED, COOLDOWN = 'limited', 'cooldown'
+
+
+class Decision:
+    def __init__(self, allowed, scope=None, retry_after=0):
+        self.allowed = allowed
+        self.scope = scope
+        self.retry_after = retry_after
+
+    def __bool__(self):
+        return self.allowed
+
+
+class RateLimiter:
+    """
+    Sliding window limits per scope (e.g. phone, ip, global), kept in the
+    default cache so every worker shares them, checked with cache calls
+    only so a rejected request costs no database query.
+
+    Each window is a counter per fixed bucket; the count over the last
+    `window` seconds is estimated as current + previous * (the part of the
+    previous bucket still inside the window). `limits` is
+    {scope: (requests, window seconds)}, checked in that order, and only
+    the scopes up to the first one exceeded are counted.
+
+    Exceeding the limit of a scope in `cooldown_scopes` also blocks that
+    identity for `cooldown` = (first, longest) seconds, doubled for every
+    further strike within the longest cooldown. A global limit should not
+    be in cooldown_scopes, it would lock everybody out.
+    """
+
+    def __init__(self, name, limits, cooldown=(60, 86400), cooldown_scopes=('ip', 'phone')):
+        self.name = name
+        self.limits = limits
+        self.cooldown = cooldown
+        self.cooldown_scopes = cooldown_scopes
+
+    def key(self, kind, scope, ident, *parts):
+        # identities come from the request, hash them into a safe cache key
+        ident = hashlib.md5(str(ident).encode()).hexdigest()
+        return ':'.join(['ratelimit', self.name, kind, scope, ident, *map(str, parts)])
+
+    def check(self, idents):
+        """
+        Count one request for {scope: identity} (None skips a scope) and
+        return a Decision; a rejected one has the scope and retry_after in
+        seconds.
+        """
+        now = time.time()
+        scopes = [(scope, idents.get(scope)) for scope in self.limits if idents.get(scope) is not None]
+        cooldown_keys = {scope: self.key('cooldown', scope, ident) for scope, ident in scopes if scope in self.cooldown_scopes}
+        previous_keys = {
+            scope: self.key('window', scope, ident, int(now // self.limits[scope][1]) - 1) for scope, ident in scopes
+        }
+        stored = cache.get_many([*cooldown_keys.values(), *previous_keys.values()])
+
+        for scope, key in cooldown_keys.items():
+            until = stored.get(key)
+            if until and until > now:
+                self.record(scope, COOLDOWN)
+                return Decision(False, scope, math.ceil(until - now))
+
+        for scope, ident in scopes:
+            limit, window = self.limits[scope]
+            bucket = int(now // window)
+            key = self.key('window', scope, ident, bucket)
+            cache.add(key, 0, timeout=window * 2)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # the bucket expired between add and incr
+                cache.set(key, 1, timeout=window * 2)
+                count = 1
+            elapsed = (now % window) / window
+            if count + stored.get(previous_keys[scope], 0) * (1 - elapsed) > limit:
+                self.record(scope, LIMITED)
+                retry_after = math.ceil(window * (1 - elapsed))
+                if scope in self.cooldown_scopes:
+                    retry_after = max(retry_after, self.start_cooldown(scope, ident, now))
+                return Decision(False, scope, retry_after)
+        return Decision(True)
+
+    def start_cooldown(self, scope, ident, now):
+        first, longest = self.cooldown
+        strikes_key = self.key('strikes', scope, ident)
+        cache.add(strikes_key, 0, timeout=longest)
+        try:
+            strikes = cache.incr(strikes_key)
+        except ValueError:
+            cache.set(strikes_key, 1, timeout=longest)
+            strikes = 1
+        seconds = min(first * 2 ** (strikes - 1), longest)
+        cache.set(self.key('cooldown', scope, ident), now + seconds, timeout=seconds)
+        logger.warning('%s: %s %s in cooldown for %ss (strike %s)', self.name, scope, ident, seconds, strikes)
+        return seconds
+
+    def reset(self, idents):
+        """Forget the windows, strikes and cooldowns of {scope: identity}."""
+        now = time.time()
+        keys = []
+        for scope, ident in idents.items():
+            if scope not in self.limits or ident is None:
+                continue
+            bucket = int(now // self.limits[scope][1])
+            keys += [self.key('window', scope, ident, bucket), self.key('window', scope, ident, bucket - 1)]
+            keys += [self.key('strikes', scope, ident), self.key('cooldown', scope, ident)]
+        cache.delete_many(keys)
+
+    def metric_key(self, scope, outcome):
+        return f'ratelimit_metric:{self.name}:{scope}:{outcome}'
+
+    def record(self, scope, outcome):
+        key = self.metric_key(scope, outcome)
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    def metrics(self):
+        """{scope: {limited: n, cooldown: n}} rejections counted since the cache was last cleared."""
+        keys = {(scope, outcome): self.metric_key(scope, outcome) for scope in self.limits for outcome in (LIMITED, COOLDOWN)}
+        values = cache.get_many(list(keys.values()))
+        metrics = {}
+        for (scope, outcome), key in keys.items():
+            metrics.setdefault(scope, {})[outcome] = values.get(key, 0)
+        return metrics
+
+
+def client_ip(request):
+    """
+    The client address, from CLIENT_IP_HEADER when a proxy in front of us
+    sets it. A list header (X-Forwarded-For) starts with whatever the client
+    sent, so the address is taken CLIENT_IP_PROXY_COUNT entries from the
+    right: the one our outermost proxy appended.
+    """
+    header = getattr(settings, 'CLIENT_IP_HEADER', 'REMOTE_ADDR')
+    value = request.META.get(header)
+    if value and header != 'REMOTE_ADDR':
+        addresses = [address.strip() for address in value.split(',')]
+        proxies = getattr(settings, 'CLIENT_IP_PROXY_COUNT', 1)
+        if 0 < proxies <= len(addresses) and addresses[-proxies]:
+            return addresses[-proxies]
+    return request.META.get('REMOTE_ADDR') or None
@@ -0,0 +1,32 @@
+from django.db import connections
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+from utils.persian import normalize_text
+
+
+class TrigramSearchFilter(BaseFilterBackend):
+    """
+    `?search=` over a normalized text column (view.search_field) backed by a
+    pg_trgm GIN index. Matches are substring or word-similar to the
+    normalized query and ordered by similarity. Other databases fall back
+    to a plain case-insensitive substring match.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = normalize_text(request.query_params.get(self.search_param, ''))
+        field = getattr(view, 'search_field', None)
+        if not query or not field:
+            return queryset
+
+        if connections[queryset.db].vendor == 'postgresql':
+            from django.contrib.postgres.search import TrigramWordSimilarity
+
+            return (
+                queryset
+                .filter(Q(**{f'{field}__contains': query}) | Q(**{f'{field}__trigram_word_similar': query}))
+                .annotate(search_rank=TrigramWordSimilarity(query, field))
+                .order_by('-search_rank', '-id')
+            )
+        return queryset.filter(**{f'{field}__icontains': query})
@@ -12,10 +12,13 @@ from requests.structures import CaseInsensitiveDict
 from zeep import Client
 from zeep.transports import Transport
 import time
+import logging
 
 from kavenegar import *
 from celery import shared_task
 
+logger = logging.getLogger(__name__)
+
 
 class SmartSms():
     
@@ -29,13 +32,12 @@ class SmartSms():
             }  
             params.update(tokens)
 
-            print("$$$$$$$",params)
- 
+            logger.debug('sms lookup %s to %s', template, mobile)
             response = api.verify_lookup(params)
         except APIException as e: 
-            print(e)
+            logger.warning('sms lookup failed: %s', e)
         except HTTPException as e: 
-            print(e)
+            logger.warning('sms lookup failed: %s', e)
 
     @shared_task()
     def send_background(mobile, template, tokens):
@@ -46,10 +48,9 @@ class SmartSms():
                 'template': template,
                 'type': 'sms',
             } 
-            print("tesssssssssssssst")
             params.update(tokens)
             response = api.verify_lookup(params)
-            print('response >>>>>>>>>>>>>>>>>>>', response)
+            logger.debug('sms lookup response %s', response)
             return response
         except APIException as e: 
             return e
@@ -57,23 +58,11 @@ class SmartSms():
             return e
 
     def sendOneToMany(self, mobiles, template, tokens):
-        try:
-            print('mobiles>>>>>>>>>>>>>>>>>>>>>', mobiles)
-            smaert = SmartSms()
-            clean_mobiles = []
-            for mobile in mobiles:
-                if not (mobile in clean_mobiles):
-                    clean_mobiles.append(mobile)
-
-            print('clean_mobiles>>>>>>>>>>>>>>>>>>.', clean_mobiles)
-            
-            for item in clean_mobiles:
-                print('item>>>>>>>>>>>>>>>>', item, template, tokens)
-                smaert.send_background.delay(item, template, tokens)
-
-            return clean_mobiles
+        """
+        Send a lookup template to many numbers as one campaign: numbers are
+        normalized and deduped, then sent in chunks by a single background task.
+        """
+        from campaigns.engine import start_campaign
 
-        except APIException as e: 
-            return e
-        except HTTPException as e: 
-            return e
+        campaign, clean_mobiles = start_campaign(mobiles, template=template, tokens=tokens)
+        return clean_mobiles